@@ -18,8 +18,12 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 # Create uploads directory if it doesn't exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# Run every request in a single database transaction
+from backend.database import init_app as init_database
+init_database(app)
+
 # Import routes
-from backend.routes import auth_routes, document_routes, block_routes, account_routes, admin_routes
+from backend.routes import auth_routes, document_routes, block_routes, account_routes, admin_routes, search_routes
 
 # Register blueprints
 app.register_blueprint(auth_routes.bp)
@@ -27,6 +31,7 @@ app.register_blueprint(document_routes.bp)
 app.register_blueprint(block_routes.bp)
 app.register_blueprint(account_routes.bp)
 app.register_blueprint(admin_routes.bp)
+app.register_blueprint(search_routes.bp)
 
 @app.route('/')
 def index():
@@ -60,7 +65,10 @@ def uploaded_file(filename):
 
 if __name__ == '__main__':
     # Initialize database on first run
-    from backend.database import init_db
+    from backend.database import init_db, check_pragma_settings
+    from backend.utils.password_hasher import configure_password_cost
     init_db()
+    check_pragma_settings()
+    configure_password_cost()
     
     app.run(debug=True, host='0.0.0.0', port=5000)
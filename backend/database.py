@@ -1,31 +1,652 @@
 import sqlite3
 import os
+import threading
+import time
 from contextlib import contextmanager
+from flask import g, has_request_context
 
 DATABASE_PATH = 'notion.db'
 
-def get_db_connection():
+# Connection pool configuration
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+POOL_HEALTH_CHECK_INTERVAL = float(os.environ.get('DB_POOL_HEALTH_CHECK_INTERVAL', 30))
+
+# PRAGMA profile applied to every new connection. WAL lets readers proceed
+# while a block write is in progress; synchronous=NORMAL is durable in WAL
+# mode except for the last transactions before a power loss.
+PRAGMA_PROFILE = {
+    'journal_mode': os.environ.get('DB_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.environ.get('DB_SYNCHRONOUS', 'NORMAL'),
+    'mmap_size': int(os.environ.get('DB_MMAP_SIZE', 256 * 1024 * 1024)),
+    'cache_size': int(os.environ.get('DB_CACHE_SIZE', -64000)),  # negative means KiB
+    'busy_timeout': int(os.environ.get('DB_BUSY_TIMEOUT', 5000)),  # milliseconds
+    'temp_store': os.environ.get('DB_TEMP_STORE', 'MEMORY'),
+}
+
+# Values PRAGMA reports back for the symbolic settings above
+_PRAGMA_SYMBOLS = {
+    'synchronous': {0: 'OFF', 1: 'NORMAL', 2: 'FULL', 3: 'EXTRA'},
+    'temp_store': {0: 'DEFAULT', 1: 'FILE', 2: 'MEMORY'},
+}
+
+def _pragma_value(value):
+    """Validate a PRAGMA value, which cannot be passed as a bound parameter."""
+    if isinstance(value, int) or (isinstance(value, str) and value.isalnum()):
+        return value
+    raise ValueError(f'Invalid PRAGMA value: {value!r}')
+
+def apply_pragma_profile(conn, profile=None):
+    """Apply the PRAGMA profile to a connection."""
+    profile = PRAGMA_PROFILE if profile is None else profile
+    conn.execute('PRAGMA foreign_keys = ON')
+    for name, value in profile.items():
+        if name not in PRAGMA_PROFILE:
+            raise ValueError(f'Unsupported PRAGMA: {name}')
+        conn.execute(f'PRAGMA {name} = {_pragma_value(value)}').fetchall()
+
+# Compiled statements kept per connection by sqlite3, keyed by SQL text.
+# Pooled connections live for many requests, so a cache larger than the
+# statement registry below means each statement is parsed and planned once
+# per connection.
+STATEMENT_CACHE_SIZE = int(os.environ.get('DB_STATEMENT_CACHE_SIZE', 256))
+
+class StatementRegistry:
+    """Named SQL statements shared by the repositories, with prepare-cache counters.
+    
+    Repositories register their fixed statements by name at import time and
+    execute them by name, so the same SQL text is reused on every call. Each
+    connection counts whether the statements it executes were already in
+    its statement cache; the counts are only added up when stats are read.
+    """
+    
+    def __init__(self, cache_size=STATEMENT_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._statements = {}
+        self._counters = set()
+        # Counts of connections that have been closed
+        self._closed_hits = 0
+        self._closed_misses = 0
+    
+    def register(self, namespace, statements):
+        """Register a dict of name -> SQL under namespace and return it."""
+        with self._lock:
+            for name, sql in statements.items():
+                key = f'{namespace}.{name}'
+                if self._statements.get(key, sql) != sql:
+                    raise ValueError(f'Statement already registered: {key}')
+                self._statements[key] = sql
+        return statements
+    
+    def __getitem__(self, key):
+        return self._statements[key]
+    
+    def __len__(self):
+        return len(self._statements)
+    
+    def add_counter(self, counter):
+        """Include a connection's StatementCounter in stats until it is removed."""
+        with self._lock:
+            self._counters.add(counter)
+    
+    def remove_counter(self, counter):
+        """Keep a closing connection's counts and stop reading its counter."""
+        with self._lock:
+            if counter in self._counters:
+                self._counters.remove(counter)
+                self._closed_hits += counter.hits
+                self._closed_misses += counter.misses
+    
+    def stats(self):
+        """Return registry size and prepare-cache hit/miss counters."""
+        with self._lock:
+            # Other threads may be counting meanwhile, so the sums can be a
+            # few executions behind
+            hits = self._closed_hits + sum(counter.hits for counter in self._counters)
+            misses = self._closed_misses + sum(counter.misses for counter in self._counters)
+            return {
+                'registered': len(self._statements),
+                'cache_size': self.cache_size,
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': hits / (hits + misses) if hits + misses else 0.0
+            }
+
+statements = StatementRegistry()
+
+class StatementCounter:
+    """Prepare-cache hits and misses of one connection, updated only by its thread."""
+    
+    __slots__ = ('hits', 'misses')
+    
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+class Cursor(sqlite3.Cursor):
+    """Cursor that reports each statement to its connection's cache tracker."""
+    
+    def execute(self, sql, parameters=()):
+        self.connection.track_statement(sql)
+        return super().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        self.connection.track_statement(sql)
+        return super().executemany(sql, seq_of_parameters)
+
+class Connection(sqlite3.Connection):
+    """Connection that tracks hits in sqlite3's per-connection statement cache.
+    
+    sqlite3 does not expose its cache, so the SQL texts executed are kept
+    alongside it to tell hits from misses. They are evicted oldest first
+    rather than least recently used, which only differs from sqlite3 once
+    more distinct statements have run than the cache holds.
+    """
+    
+    def __init__(self, *args, cached_statements=STATEMENT_CACHE_SIZE, **kwargs):
+        super().__init__(*args, cached_statements=cached_statements, **kwargs)
+        self.cached_statements = cached_statements
+        self._prepared = {}
+        self.statement_counter = StatementCounter()
+        statements.add_counter(self.statement_counter)
+    
+    def cursor(self, factory=Cursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def close(self):
+        statements.remove_counter(self.statement_counter)
+        super().close()
+    
+    def track_statement(self, sql):
+        """Record whether sql is already prepared on this connection."""
+        if sql in self._prepared:
+            self.statement_counter.hits += 1
+            return
+        self.statement_counter.misses += 1
+        if self.cached_statements > 0:
+            self._prepared[sql] = True
+            if len(self._prepared) > self.cached_statements:
+                del self._prepared[next(iter(self._prepared))]
+
+# RETURNING (SQLite 3.35+) lets a write hand back the row it wrote in the
+# same statement; older versions read the row with a second query
+SUPPORTS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+def execute_returning(cursor, sql, parameters, table, rowid=None):
+    """Run a single-row write ending in RETURNING and return the row it returns, or None.
+    
+    Without RETURNING support the write runs without the clause and the
+    returned columns are read from table by rowid instead: before a DELETE,
+    after an INSERT (using lastrowid) or UPDATE. Writes other than inserts
+    must pass the rowid of the only row they can change.
+    """
+    if SUPPORTS_RETURNING:
+        cursor.execute(sql, parameters)
+        rows = cursor.fetchall()
+        return rows[0] if rows else None
+    
+    statement, columns = sql.rsplit('RETURNING', 1)
+    select_sql = f'SELECT {columns.strip()} FROM {table} WHERE rowid = ?'
+    deleted = None
+    is_delete = statement.lstrip().upper().startswith('DELETE')
+    if is_delete:
+        cursor.execute(select_sql, (rowid,))
+        deleted = cursor.fetchone()
+    
+    cursor.execute(statement, parameters)
+    # sqlite3 leaves rowcount unset for statements starting with WITH
+    cursor.execute('SELECT changes(), last_insert_rowid()')
+    changes, last_rowid = cursor.fetchone()
+    if changes == 0:
+        return None
+    if is_delete:
+        return deleted
+    cursor.execute(select_sql, (last_rowid if rowid is None else rowid,))
+    return cursor.fetchone()
+
+def get_db_connection(check_same_thread=True):
     """Create and return a database connection with proper configuration."""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = sqlite3.connect(DATABASE_PATH, check_same_thread=check_same_thread,
+                               factory=Connection, cached_statements=STATEMENT_CACHE_SIZE)
         conn.row_factory = sqlite3.Row
-        conn.execute('PRAGMA foreign_keys = ON')
+        apply_pragma_profile(conn)
         return conn
     except sqlite3.Error as e:
         raise Exception(f"Failed to connect to database: {e}")
 
-@contextmanager
-def get_db():
-    """Context manager for database connections with automatic commit/rollback."""
+def check_pragma_settings():
+    """Report the PRAGMA settings actually in effect and any that differ from the profile.
+    
+    Returns a dict mapping each PRAGMA to its active value. SQLite silently
+    keeps the old journal mode when WAL is unavailable (e.g. on network
+    file systems), so mismatches are printed as warnings.
+    """
     conn = get_db_connection()
+    try:
+        active = {'foreign_keys': conn.execute('PRAGMA foreign_keys').fetchone()[0]}
+        for name in PRAGMA_PROFILE:
+            value = conn.execute(f'PRAGMA {name}').fetchone()[0]
+            active[name] = _PRAGMA_SYMBOLS.get(name, {}).get(value, value)
+    finally:
+        conn.close()
+    
+    print(f"SQLite {sqlite3.sqlite_version} settings for {DATABASE_PATH}:")
+    for name, value in active.items():
+        expected = PRAGMA_PROFILE.get(name)
+        if expected is not None and str(value).upper() != str(expected).upper():
+            print(f"  {name} = {value} (WARNING: configured {expected})")
+        else:
+            print(f"  {name} = {value}")
+    if not SUPPORTS_RETURNING:
+        print("  RETURNING unsupported (needs SQLite 3.35): writes read rows back with a second query")
+    return active
+
+class ConnectionPool:
+    """Pool of long-lived SQLite connections keyed by worker thread.
+    
+    Each thread keeps at most one idle connection, so a connection is only
+    ever used by the thread that opened it (the same-thread check is relaxed
+    only so that the pool can close connections left behind by dead threads). At most `size` idle connections
+    are retained; connections released beyond that are closed. Connections
+    idle for longer than `health_check_interval` seconds are pinged before
+    being handed out again and replaced if the ping fails.
+    """
+    
+    def __init__(self, size=POOL_SIZE, health_check_interval=POOL_HEALTH_CHECK_INTERVAL):
+        self.size = size
+        self.health_check_interval = health_check_interval
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._paths = {}
+    
+    def acquire(self):
+        """Borrow the calling thread's connection, opening one if needed."""
+        key = threading.get_ident()
+        with self._lock:
+            entry = self._idle.pop(key, None)
+        
+        if entry is not None:
+            conn, path, last_used = entry
+            if path == DATABASE_PATH and self._is_healthy(conn, last_used):
+                self._paths[id(conn)] = path
+                return conn
+            self._close(conn)
+        
+        conn = get_db_connection(check_same_thread=False)
+        self._paths[id(conn)] = DATABASE_PATH
+        return conn
+    
+    def release(self, conn):
+        """Return a borrowed connection to the pool."""
+        path = self._paths.pop(id(conn), None)
+        if conn.in_transaction:
+            conn.rollback()
+        
+        key = threading.get_ident()
+        with self._lock:
+            if key not in self._idle and len(self._idle) >= self.size:
+                self._prune_dead_threads()
+            if key not in self._idle and len(self._idle) < self.size and path == DATABASE_PATH:
+                self._idle[key] = (conn, path, time.monotonic())
+                return
+        self._close(conn)
+    
+    def close_all(self):
+        """Close every idle connection held by the pool."""
+        with self._lock:
+            entries = list(self._idle.values())
+            self._idle.clear()
+        for conn, _, _ in entries:
+            self._close(conn)
+    
+    def _is_healthy(self, conn, last_used):
+        """Ping connections that have been idle longer than the check interval."""
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+    
+    def _prune_dead_threads(self):
+        """Drop idle connections owned by threads that have exited (lock held)."""
+        alive = {thread.ident for thread in threading.enumerate()}
+        for key in [key for key in self._idle if key not in alive]:
+            conn, _, _ = self._idle.pop(key)
+            self._close(conn)
+    
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+pool = ConnectionPool()
+
+# Per-thread state for get_db() calls made outside a unit of work
+_local = threading.local()
+
+class UnitOfWork:
+    """Request-scoped transaction shared by every repository call in a request.
+    
+    The pooled connection is borrowed on first use and a transaction is
+    opened on it; the request commits or rolls back once at the end. The
+    write lock is only taken when the first write is about to run (see
+    connection()), or from the start if `write` is true, so requests that
+    read before slow work, such as hashing a password, do not hold up
+    other writers.
+    """
+    
+    def __init__(self, write=False):
+        self.conn = None
+        self.write = write
+        self.after_commit = []
+        self._writing = False
+        self._changes_at_begin = 0
+    
+    def connection(self, write=False):
+        """Return the shared connection, beginning a transaction if needed.
+        
+        When write is requested in a transaction that has only read so far,
+        it is committed and begun again holding the write lock, so that it
+        waits for concurrent writers instead of failing on a stale snapshot.
+        """
+        if self.conn is None:
+            self.conn = pool.acquire()
+        if (write and not self._writing and self.conn.in_transaction
+                and self.conn.total_changes == self._changes_at_begin):
+            self.conn.commit()
+        if not self.conn.in_transaction:
+            self._writing = self.write or write
+            self._changes_at_begin = self.conn.total_changes
+            self.conn.execute('BEGIN IMMEDIATE' if self._writing else 'BEGIN')
+        return self.conn
+    
+    def commit(self):
+        """Commit the open transaction, if any, then run after-commit callbacks."""
+        if self.conn is not None and self.conn.in_transaction:
+            self.conn.commit()
+        callbacks, self.after_commit = self.after_commit, []
+        _run_callbacks(callbacks)
+    
+    def rollback(self):
+        """Roll back the open transaction, if any, discarding after-commit callbacks."""
+        self.after_commit = []
+        if self.conn is not None and self.conn.in_transaction:
+            self.conn.rollback()
+    
+    def close(self):
+        """Roll back anything left uncommitted and return the connection."""
+        if self.conn is None:
+            return
+        try:
+            self.rollback()
+        finally:
+            pool.release(self.conn)
+            self.conn = None
+
+def get_unit_of_work():
+    """Return the unit of work bound to the current request or write_transaction(), if any."""
+    if not has_request_context():
+        return getattr(_local, 'unit_of_work', None)
+    return g.get('unit_of_work')
+
+def transaction_open():
+    """Check whether the current request's transaction has already begun.
+    
+    Reads from then on may come from a snapshot taken earlier, before a
+    concurrent write committed, so their results must not be cached as if
+    read now.
+    """
+    unit_of_work = get_unit_of_work()
+    return unit_of_work is not None and unit_of_work.conn is not None and unit_of_work.conn.in_transaction
+
+@contextmanager
+def write_transaction():
+    """Run the repository calls made inside in one transaction holding the write lock.
+    
+    Inside a request the request's transaction is used, taking the write
+    lock if it has only read so far. Elsewhere, e.g. in a background
+    thread, a unit of work is opened for the calling thread and committed
+    at the end.
+    """
+    unit_of_work = get_unit_of_work()
+    if unit_of_work is not None:
+        unit_of_work.connection(write=True)
+        yield
+        return
+    
+    _local.unit_of_work = unit_of_work = UnitOfWork(write=True)
+    try:
+        unit_of_work.connection()
+        yield
+        unit_of_work.commit()
+    finally:
+        _local.unit_of_work = None
+        unit_of_work.close()
+
+def commit_transaction():
+    """Commit the current request's transaction now, e.g. before waiting on another writer.
+    
+    Later database calls in the request begin a new transaction.
+    """
+    unit_of_work = get_unit_of_work()
+    if unit_of_work is not None:
+        unit_of_work.commit()
+
+@contextmanager
+def get_db(write=False):
+    """Context manager for database connections with automatic commit/rollback.
+    
+    Inside a request with a unit of work, the request's shared connection is
+    yielded and committing is left to the end of the request. Repository
+    methods that write pass write=True so that the request's transaction
+    takes the write lock first.
+    """
+    unit_of_work = get_unit_of_work()
+    if unit_of_work is not None:
+        yield unit_of_work.connection(write=write)
+        return
+    
+    conn = pool.acquire()
+    outer_callbacks = getattr(_local, 'after_commit', None)
+    _local.after_commit = callbacks = []
     try:
         yield conn
         conn.commit()
     except Exception as e:
         conn.rollback()
+        callbacks.clear()
         raise
     finally:
-        conn.close()
+        _local.after_commit = outer_callbacks
+        pool.release(conn)
+    _run_callbacks(callbacks)
+
+def call_after_commit(callback):
+    """Run callback once the current transaction has committed.
+    
+    Used to invalidate caches so that a concurrent reader cannot re-cache
+    data from before the write. Callbacks are dropped on rollback and run
+    immediately when no transaction is open.
+    """
+    unit_of_work = get_unit_of_work()
+    if unit_of_work is not None:
+        unit_of_work.after_commit.append(callback)
+        return
+    callbacks = getattr(_local, 'after_commit', None)
+    if callbacks is None:
+        callback()
+    else:
+        callbacks.append(callback)
+
+def _run_callbacks(callbacks):
+    for callback in callbacks:
+        callback()
+
+def _begin_unit_of_work():
+    g.unit_of_work = UnitOfWork()
+
+def _commit_unit_of_work(response):
+    """Commit successful requests and roll back failed ones before responding."""
+    unit_of_work = g.pop('unit_of_work', None)
+    if unit_of_work is None:
+        return response
+    try:
+        if response.status_code < 400:
+            unit_of_work.commit()
+        else:
+            unit_of_work.rollback()
+    finally:
+        unit_of_work.close()
+    return response
+
+def _close_unit_of_work(exc):
+    """Roll back and release the connection if the request ended abnormally."""
+    unit_of_work = g.pop('unit_of_work', None)
+    if unit_of_work is not None:
+        unit_of_work.close()
+
+def init_app(app):
+    """Run each request of `app` inside a single unit of work."""
+    app.before_request(_begin_unit_of_work)
+    app.after_request(_commit_unit_of_work)
+    app.teardown_request(_close_unit_of_work)
+
+# Every block write bumps its document's blocks_version, which is used as
+# the ETag of the block list and as the document's change sequence: each
+# written block records the version it was written at in change_seq, and
+# each deleted block leaves a tombstone with the version of its deletion.
+# Inserts, deletes and content edits are covered by triggers, so writers
+# outside the repositories are counted too. Pure order_index updates are
+# not, since a reorder would otherwise bump the version once per row;
+# BlockRepository bumps it once per reorder instead.
+BLOCKS_VERSION_TRIGGERS = [
+    '''CREATE TRIGGER IF NOT EXISTS trg_blocks_version_insert AFTER INSERT ON blocks
+       BEGIN
+           UPDATE documents SET blocks_version = blocks_version + 1 WHERE id = NEW.document_id;
+           UPDATE blocks SET change_seq = (SELECT blocks_version FROM documents WHERE id = NEW.document_id)
+           WHERE id = NEW.id;
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_blocks_version_update AFTER UPDATE OF content, block_type, document_id ON blocks
+       BEGIN
+           UPDATE documents SET blocks_version = blocks_version + 1
+           WHERE id IN (OLD.document_id, NEW.document_id);
+           UPDATE blocks SET change_seq = (SELECT blocks_version FROM documents WHERE id = NEW.document_id)
+           WHERE id = NEW.id;
+       END''',
+    # No tombstone is written when the whole document is being deleted
+    '''CREATE TRIGGER IF NOT EXISTS trg_blocks_version_delete AFTER DELETE ON blocks
+       BEGIN
+           UPDATE documents SET blocks_version = blocks_version + 1 WHERE id = OLD.document_id;
+           INSERT INTO block_tombstones (block_id, document_id, change_seq)
+           SELECT OLD.id, OLD.document_id, blocks_version FROM documents WHERE id = OLD.document_id;
+       END'''
+]
+
+def search_text_sql(row):
+    """SQL expression for the searchable text of a block row (e.g. NEW, or a table alias).
+    
+    Tables are indexed by their cell text and images by their caption, so
+    JSON keys and image URLs do not match searches. Pure SQL, so triggers
+    index rows written by any connection.
+    """
+    return f"""CASE
+        WHEN {row}.block_type = 'table' THEN
+            CASE WHEN json_valid({row}.content)
+                 THEN coalesce((SELECT group_concat(atom, ' ') FROM json_tree({row}.content, '$.data') WHERE atom IS NOT NULL), '')
+                 ELSE '' END
+        WHEN {row}.block_type = 'image' THEN
+            CASE WHEN json_valid({row}.content)
+                 THEN coalesce(json_extract({row}.content, '$.caption'), '')
+                 ELSE '' END
+        WHEN {row}.block_type = 'divider' THEN ''
+        ELSE {row}.content
+    END"""
+
+# Full-text index over document titles and block text. Block rows use the
+# block ID as rowid and title rows TITLE_ROWID_BASE plus the document ID, so
+# newest-first (rowid DESC) order lists titles before blocks. owner holds
+# 'u<user_id>' so a search is scoped to one user inside the MATCH itself.
+# Prefixes of two to four characters are indexed for search-as-you-type.
+TITLE_ROWID_BASE = 1 << 62
+
+SEARCH_INDEX_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+           title, body, owner, document_id UNINDEXED, block_id UNINDEXED,
+           tokenize = 'unicode61 remove_diacritics 2',
+           prefix = '2 3 4'
+       )""",
+    # Title matches rank above body matches; owner never contributes
+    "INSERT INTO search_index (search_index, rank) VALUES ('rank', 'bm25(5.0, 1.0, 0.0)')",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_search_block_insert AFTER INSERT ON blocks
+        BEGIN
+            INSERT INTO search_index (rowid, title, body, owner, document_id, block_id)
+            SELECT NEW.id, '', {search_text_sql('NEW')}, 'u' || d.user_id, NEW.document_id, NEW.id
+            FROM documents d WHERE d.id = NEW.document_id;
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_search_block_update AFTER UPDATE OF content, block_type, document_id ON blocks
+        BEGIN
+            DELETE FROM search_index WHERE rowid = OLD.id;
+            INSERT INTO search_index (rowid, title, body, owner, document_id, block_id)
+            SELECT NEW.id, '', {search_text_sql('NEW')}, 'u' || d.user_id, NEW.document_id, NEW.id
+            FROM documents d WHERE d.id = NEW.document_id;
+        END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_search_block_delete AFTER DELETE ON blocks
+       BEGIN
+           DELETE FROM search_index WHERE rowid = OLD.id;
+       END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_search_document_insert AFTER INSERT ON documents
+       BEGIN
+           INSERT INTO search_index (rowid, title, body, owner, document_id, block_id)
+           VALUES ({TITLE_ROWID_BASE} + NEW.id, NEW.title, '', 'u' || NEW.user_id, NEW.id, NULL);
+       END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_search_document_update AFTER UPDATE OF title, user_id ON documents
+       BEGIN
+           DELETE FROM search_index WHERE rowid = {TITLE_ROWID_BASE} + OLD.id;
+           INSERT INTO search_index (rowid, title, body, owner, document_id, block_id)
+           VALUES ({TITLE_ROWID_BASE} + NEW.id, NEW.title, '', 'u' || NEW.user_id, NEW.id, NULL);
+       END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_search_document_delete AFTER DELETE ON documents
+       BEGIN
+           DELETE FROM search_index WHERE rowid = {TITLE_ROWID_BASE} + OLD.id;
+       END"""
+]
+
+def create_search_index(conn):
+    """Create the full-text search index and its triggers, if SQLite has FTS5.
+    
+    Returns False when FTS5 is unavailable; search then falls back to LIKE.
+    """
+    try:
+        conn.execute('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)')
+        conn.execute('DROP TABLE temp.fts5_probe')
+    except sqlite3.OperationalError:
+        print("SQLite was built without FTS5; search will use LIKE queries")
+        return False
+    for statement in SEARCH_INDEX_SCHEMA:
+        conn.execute(statement)
+    return True
+
+def rebuild_search_index(conn):
+    """Re-index every document title and block from scratch."""
+    conn.execute('DELETE FROM search_index')
+    conn.execute(
+        f"""INSERT INTO search_index (rowid, title, body, owner, document_id, block_id)
+            SELECT {TITLE_ROWID_BASE} + id, title, '', 'u' || user_id, id, NULL FROM documents"""
+    )
+    conn.execute(
+        f"""INSERT INTO search_index (rowid, title, body, owner, document_id, block_id)
+            SELECT b.id, '', {search_text_sql('b')}, 'u' || d.user_id, b.document_id, b.id
+            FROM blocks b JOIN documents d ON d.id = b.document_id"""
+    )
+    conn.execute("INSERT INTO search_index (search_index) VALUES ('optimize')")
 
 def init_db():
     """Initialize the database with schema on first run."""
@@ -70,6 +691,7 @@ def init_db():
                 user_id INTEGER NOT NULL,
                 title TEXT NOT NULL,
                 folder_id INTEGER,
+                blocks_version INTEGER NOT NULL DEFAULT 0,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
@@ -85,23 +707,44 @@ def init_db():
                 content TEXT NOT NULL DEFAULT '',
                 block_type TEXT NOT NULL DEFAULT 'paragraph',
                 order_index INTEGER NOT NULL,
+                change_seq INTEGER NOT NULL DEFAULT 0,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (document_id) REFERENCES documents(id) ON DELETE CASCADE
             )
         ''')
         
+        # Create block tombstones table (deleted blocks, for change feeds)
+        cursor.execute('''
+            CREATE TABLE block_tombstones (
+                block_id INTEGER PRIMARY KEY,
+                document_id INTEGER NOT NULL,
+                change_seq INTEGER NOT NULL,
+                deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (document_id) REFERENCES documents(id) ON DELETE CASCADE
+            )
+        ''')
+        
         # Create indexes for foreign keys and frequently queried columns
         cursor.execute('CREATE INDEX idx_folders_user_id ON folders(user_id)')
         cursor.execute('CREATE INDEX idx_folders_parent_id ON folders(parent_folder_id)')
         cursor.execute('CREATE INDEX idx_documents_user_id ON documents(user_id)')
         cursor.execute('CREATE INDEX idx_documents_folder_id ON documents(folder_id)')
+        cursor.execute('CREATE INDEX idx_folders_user_parent_name ON folders(user_id, parent_folder_id, name)')
+        cursor.execute('CREATE INDEX idx_documents_user_folder_title ON documents(user_id, folder_id, title)')
         cursor.execute('CREATE INDEX idx_blocks_document_id ON blocks(document_id)')
         cursor.execute('CREATE INDEX idx_blocks_order ON blocks(document_id, order_index)')
+        cursor.execute('CREATE INDEX idx_blocks_changes ON blocks(document_id, change_seq)')
+        cursor.execute('CREATE INDEX idx_block_tombstones_changes ON block_tombstones(document_id, change_seq)')
+        
+        for trigger in BLOCKS_VERSION_TRIGGERS:
+            cursor.execute(trigger)
+        
+        create_search_index(conn)
         
         conn.commit()
         print(f"Database initialized successfully at {DATABASE_PATH}")
-        
+    
     except sqlite3.Error as e:
         conn.rollback()
         print(f"Error initializing database: {e}")
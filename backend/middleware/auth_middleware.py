@@ -18,29 +18,55 @@ def require_auth(f):
         if len(parts) != 2 or parts[0].lower() != 'bearer':
             return jsonify({'error': 'Invalid authorization header format'}), 401
         
-        token = parts[1]
-        
-        try:
-            # Verify token
-            payload = AuthService.verify_token(token)
-            
-            # Get user from database
-            user = UserRepository.find_by_id(payload['user_id'])
-            if not user:
-                return jsonify({'error': 'User not found'}), 401
-            
-            # Attach user to request context
-            g.user = user
-            g.user_id = user.id
-            
-            return f(*args, **kwargs)
-            
-        except ValueError as e:
-            error_message = str(e)
-            if 'expired' in error_message.lower():
-                return jsonify({'error': 'Token expired'}), 401
-            return jsonify({'error': 'Invalid token'}), 401
-        except Exception as e:
-            return jsonify({'error': 'Authentication failed'}), 401
+        return _call_authenticated(lambda: AuthService.verify_token(parts[1]), f, *args, **kwargs)
     
     return decorated_function
+
+def require_stream_auth(f):
+    """Like require_auth, but also accepts a stream ticket as a `ticket` query parameter.
+    
+    For EventSource streams, which cannot send an Authorization header.
+    Tickets come from POST /api/documents/<id>/events/ticket and only open
+    that document's stream, so one left in a log is of little use.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        auth_header = request.headers.get('Authorization')
+        if auth_header:
+            return require_auth(f)(*args, **kwargs)
+        
+        ticket = request.args.get('ticket')
+        if not ticket:
+            return jsonify({'error': 'Authentication required'}), 401
+        
+        document_id = kwargs.get('document_id')
+        return _call_authenticated(lambda: AuthService.verify_stream_ticket(ticket, document_id),
+                                   f, *args, **kwargs)
+    
+    return decorated_function
+
+def _call_authenticated(verify, f, *args, **kwargs):
+    try:
+        # Verify token
+        payload = verify()
+        
+        # Get user (served from the in-process user cache when possible)
+        user = UserRepository.find_by_id_cached(payload['user_id'])
+        if not user:
+            return jsonify({'error': 'User not found'}), 401
+        
+        # Attach user to request context
+        g.user = user
+        g.user_id = user.id
+        # A stream ticket carries the expiry of the token it was issued for
+        g.token_exp = payload.get('session_exp', payload.get('exp'))
+        
+        return f(*args, **kwargs)
+    
+    except ValueError as e:
+        error_message = str(e)
+        if 'expired' in error_message.lower():
+            return jsonify({'error': 'Token expired'}), 401
+        return jsonify({'error': 'Invalid token'}), 401
+    except Exception as e:
+        return jsonify({'error': 'Authentication failed'}), 401
@@ -0,0 +1,94 @@
+"""Migration to record per-block change sequences and delete tombstones.
+
+Adds blocks.change_seq and the block_tombstones table, and recreates the
+blocks_version triggers so every insert, update and delete is stamped with
+the document version it produced. GET /api/documents/<id>/changes?since=
+uses them to return only what changed. Adds blocks_version too if
+add_blocks_version has not been run.
+Existing blocks keep change_seq 0 and are only returned in full loads.
+"""
+import sqlite3
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from backend.database import get_db_connection, DATABASE_PATH
+
+# The triggers as of this migration, kept here so that later changes to
+# database.BLOCKS_VERSION_TRIGGERS cannot break it
+TRIGGERS = [
+    '''CREATE TRIGGER IF NOT EXISTS trg_blocks_version_insert AFTER INSERT ON blocks
+       BEGIN
+           UPDATE documents SET blocks_version = blocks_version + 1 WHERE id = NEW.document_id;
+           UPDATE blocks SET change_seq = (SELECT blocks_version FROM documents WHERE id = NEW.document_id)
+           WHERE id = NEW.id;
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_blocks_version_update AFTER UPDATE OF content, block_type, document_id ON blocks
+       BEGIN
+           UPDATE documents SET blocks_version = blocks_version + 1
+           WHERE id IN (OLD.document_id, NEW.document_id);
+           UPDATE blocks SET change_seq = (SELECT blocks_version FROM documents WHERE id = NEW.document_id)
+           WHERE id = NEW.id;
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_blocks_version_delete AFTER DELETE ON blocks
+       BEGIN
+           UPDATE documents SET blocks_version = blocks_version + 1 WHERE id = OLD.document_id;
+           INSERT INTO block_tombstones (block_id, document_id, change_seq)
+           SELECT OLD.id, OLD.document_id, blocks_version FROM documents WHERE id = OLD.document_id;
+       END'''
+]
+
+def migrate():
+    """Add change_seq to blocks, create block_tombstones and recreate the triggers."""
+    if not os.path.exists(DATABASE_PATH):
+        print("Database does not exist. Run init_db first.")
+        return
+    
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        # Check if column already exists
+        cursor.execute("PRAGMA table_info(blocks)")
+        columns = [col[1] for col in cursor.fetchall()]
+        
+        if 'change_seq' not in columns:
+            cursor.execute('ALTER TABLE blocks ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0')
+        
+        # The triggers bump blocks_version, so add it in case add_blocks_version was skipped
+        cursor.execute("PRAGMA table_info(documents)")
+        if 'blocks_version' not in [col[1] for col in cursor.fetchall()]:
+            cursor.execute('ALTER TABLE documents ADD COLUMN blocks_version INTEGER NOT NULL DEFAULT 0')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS block_tombstones (
+                block_id INTEGER PRIMARY KEY,
+                document_id INTEGER NOT NULL,
+                change_seq INTEGER NOT NULL,
+                deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (document_id) REFERENCES documents(id) ON DELETE CASCADE
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_blocks_changes ON blocks(document_id, change_seq)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_block_tombstones_changes ON block_tombstones(document_id, change_seq)')
+        
+        # Replace the triggers from add_blocks_version with the ones that stamp change_seq
+        for name in ('trg_blocks_version_insert', 'trg_blocks_version_update', 'trg_blocks_version_delete'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        for trigger in TRIGGERS:
+            cursor.execute(trigger)
+        
+        conn.commit()
+        print("Successfully added block change tracking")
+        
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"Error during migration: {e}")
+        raise
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,67 @@
+"""Migration to add documents.blocks_version and the triggers that maintain it.
+
+blocks_version is bumped on every block insert, update and delete and is
+served as the ETag of GET /api/documents/<id>/blocks, so a client that
+already has the current blocks gets a 304 after one indexed lookup.
+Run add_block_changes next to also record per-block change sequences.
+"""
+import sqlite3
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from backend.database import get_db_connection, DATABASE_PATH
+
+# The triggers as of this migration. database.BLOCKS_VERSION_TRIGGERS has
+# since grown to use tables added by later migrations, so it is not used here.
+TRIGGERS = [
+    '''CREATE TRIGGER IF NOT EXISTS trg_blocks_version_insert AFTER INSERT ON blocks
+       BEGIN
+           UPDATE documents SET blocks_version = blocks_version + 1 WHERE id = NEW.document_id;
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_blocks_version_update AFTER UPDATE OF content, block_type, document_id ON blocks
+       BEGIN
+           UPDATE documents SET blocks_version = blocks_version + 1
+           WHERE id IN (OLD.document_id, NEW.document_id);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_blocks_version_delete AFTER DELETE ON blocks
+       BEGIN
+           UPDATE documents SET blocks_version = blocks_version + 1 WHERE id = OLD.document_id;
+       END'''
+]
+
+def migrate():
+    """Add blocks_version column to documents table and create its triggers."""
+    if not os.path.exists(DATABASE_PATH):
+        print("Database does not exist. Run init_db first.")
+        return
+    
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        # Check if column already exists
+        cursor.execute("PRAGMA table_info(documents)")
+        columns = [col[1] for col in cursor.fetchall()]
+        
+        if 'blocks_version' not in columns:
+            cursor.execute('ALTER TABLE documents ADD COLUMN blocks_version INTEGER NOT NULL DEFAULT 0')
+        
+        # Triggers already replaced by add_block_changes are left as they are
+        for trigger in TRIGGERS:
+            cursor.execute(trigger)
+        
+        conn.commit()
+        print("Successfully added blocks_version to documents table")
+        
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"Error during migration: {e}")
+        raise
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    migrate()
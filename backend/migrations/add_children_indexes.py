@@ -0,0 +1,46 @@
+"""Migration to widen the tree indexes for paginated folder listings.
+
+GET /api/folders/<id>/children pages through a folder's contents in
+(name, id) order. Adding the name/title column to the (user_id, parent)
+indexes lets each page seek to the cursor and read rows already in order.
+The wider indexes replace the (user_id, parent) ones created by earlier
+versions of add_tree_indexes, which they cover; add_tree_indexes now
+creates the wider ones itself.
+"""
+import sqlite3
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from backend.database import get_db_connection, DATABASE_PATH
+
+def migrate():
+    """Replace the (user_id, parent) tree indexes with (user_id, parent, name) ones."""
+    if not os.path.exists(DATABASE_PATH):
+        print("Database does not exist. Run init_db first.")
+        return
+    
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_folders_user_parent_name ON folders(user_id, parent_folder_id, name)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_documents_user_folder_title ON documents(user_id, folder_id, title)')
+        cursor.execute('DROP INDEX IF EXISTS idx_folders_user_parent')
+        cursor.execute('DROP INDEX IF EXISTS idx_documents_user_folder')
+        cursor.execute('ANALYZE')
+        
+        conn.commit()
+        print("Successfully added folder children indexes")
+        
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"Error during migration: {e}")
+        raise
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,41 @@
+"""Migration to add the full-text search index.
+
+Creates the FTS5 search_index table and the triggers that keep it in step
+with documents and blocks, then indexes every existing title and block.
+Safe to re-run; it rebuilds the index from scratch. Does nothing if SQLite
+was built without FTS5, in which case search uses LIKE queries.
+"""
+import sqlite3
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from backend.database import get_db_connection, DATABASE_PATH, create_search_index, rebuild_search_index
+
+def migrate():
+    """Create search_index with its triggers and index existing content."""
+    if not os.path.exists(DATABASE_PATH):
+        print("Database does not exist. Run init_db first.")
+        return
+    
+    try:
+        conn = get_db_connection()
+        
+        if not create_search_index(conn):
+            return
+        rebuild_search_index(conn)
+        
+        conn.commit()
+        print("Successfully added full-text search index")
+    
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"Error during migration: {e}")
+        raise
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,49 @@
+"""Migration to add the composite indexes used by the document tree query.
+
+The sidebar tree starts from a user's top-level folders and documents
+(user_id = ? AND parent_folder_id / folder_id IS NULL). The single-column
+user_id indexes make SQLite scan every folder and document the user owns
+to find them; these indexes seek straight to the requested level.
+
+They are created in their final (user_id, parent, name/title) form, also
+used by the paginated folder listings (see add_children_indexes), so that
+running either migration leaves one index per table.
+"""
+import sqlite3
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from backend.database import get_db_connection, DATABASE_PATH
+
+def migrate():
+    """Create idx_folders_user_parent_name and idx_documents_user_folder_title if missing."""
+    if not os.path.exists(DATABASE_PATH):
+        print("Database does not exist. Run init_db first.")
+        return
+    
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_folders_user_parent_name ON folders(user_id, parent_folder_id, name)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_documents_user_folder_title ON documents(user_id, folder_id, title)')
+        # Narrower indexes created by an earlier version of this migration
+        cursor.execute('DROP INDEX IF EXISTS idx_folders_user_parent')
+        cursor.execute('DROP INDEX IF EXISTS idx_documents_user_folder')
+        cursor.execute('ANALYZE')
+        
+        conn.commit()
+        print("Successfully added document tree indexes")
+        
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"Error during migration: {e}")
+        raise
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,54 @@
+"""Migration to respace block order_index values with gaps.
+
+Blocks used to be numbered 0, 1, 2, ... so inserting between two blocks
+meant renumbering every later block. Block ordering now uses sparse keys
+spaced ORDER_INDEX_GAP apart; this migration renumbers existing documents
+so that inserts and moves only touch the moved block. Documents that are
+not migrated keep working and are renumbered lazily on the first insert
+that runs out of room.
+"""
+import sqlite3
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from backend.database import get_db_connection, DATABASE_PATH
+from backend.repositories.block_repository import ORDER_INDEX_GAP
+
+def migrate():
+    """Renumber every document's blocks as ORDER_INDEX_GAP, 2 * ORDER_INDEX_GAP, ..."""
+    if not os.path.exists(DATABASE_PATH):
+        print("Database does not exist. Run init_db first.")
+        return
+    
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT id, document_id FROM blocks ORDER BY document_id, order_index, id')
+        updates = []
+        position = 0
+        current_document = None
+        for row in cursor.fetchall():
+            if row['document_id'] != current_document:
+                current_document = row['document_id']
+                position = 0
+            position += 1
+            updates.append((position * ORDER_INDEX_GAP, row['id']))
+        
+        cursor.executemany('UPDATE blocks SET order_index = ? WHERE id = ?', updates)
+        
+        conn.commit()
+        print(f"Successfully respaced order_index for {len(updates)} blocks")
+        
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"Error during migration: {e}")
+        raise
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    migrate()
@@ -3,6 +3,8 @@ from datetime import datetime
 class Block:
     """Block model representing a content block."""
     
+    __slots__ = ('id', 'document_id', 'content', 'block_type', 'order_index', 'created_at', 'updated_at')
+    
     def __init__(self, id=None, document_id=None, content='', block_type='paragraph',
                  order_index=0, created_at=None, updated_at=None):
         self.id = id
@@ -3,6 +3,8 @@ from datetime import datetime
 class Document:
     """Document model representing a user document."""
     
+    __slots__ = ('id', 'user_id', 'title', 'folder_id', 'created_at', 'updated_at')
+    
     def __init__(self, id=None, user_id=None, title=None, folder_id=None,
                  created_at=None, updated_at=None):
         self.id = id
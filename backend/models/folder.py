@@ -3,6 +3,8 @@ from datetime import datetime
 class Folder:
     """Folder model representing a folder for organizing documents."""
     
+    __slots__ = ('id', 'user_id', 'name', 'parent_folder_id', 'created_at', 'updated_at')
+    
     def __init__(self, id=None, user_id=None, name=None, parent_folder_id=None,
                  created_at=None, updated_at=None):
         self.id = id
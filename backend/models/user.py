@@ -3,6 +3,8 @@ from datetime import datetime
 class User:
     """User model representing a user account."""
     
+    __slots__ = ('id', 'username', 'email', 'password_hash', 'is_admin', 'created_at', 'updated_at')
+    
     def __init__(self, id=None, username=None, email=None, password_hash=None, 
                  is_admin=False, created_at=None, updated_at=None):
         self.id = id
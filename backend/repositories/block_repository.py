@@ -1,104 +1,498 @@
-from backend.database import get_db
+import json
+import os
+from backend.database import execute_returning, get_db, statements
 from backend.models.block import Block
 
+# Spacing between consecutive order_index values. Blocks are ordered by
+# sparse integer keys so that inserting or moving a block only needs a key
+# between its new neighbours; a document is renumbered only when two
+# neighbours run out of room.
+ORDER_INDEX_GAP = 1024
+
+# Largest SQLite rowid; a page starting at an order_index without an ID
+# begins after every block at that position
+MAX_ROWID = 2 ** 63 - 1
+
+# Rows fetched per round trip when streaming a document's blocks
+BLOCK_FETCH_SIZE = int(os.environ.get('BLOCK_FETCH_SIZE', 500))
+
+# The JSON of Block.to_dict() built by SQLite from a blocks row, so list
+# endpoints can send rows without creating a model and dict for each one
+BLOCK_JSON_SQL = '''json_object(
+    'id', id, 'document_id', document_id, 'content', content, 'block_type', block_type,
+    'order_index', order_index, 'created_at', created_at, 'updated_at', updated_at
+)'''
+
+def order_index_between(prev_index, next_index):
+    """Return an order_index strictly between two neighbours, or None if there is no room.
+    
+    Either neighbour may be None for the start or end of the document.
+    """
+    if prev_index is None and next_index is None:
+        return ORDER_INDEX_GAP
+    if prev_index is None:
+        return next_index - ORDER_INDEX_GAP
+    if next_index is None:
+        return prev_index + ORDER_INDEX_GAP
+    if next_index - prev_index < 2:
+        return None
+    return (prev_index + next_index) // 2
+
+def _update_sql(where_sql):
+    """Build a single-statement block update restricted by where_sql.
+    
+    The new content is stored as given unless the block's resulting type is
+    in a JSON array of raw block types, in which case the raw content is.
+    """
+    return f'''UPDATE blocks SET
+               content = CASE
+                   WHEN :content IS NULL THEN content
+                   WHEN COALESCE(:block_type, block_type) IN (SELECT value FROM json_each(:raw_block_types))
+                       THEN :raw_content
+                   ELSE :content END,
+               block_type = COALESCE(:block_type, block_type),
+               updated_at = CURRENT_TIMESTAMP
+           WHERE {where_sql}
+           RETURNING *'''
+
+def _insert_sql(prev_sql):
+    """Build the slot-allocating INSERT placing a block after the row prev_sql selects."""
+    return f'''WITH prev AS ({prev_sql}),
+                next AS (
+                    SELECT order_index FROM blocks
+                    WHERE document_id = :document_id
+                      AND (order_index, id) > (SELECT order_index, id FROM prev)
+                    ORDER BY order_index ASC, id ASC LIMIT 1),
+                slot AS (
+                    SELECT CASE
+                        WHEN NOT EXISTS (SELECT 1 FROM prev) THEN
+                            CASE WHEN :after_block_id IS NOT NULL THEN NULL
+                                 ELSE COALESCE((SELECT MIN(order_index) FROM blocks
+                                                WHERE document_id = :document_id) - :gap, :gap)
+                            END
+                        WHEN NOT EXISTS (SELECT 1 FROM next) THEN (SELECT order_index FROM prev) + :gap
+                        WHEN (SELECT order_index FROM next) - (SELECT order_index FROM prev) >= 2 THEN
+                            ((SELECT order_index FROM prev) + (SELECT order_index FROM next)) / 2
+                    END AS order_index)
+            INSERT INTO blocks (document_id, content, block_type, order_index)
+            SELECT d.id, :content, :block_type, slot.order_index
+            FROM documents d, slot
+            WHERE d.id = :document_id AND d.user_id = :user_id AND slot.order_index IS NOT NULL
+            RETURNING *'''
+
+# Named statements, registered with backend.database.statements
+SQL = statements.register('blocks', {
+    'insert_after': _insert_sql(
+        'SELECT order_index, id FROM blocks WHERE id = :after_block_id AND document_id = :document_id'
+    ),
+    'insert_at_position': _insert_sql(
+        '''SELECT order_index, id FROM (
+               SELECT order_index, id FROM blocks WHERE document_id = :document_id
+               ORDER BY order_index ASC, id ASC LIMIT :position)
+           ORDER BY order_index DESC, id DESC LIMIT 1'''
+    ),
+    'insert_last': _insert_sql(
+        '''SELECT order_index, id FROM blocks WHERE document_id = :document_id
+           ORDER BY order_index DESC, id DESC LIMIT 1'''
+    ),
+    'can_insert': '''SELECT 1 FROM documents d
+        WHERE d.id = ? AND d.user_id = ?
+          AND (? IS NULL OR EXISTS (SELECT 1 FROM blocks WHERE id = ? AND document_id = d.id))''',
+    'find_by_id': 'SELECT * FROM blocks WHERE id = ?',
+    'find_by_id_for_user': '''SELECT b.* FROM blocks b
+        JOIN documents d ON d.id = b.document_id
+        WHERE b.id = ? AND d.user_id = ?''',
+    'exists': 'SELECT 1 FROM blocks WHERE id = ?',
+    'json_by_document': f'''SELECT {BLOCK_JSON_SQL} FROM blocks WHERE document_id = ?
+        ORDER BY order_index ASC, id ASC''',
+    'count_by_document': 'SELECT COUNT(*) FROM blocks WHERE document_id = ?',
+    'page_first': f'''SELECT order_index, id, {BLOCK_JSON_SQL} FROM blocks WHERE document_id = ?
+        ORDER BY order_index ASC, id ASC LIMIT ?''',
+    'page_after': f'''SELECT order_index, id, {BLOCK_JSON_SQL} FROM blocks
+        WHERE document_id = ? AND (order_index, id) > (?, ?)
+        ORDER BY order_index ASC, id ASC LIMIT ?''',
+    'document_version': 'SELECT user_id, blocks_version FROM documents WHERE id = ?',
+    'find_changed': '''SELECT * FROM blocks
+        WHERE document_id = ? AND change_seq > ?
+        ORDER BY order_index ASC, id ASC''',
+    'find_deleted': '''SELECT block_id FROM block_tombstones
+        WHERE document_id = ? AND change_seq > ?
+        ORDER BY change_seq ASC''',
+    'update_contents': '''UPDATE blocks SET content = COALESCE(?, content), block_type = COALESCE(?, block_type),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?''',
+    'update_owned': _update_sql(
+        'id = :block_id AND document_id IN (SELECT id FROM documents WHERE user_id = :user_id)'
+    ),
+    'update_in_document': _update_sql('id = :block_id AND document_id = :document_id'),
+    'delete_owned': '''DELETE FROM blocks
+        WHERE id = ?
+          AND document_id IN (SELECT id FROM documents WHERE user_id = ?)
+        RETURNING document_id''',
+    'delete_in_document': 'DELETE FROM blocks WHERE id = ? AND document_id = ?',
+    'ids_in_document': '''SELECT id FROM blocks
+        WHERE document_id = ? AND id IN (SELECT value FROM json_each(?))''',
+    'set_order_in_document': '''UPDATE blocks SET order_index = ?, change_seq = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND document_id = ?''',
+    'move': '''UPDATE blocks SET order_index = ?, change_seq = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND document_id = ?
+        RETURNING *''',
+    'in_document': 'SELECT 1 FROM blocks WHERE id = ? AND document_id = ?',
+    'first_index_excluding': '''SELECT MIN(order_index) AS next_index FROM blocks
+        WHERE document_id = ? AND id != ?''',
+    'order_index_in_document': 'SELECT order_index FROM blocks WHERE id = ? AND document_id = ?',
+    'next_index_excluding': '''SELECT order_index FROM blocks
+        WHERE document_id = ? AND id != ? AND (order_index, id) > (?, ?)
+        ORDER BY order_index ASC, id ASC
+        LIMIT 1''',
+    'ids_in_order': 'SELECT id FROM blocks WHERE document_id = ? ORDER BY order_index ASC, id ASC',
+    'renumber': 'UPDATE blocks SET order_index = ?, change_seq = ? WHERE id = ?',
+    'bump_version': 'UPDATE documents SET blocks_version = blocks_version + 1 WHERE id = ? RETURNING blocks_version',
+})
+
 class BlockRepository:
     """Repository for block data access."""
     
     @staticmethod
-    def create(document_id, content='', block_type='paragraph', order_index=0):
-        """Create a new block."""
-        with get_db() as conn:
+    def create_in_document(document_id, user_id, content='', block_type='paragraph',
+                           after_block_id=None, position=None):
+        """Create a block, allocating its order_index inside the INSERT itself.
+        
+        The block is appended by default, placed directly after after_block_id,
+        or placed at a zero-based position (positions past the end append).
+        The document ownership check and the neighbour lookup run in the same
+        statement as the insert, so concurrent creates cannot collide.
+        Returns a tuple of the new Block, or None if the document is not owned
+        by user_id or after_block_id is not in it, and the document's
+        renumbered (block_id, order_index) pairs if it had to be renumbered
+        first, else None.
+        """
+        renumbered = None
+        with get_db(write=True) as conn:
             cursor = conn.cursor()
-            cursor.execute(
-                '''INSERT INTO blocks (document_id, content, block_type, order_index) 
-                   VALUES (?, ?, ?, ?)''',
-                (document_id, content, block_type, order_index)
-            )
-            block_id = cursor.lastrowid
-            
-            cursor.execute('SELECT * FROM blocks WHERE id = ?', (block_id,))
-            row = cursor.fetchone()
-            return Block.from_row(row)
+            block = BlockRepository._insert_at(cursor, document_id, user_id, content,
+                                               block_type, after_block_id, position)
+            if block is None and BlockRepository._can_insert(cursor, document_id, user_id, after_block_id):
+                # The neighbours were adjacent keys; renumber and try again
+                renumbered = BlockRepository._rebalance(cursor, document_id)
+                block = BlockRepository._insert_at(cursor, document_id, user_id, content,
+                                                   block_type, after_block_id, position)
+            return block, renumbered
     
     @staticmethod
     def find_by_id(block_id):
         """Find block by ID."""
         with get_db() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM blocks WHERE id = ?', (block_id,))
+            cursor.execute(SQL['find_by_id'], (block_id,))
             row = cursor.fetchone()
             return Block.from_row(row)
     
     @staticmethod
-    def find_by_document(document_id):
-        """Find all blocks for a document ordered by order_index."""
+    def iter_json_by_document(document_id, batch_size=BLOCK_FETCH_SIZE):
+        """Yield a document's blocks in order as JSON text, in lists of at most batch_size.
+        
+        Rows are fetched as the caller consumes them, so memory use does not
+        grow with the document. The query runs on first iteration and its
+        connection is held until the generator is exhausted or closed; all
+        batches come from the same snapshot of the database.
+        """
         with get_db() as conn:
             cursor = conn.cursor()
-            cursor.execute(
-                'SELECT * FROM blocks WHERE document_id = ? ORDER BY order_index ASC',
-                (document_id,)
-            )
-            rows = cursor.fetchall()
-            return [Block.from_row(row) for row in rows]
+            cursor.row_factory = None
+            cursor.execute(SQL['json_by_document'], (document_id,))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [row[0] for row in rows]
     
     @staticmethod
-    def update(block_id, content=None, block_type=None):
-        """Update block content and/or type."""
+    def find_page(document_id, after_order=None, after_id=None, limit=100):
+        """Find up to limit blocks positioned after (after_order, after_id), and the block count.
+        
+        Seeks on the (document_id, order_index, id) order, so every page
+        costs the same however deep into the document it is. Without
+        after_id, starts after every block at after_order. Returns a tuple
+        of the document's total block count and (order_index, id, JSON text)
+        tuples for the blocks.
+        """
         with get_db() as conn:
             cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(SQL['count_by_document'], (document_id,))
+            total = cursor.fetchone()[0]
             
-            if content is not None and block_type is not None:
-                cursor.execute(
-                    '''UPDATE blocks SET content = ?, block_type = ?, 
-                       updated_at = CURRENT_TIMESTAMP WHERE id = ?''',
-                    (content, block_type, block_id)
-                )
-            elif content is not None:
+            if after_order is None:
+                cursor.execute(SQL['page_first'], (document_id, limit))
+            else:
                 cursor.execute(
-                    'UPDATE blocks SET content = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
-                    (content, block_id)
+                    SQL['page_after'],
+                    (document_id, after_order, after_id if after_id is not None else MAX_ROWID, limit)
                 )
-            elif block_type is not None:
-                cursor.execute(
-                    'UPDATE blocks SET block_type = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
-                    (block_type, block_id)
-                )
-            
-            cursor.execute('SELECT * FROM blocks WHERE id = ?', (block_id,))
+            return total, cursor.fetchall()
+    
+    @staticmethod
+    def update_many(updates):
+        """Write many blocks' content and/or type in one transaction.
+        
+        Args:
+            updates: List of tuples (block_id, content, block_type), where
+                None leaves that field unchanged
+        """
+        with get_db(write=True) as conn:
+            conn.cursor().executemany(
+                SQL['update_contents'],
+                [(content, block_type, block_id) for block_id, content, block_type in updates]
+            )
+    
+    @staticmethod
+    def find_by_id_for_user(block_id, user_id):
+        """Find a block by ID only if user_id owns its document."""
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(SQL['find_by_id_for_user'], (block_id, user_id))
             row = cursor.fetchone()
             return Block.from_row(row)
     
     @staticmethod
-    def delete(block_id):
-        """Delete block."""
+    def exists(block_id):
+        """Check whether a block exists."""
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(SQL['exists'], (block_id,))
+            return cursor.fetchone() is not None
+    
+    @staticmethod
+    def find_changes(document_id, user_id, since):
+        """Find the blocks written and deleted in a document after change sequence since.
+        
+        Returns None if the document does not exist, otherwise a tuple of the
+        owner's ID, the document's current version, the changed blocks in
+        document order and the IDs of deleted blocks (both empty unless
+        user_id is the owner).
+        """
         with get_db() as conn:
             cursor = conn.cursor()
-            cursor.execute('DELETE FROM blocks WHERE id = ?', (block_id,))
+            cursor.execute(SQL['document_version'], (document_id,))
+            document = cursor.fetchone()
+            if document is None:
+                return None
+            if document['user_id'] != user_id:
+                return document['user_id'], document['blocks_version'], [], []
+            
+            cursor.execute(SQL['find_changed'], (document_id, since))
+            blocks = [Block.from_row(row) for row in cursor.fetchall()]
+            cursor.execute(SQL['find_deleted'], (document_id, since))
+            deleted = [row['block_id'] for row in cursor.fetchall()]
+            return document['user_id'], document['blocks_version'], blocks, deleted
+    
+    @staticmethod
+    def update_owned(block_id, user_id, content=None, block_type=None,
+                     raw_content=None, raw_block_types=()):
+        """Update a block in one statement, only if user_id owns its document.
+        
+        `content` is stored unless the block's resulting type is one of
+        `raw_block_types`, in which case `raw_content` is stored instead, so
+        the caller does not need to load the current type first.
+        Returns the updated Block, or None if no owned block matched.
+        """
+        with get_db(write=True) as conn:
+            return BlockRepository._update(
+                conn.cursor(), 'update_owned', {'block_id': block_id, 'user_id': user_id},
+                content, block_type, raw_content, raw_block_types
+            )
+    
+    @staticmethod
+    def update_in_document(document_id, block_id, content=None, block_type=None,
+                           raw_content=None, raw_block_types=()):
+        """Update a block in one statement, only if it belongs to document_id.
+        
+        Same content handling as update_owned(); used once the caller has
+        already checked document ownership. Returns the updated Block, or None.
+        """
+        with get_db(write=True) as conn:
+            return BlockRepository._update(
+                conn.cursor(), 'update_in_document', {'block_id': block_id, 'document_id': document_id},
+                content, block_type, raw_content, raw_block_types
+            )
+    
+    @staticmethod
+    def delete_owned(block_id, user_id):
+        """Delete a block in one statement, only if user_id owns its document.
+        
+        Returns the deleted block's document ID, or None if nothing was deleted.
+        """
+        with get_db(write=True) as conn:
+            cursor = conn.cursor()
+            row = execute_returning(cursor, SQL['delete_owned'], (block_id, user_id), 'blocks', block_id)
+            return row['document_id'] if row else None
+    
+    @staticmethod
+    def delete_in_document(document_id, block_id):
+        """Delete a block only if it belongs to document_id."""
+        with get_db(write=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute(SQL['delete_in_document'], (block_id, document_id))
             return cursor.rowcount > 0
     
     @staticmethod
-    def reorder_blocks(block_orders):
-        """Update order_index for multiple blocks.
+    def reorder_in_document(document_id, block_orders):
+        """Validate and apply a reorder of a document's blocks in one transaction.
+        
+        Membership is checked with a single set-based query; if any block does
+        not belong to the document nothing is updated.
         
         Args:
+            document_id: ID of the document the blocks must belong to
             block_orders: List of tuples (block_id, new_order_index)
+        
+        Returns:
+            List of block IDs that are not in the document (empty on success)
         """
-        with get_db() as conn:
+        block_ids = [block_id for block_id, _ in block_orders]
+        with get_db(write=True) as conn:
             cursor = conn.cursor()
-            for block_id, order_index in block_orders:
-                cursor.execute(
-                    'UPDATE blocks SET order_index = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
-                    (order_index, block_id)
-                )
+            cursor.execute(SQL['ids_in_document'], (document_id, json.dumps(block_ids)))
+            found = {row['id'] for row in cursor.fetchall()}
+            missing = [block_id for block_id in block_ids if block_id not in found]
+            if missing:
+                return missing
+            
+            change_seq = BlockRepository._bump_version(cursor, document_id)
+            cursor.executemany(
+                SQL['set_order_in_document'],
+                [(order_index, change_seq, block_id, document_id) for block_id, order_index in block_orders]
+            )
+            return []
     
     @staticmethod
-    def get_max_order_index(document_id):
-        """Get the maximum order_index for a document."""
-        with get_db() as conn:
+    def move_after(document_id, block_id, after_block_id=None):
+        """Move a block directly after another block, or to the top if none is given.
+        
+        Only the moved block is written unless its new neighbours have no room
+        left between their keys, in which case the document is renumbered first.
+        Returns a tuple of the moved Block, or None if either block is not in
+        the document, and the renumbered (block_id, order_index) pairs or None
+        (see create_in_document()).
+        """
+        renumbered = None
+        with get_db(write=True) as conn:
             cursor = conn.cursor()
-            cursor.execute(
-                'SELECT MAX(order_index) as max_order FROM blocks WHERE document_id = ?',
-                (document_id,)
-            )
-            row = cursor.fetchone()
-            return row['max_order'] if row['max_order'] is not None else -1
+            neighbours = BlockRepository._neighbour_indexes(cursor, document_id, block_id, after_block_id)
+            if neighbours is None:
+                return None, None
+            
+            order_index = order_index_between(*neighbours)
+            if order_index is None:
+                renumbered = BlockRepository._rebalance(cursor, document_id)
+                neighbours = BlockRepository._neighbour_indexes(cursor, document_id, block_id, after_block_id)
+                order_index = order_index_between(*neighbours)
+            
+            change_seq = BlockRepository._bump_version(cursor, document_id)
+            row = execute_returning(cursor, SQL['move'], (order_index, change_seq, block_id, document_id),
+                                    'blocks', block_id)
+            return Block.from_row(row), renumbered
+    
+    @staticmethod
+    def _neighbour_indexes(cursor, document_id, block_id, after_block_id):
+        """Get the order_index values a block would sit between after a move.
+        
+        Returns (prev_index, next_index), either of which may be None, or
+        None if block_id or after_block_id is not in the document.
+        """
+        cursor.execute(SQL['in_document'], (block_id, document_id))
+        if cursor.fetchone() is None or after_block_id == block_id:
+            return None
+        
+        if after_block_id is None:
+            cursor.execute(SQL['first_index_excluding'], (document_id, block_id))
+            return None, cursor.fetchone()['next_index']
+        
+        cursor.execute(SQL['order_index_in_document'], (after_block_id, document_id))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        prev_index = row['order_index']
+        
+        cursor.execute(SQL['next_index_excluding'], (document_id, block_id, prev_index, after_block_id))
+        row = cursor.fetchone()
+        return prev_index, row['order_index'] if row else None
+    
+    @staticmethod
+    def _update(cursor, statement, where_params, content, block_type,
+                raw_content, raw_block_types):
+        """Run one of the single-statement block updates (see _update_sql())."""
+        row = execute_returning(
+            cursor,
+            SQL[statement],
+            {
+                **where_params,
+                'content': content,
+                'block_type': block_type,
+                'raw_content': raw_content,
+                'raw_block_types': json.dumps(list(raw_block_types)),
+            },
+            'blocks', where_params['block_id']
+        )
+        return Block.from_row(row)
+    
+    @staticmethod
+    def _insert_at(cursor, document_id, user_id, content, block_type, after_block_id, position):
+        """Run the slot-allocating INSERT; returns None if no row was inserted."""
+        if after_block_id is not None:
+            statement = 'insert_after'
+        elif position is not None:
+            statement = 'insert_at_position'
+        else:
+            statement = 'insert_last'
+        
+        row = execute_returning(
+            cursor,
+            SQL[statement],
+            {
+                'document_id': document_id,
+                'user_id': user_id,
+                'content': content,
+                'block_type': block_type,
+                'after_block_id': after_block_id,
+                'position': position,
+                'gap': ORDER_INDEX_GAP,
+            },
+            'blocks'
+        )
+        return Block.from_row(row)
+    
+    @staticmethod
+    def _can_insert(cursor, document_id, user_id, after_block_id):
+        """Check that the document is owned and the anchor block (if any) is in it."""
+        cursor.execute(
+            SQL['can_insert'],
+            (document_id, user_id, after_block_id, after_block_id)
+        )
+        return cursor.fetchone() is not None
+    
+    @staticmethod
+    def _rebalance(cursor, document_id):
+        """Renumber a document's blocks ORDER_INDEX_GAP apart, keeping their order.
+        
+        Returns the new (block_id, order_index) pairs, which callers must
+        pass on to subscribers since every block's key has changed.
+        """
+        cursor.execute(SQL['ids_in_order'], (document_id,))
+        block_ids = [row['id'] for row in cursor.fetchall()]
+        change_seq = BlockRepository._bump_version(cursor, document_id)
+        renumbered = [(block_id, (position + 1) * ORDER_INDEX_GAP)
+                      for position, block_id in enumerate(block_ids)]
+        cursor.executemany(
+            SQL['renumber'],
+            [(order_index, change_seq, block_id) for block_id, order_index in renumbered]
+        )
+        return renumbered
+    
+    @staticmethod
+    def _bump_version(cursor, document_id):
+        # Order-only updates are not counted by the blocks_version triggers,
+        # so the caller stamps the returned version on the rows it moves
+        row = execute_returning(cursor, SQL['bump_version'], (document_id,), 'documents', document_id)
+        return row['blocks_version'] if row else 0
@@ -1,5 +1,46 @@
-from backend.database import get_db
+import os
+from backend.database import call_after_commit, execute_returning, get_db, statements
 from backend.models.document import Document
+from backend.utils.cache import LRUCache
+
+# In-process cache of sidebar tree responses, keyed by (user_id, view...)
+TREE_CACHE_SIZE = int(os.environ.get('TREE_CACHE_SIZE', 1024))
+TREE_CACHE_TTL = float(os.environ.get('TREE_CACHE_TTL', 60))
+tree_cache = LRUCache(maxsize=TREE_CACHE_SIZE, ttl=TREE_CACHE_TTL)
+
+# Named statements, registered with backend.database.statements
+SQL = statements.register('documents', {
+    'insert': 'INSERT INTO documents (user_id, title, folder_id) VALUES (?, ?, ?) RETURNING *',
+    'find_by_id': 'SELECT * FROM documents WHERE id = ?',
+    'find_blocks_version': 'SELECT user_id, blocks_version FROM documents WHERE id = ?',
+    'find_tree': '''WITH RECURSIVE tree(id, name, parent_folder_id, level) AS (
+            SELECT id, name, parent_folder_id, 1
+            FROM folders
+            WHERE user_id = :user_id AND parent_folder_id IS :folder_id
+            UNION ALL
+            SELECT f.id, f.name, f.parent_folder_id, tree.level + 1
+            FROM folders f JOIN tree ON f.parent_folder_id = tree.id
+            WHERE :depth IS NULL OR tree.level < :depth
+        )
+        SELECT 0 AS kind, id, name, parent_folder_id AS parent_id, NULL AS updated_at, level,
+               CASE WHEN level = :depth
+                    THEN EXISTS (SELECT 1 FROM folders c WHERE c.parent_folder_id = tree.id)
+                    ELSE 0 END AS truncated
+        FROM tree
+        UNION ALL
+        SELECT 1, id, title, folder_id, updated_at, 0, 0
+        FROM documents
+        WHERE user_id = :user_id AND folder_id IS :folder_id
+        UNION ALL
+        SELECT 1, d.id, d.title, d.folder_id, d.updated_at, tree.level, 0
+        FROM tree JOIN documents d ON d.folder_id = tree.id
+        ORDER BY kind, level, id''',
+    'update': '''UPDATE documents SET title = COALESCE(?, title), folder_id = COALESCE(?, folder_id),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+        RETURNING *''',
+    'delete': 'DELETE FROM documents WHERE id = ? RETURNING user_id',
+})
 
 class DocumentRepository:
     """Repository for document data access."""
@@ -7,61 +48,79 @@ class DocumentRepository:
     @staticmethod
     def create(user_id, title, folder_id=None):
         """Create a new document."""
-        with get_db() as conn:
+        with get_db(write=True) as conn:
             cursor = conn.cursor()
-            cursor.execute(
-                '''INSERT INTO documents (user_id, title, folder_id) 
-                   VALUES (?, ?, ?)''',
-                (user_id, title, folder_id)
-            )
-            document_id = cursor.lastrowid
-            
-            cursor.execute('SELECT * FROM documents WHERE id = ?', (document_id,))
-            row = cursor.fetchone()
-            return Document.from_row(row)
+            row = execute_returning(cursor, SQL['insert'], (user_id, title, folder_id), 'documents')
+        DocumentRepository.invalidate_tree(user_id)
+        return Document.from_row(row)
     
     @staticmethod
     def find_by_id(document_id):
         """Find document by ID."""
         with get_db() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM documents WHERE id = ?', (document_id,))
+            cursor.execute(SQL['find_by_id'], (document_id,))
             row = cursor.fetchone()
             return Document.from_row(row)
     
     @staticmethod
-    def find_by_user(user_id):
-        """Find all documents for a user."""
+    def find_blocks_version(document_id):
+        """Return (owner_id, blocks_version) for a document, or None if it does not exist."""
         with get_db() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM documents WHERE user_id = ?', (user_id,))
-            rows = cursor.fetchall()
-            return [Document.from_row(row) for row in rows]
+            cursor.execute(SQL['find_blocks_version'], (document_id,))
+            row = cursor.fetchone()
+            return (row['user_id'], row['blocks_version']) if row else None
+    
+    @staticmethod
+    def find_tree(user_id, folder_id=None, depth=None):
+        """Load a user's folder/document tree in one query.
+        
+        Walks folders from folder_id (the root when None) with a recursive CTE
+        and joins their documents, returning only the columns the sidebar
+        needs. Folders are returned first, parents before children, followed
+        by documents. With depth, folders more than depth levels below the
+        starting point are skipped and `truncated` marks the deepest returned
+        folders that still have subfolders.
+        """
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                SQL['find_tree'],
+                {'user_id': user_id, 'folder_id': folder_id, 'depth': depth}
+            )
+            return cursor.fetchall()
     
     @staticmethod
     def update(document_id, title=None, folder_id=None):
         """Update document."""
-        with get_db() as conn:
+        with get_db(write=True) as conn:
             cursor = conn.cursor()
-            if title is not None:
-                cursor.execute(
-                    'UPDATE documents SET title = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
-                    (title, document_id)
-                )
-            if folder_id is not None:
-                cursor.execute(
-                    'UPDATE documents SET folder_id = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
-                    (folder_id, document_id)
-                )
+            if title is None and folder_id is None:
+                cursor.execute(SQL['find_by_id'], (document_id,))
+                return Document.from_row(cursor.fetchone())
             
-            cursor.execute('SELECT * FROM documents WHERE id = ?', (document_id,))
-            row = cursor.fetchone()
-            return Document.from_row(row)
+            row = execute_returning(cursor, SQL['update'], (title, folder_id, document_id),
+                                    'documents', document_id)
+        if row is not None:
+            DocumentRepository.invalidate_tree(row['user_id'])
+        return Document.from_row(row)
     
     @staticmethod
     def delete(document_id):
         """Delete document."""
-        with get_db() as conn:
+        with get_db(write=True) as conn:
             cursor = conn.cursor()
-            cursor.execute('DELETE FROM documents WHERE id = ?', (document_id,))
-            return cursor.rowcount > 0
+            row = execute_returning(cursor, SQL['delete'], (document_id,), 'documents', document_id)
+        if row is None:
+            return False
+        DocumentRepository.invalidate_tree(row['user_id'])
+        return True
+    
+    @staticmethod
+    def invalidate_tree(user_id):
+        """Drop a user's cached sidebar trees now and again once the write has committed."""
+        def evict():
+            tree_cache.invalidate_where(lambda key, value: key[0] == user_id)
+        evict()
+        call_after_commit(evict)
@@ -1,5 +1,52 @@
-from backend.database import get_db
+from backend.database import execute_returning, get_db, statements
 from backend.models.folder import Folder
+from backend.repositories.document_repository import DocumentRepository
+
+def _children_sql(after_kind):
+    """Build the find_children query for a page after a row of after_kind (-1 for the first page)."""
+    branches = []
+    if after_kind <= 0:
+        seek = 'AND (f.name, f.id) > (?, ?)' if after_kind == 0 else ''
+        branches.append(
+            f'''SELECT * FROM (
+                   SELECT 0 AS kind, f.id, f.name, f.parent_folder_id AS parent_id,
+                          NULL AS updated_at,
+                          (SELECT COUNT(*) FROM folders c WHERE c.parent_folder_id = f.id)
+                          + (SELECT COUNT(*) FROM documents d WHERE d.folder_id = f.id) AS child_count
+                   FROM folders f
+                   WHERE f.user_id = ? AND f.parent_folder_id IS ? {seek}
+                   ORDER BY f.name, f.id LIMIT ?
+               )'''
+        )
+    
+    seek = 'AND (d.title, d.id) > (?, ?)' if after_kind == 1 else ''
+    branches.append(
+        f'''SELECT * FROM (
+               SELECT 1 AS kind, d.id, d.title AS name, d.folder_id AS parent_id,
+                      d.updated_at, 0 AS child_count
+               FROM documents d
+               WHERE d.user_id = ? AND d.folder_id IS ? {seek}
+               ORDER BY d.title, d.id LIMIT ?
+           )'''
+    )
+    return ' UNION ALL '.join(branches) + ' ORDER BY kind, name, id LIMIT ?'
+
+# Named statements, registered with backend.database.statements
+SQL = statements.register('folders', {
+    'insert': 'INSERT INTO folders (user_id, name, parent_folder_id) VALUES (?, ?, ?) RETURNING *',
+    'find_by_id': 'SELECT * FROM folders WHERE id = ?',
+    'children': _children_sql(-1),
+    'children_after_folder': _children_sql(0),
+    'children_after_document': _children_sql(1),
+    'update': '''UPDATE folders SET name = COALESCE(?, name), parent_folder_id = COALESCE(?, parent_folder_id),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+        RETURNING *''',
+    'delete': 'DELETE FROM folders WHERE id = ? RETURNING user_id',
+})
+
+# find_children statement for each kind of row a page can start after
+CHILDREN_STATEMENTS = {-1: 'children', 0: 'children_after_folder', 1: 'children_after_document'}
 
 class FolderRepository:
     """Repository for folder data access."""
@@ -7,61 +54,65 @@ class FolderRepository:
     @staticmethod
     def create(user_id, name, parent_folder_id=None):
         """Create a new folder."""
-        with get_db() as conn:
+        with get_db(write=True) as conn:
             cursor = conn.cursor()
-            cursor.execute(
-                '''INSERT INTO folders (user_id, name, parent_folder_id) 
-                   VALUES (?, ?, ?)''',
-                (user_id, name, parent_folder_id)
-            )
-            folder_id = cursor.lastrowid
-            
-            cursor.execute('SELECT * FROM folders WHERE id = ?', (folder_id,))
-            row = cursor.fetchone()
-            return Folder.from_row(row)
+            row = execute_returning(cursor, SQL['insert'], (user_id, name, parent_folder_id), 'folders')
+        DocumentRepository.invalidate_tree(user_id)
+        return Folder.from_row(row)
     
     @staticmethod
     def find_by_id(folder_id):
         """Find folder by ID."""
         with get_db() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM folders WHERE id = ?', (folder_id,))
+            cursor.execute(SQL['find_by_id'], (folder_id,))
             row = cursor.fetchone()
             return Folder.from_row(row)
     
     @staticmethod
-    def find_by_user(user_id):
-        """Find all folders for a user."""
+    def find_children(user_id, folder_id=None, after=None, limit=50):
+        """Load one page of a folder's direct children (the root when folder_id is None).
+        
+        Subfolders come first, ordered by (name, id), then documents ordered by
+        (title, id). `after` is the (kind, name, id) of the last row of the
+        previous page, where kind is 0 for folders and 1 for documents; each
+        branch seeks past it on the (user_id, parent, name) indexes instead of
+        using OFFSET. Folder rows carry child_count, the number of subfolders
+        and documents directly inside them. Returns up to limit rows.
+        """
+        after_kind, after_name, after_id = after or (-1, None, None)
+        params = []
+        if after_kind <= 0:
+            params += [user_id, folder_id] + ([after_name, after_id] if after_kind == 0 else []) + [limit]
+        params += [user_id, folder_id] + ([after_name, after_id] if after_kind == 1 else []) + [limit]
+        
         with get_db() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM folders WHERE user_id = ?', (user_id,))
-            rows = cursor.fetchall()
-            return [Folder.from_row(row) for row in rows]
+            cursor.execute(SQL[CHILDREN_STATEMENTS[after_kind]], params + [limit])
+            return cursor.fetchall()
     
     @staticmethod
     def update(folder_id, name=None, parent_folder_id=None):
         """Update folder."""
-        with get_db() as conn:
+        with get_db(write=True) as conn:
             cursor = conn.cursor()
-            if name is not None:
-                cursor.execute(
-                    'UPDATE folders SET name = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
-                    (name, folder_id)
-                )
-            if parent_folder_id is not None:
-                cursor.execute(
-                    'UPDATE folders SET parent_folder_id = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
-                    (parent_folder_id, folder_id)
-                )
+            if name is None and parent_folder_id is None:
+                cursor.execute(SQL['find_by_id'], (folder_id,))
+                return Folder.from_row(cursor.fetchone())
             
-            cursor.execute('SELECT * FROM folders WHERE id = ?', (folder_id,))
-            row = cursor.fetchone()
-            return Folder.from_row(row)
+            row = execute_returning(cursor, SQL['update'], (name, parent_folder_id, folder_id),
+                                    'folders', folder_id)
+        if row is not None:
+            DocumentRepository.invalidate_tree(row['user_id'])
+        return Folder.from_row(row)
     
     @staticmethod
     def delete(folder_id):
         """Delete folder."""
-        with get_db() as conn:
+        with get_db(write=True) as conn:
             cursor = conn.cursor()
-            cursor.execute('DELETE FROM folders WHERE id = ?', (folder_id,))
-            return cursor.rowcount > 0
+            row = execute_returning(cursor, SQL['delete'], (folder_id,), 'folders', folder_id)
+        if row is None:
+            return False
+        DocumentRepository.invalidate_tree(row['user_id'])
+        return True
@@ -0,0 +1,120 @@
+import os
+from backend.database import get_db
+
+# Highlight markers placed around matched terms in snippets
+MATCH_START = '\x02'
+MATCH_END = '\x03'
+
+# Queries matching more rows than this skip bm25 ranking, whose cost grows
+# with the number of matches, and list matching titles and then blocks
+# newest first instead
+SEARCH_RANK_LIMIT = int(os.environ.get('SEARCH_RANK_LIMIT', 5000))
+
+class SearchRepository:
+    """Repository for full-text search over document titles and blocks."""
+    
+    _has_index = None
+    
+    @staticmethod
+    def has_index():
+        """Check whether the FTS5 search index exists (cached per process)."""
+        if SearchRepository._has_index is None:
+            with get_db() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'"
+                )
+                SearchRepository._has_index = cursor.fetchone() is not None
+        return SearchRepository._has_index
+    
+    @staticmethod
+    def search(user_id, terms, limit=20):
+        """Find one user's titles and blocks containing every term with FTS5, best first.
+        
+        The last term also matches as a prefix while the words as typed
+        match fewer than limit rows. Returns rows with document_id, block_id
+        (None for title matches), title, block_type and snippet.
+        """
+        # Quoting makes FTS5 operators in user input plain words, and the
+        # column filter keeps terms from matching the owner column
+        exact_query = f'owner:u{user_id} AND {{title body}}: (' + ' '.join(f'"{term}"' for term in terms) + ')'
+        
+        with get_db() as conn:
+            cursor = conn.cursor()
+            
+            # Expanding a prefix of a common word is costly, so it is skipped
+            # when the words as typed already fill the page
+            exact_matches = SearchRepository._count_matches(cursor, exact_query)
+            if exact_matches >= limit:
+                query, matches = exact_query, exact_matches
+            else:
+                query = exact_query[:-1] + '*)'
+                matches = SearchRepository._count_matches(cursor, query)
+            
+            # bm25 needs statistics over every match, so even selecting rank
+            # is left out for broad queries
+            sort_key, direction = ('rank', 'ASC') if matches < SEARCH_RANK_LIMIT else ('rowid', 'DESC')
+            
+            # Snippets are built inside the FTS5 scan, only for the rows
+            # kept, before joining to documents and blocks
+            cursor.execute(
+                f'''SELECT m.document_id, m.block_id, d.title, b.block_type, m.snippet
+                   FROM (
+                       SELECT {sort_key} AS sort_key, document_id, block_id,
+                              snippet(search_index, -1, '{MATCH_START}', '{MATCH_END}', '…', 12) AS snippet
+                       FROM search_index
+                       WHERE search_index MATCH ?
+                       ORDER BY {sort_key} {direction} LIMIT ?
+                   ) m
+                   JOIN documents d ON d.id = m.document_id
+                   LEFT JOIN blocks b ON b.id = m.block_id
+                   ORDER BY m.sort_key {direction}''',
+                (query, limit)
+            )
+            return cursor.fetchall()
+    
+    @staticmethod
+    def _count_matches(cursor, query):
+        # Counting stops at SEARCH_RANK_LIMIT and, without ranking, is cheap
+        cursor.execute(
+            '''SELECT count(*) FROM (
+                   SELECT 1 FROM search_index WHERE search_index MATCH ? LIMIT ?
+               )''',
+            (query, SEARCH_RANK_LIMIT)
+        )
+        return cursor.fetchone()[0]
+    
+    @staticmethod
+    def search_like(user_id, terms, limit=20):
+        """Find titles and blocks containing every term with LIKE (no FTS5 available).
+        
+        Title matches come first, then blocks from the most recently updated
+        documents. Returns rows with document_id, block_id, title, block_type
+        and the matched text.
+        """
+        patterns = [
+            '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            for term in terms
+        ]
+        title_filter = ' AND '.join("d.title LIKE ? ESCAPE '\\'" for _ in patterns)
+        content_filter = ' AND '.join("b.content LIKE ? ESCAPE '\\'" for _ in patterns)
+        
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f'''SELECT document_id, block_id, title, block_type, text FROM (
+                       SELECT d.id AS document_id, NULL AS block_id, d.title, NULL AS block_type,
+                              d.title AS text, 0 AS title_match, d.updated_at
+                       FROM documents d
+                       WHERE d.user_id = ? AND {title_filter}
+                       UNION ALL
+                       SELECT d.id, b.id, d.title, b.block_type, b.content, 1, d.updated_at
+                       FROM documents d JOIN blocks b ON b.document_id = d.id
+                       WHERE d.user_id = ? AND b.block_type NOT IN ('image', 'divider')
+                         AND {content_filter}
+                   )
+                   ORDER BY title_match, updated_at DESC, block_id
+                   LIMIT ?''',
+                [user_id, *patterns, user_id, *patterns, limit]
+            )
+            return cursor.fetchall()
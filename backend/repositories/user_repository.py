@@ -1,5 +1,36 @@
-from backend.database import get_db
+import os
+from backend.database import call_after_commit, execute_returning, get_db, statements
 from backend.models.user import User
+from backend.utils.cache import LRUCache
+
+# In-process cache of user records for request authentication
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1024))
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 60))
+user_cache = LRUCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+# The JSON of User.to_dict() built by SQLite from a users row
+USER_JSON_SQL = '''json_object(
+    'id', id, 'username', username, 'email', email,
+    'is_admin', json(CASE WHEN is_admin THEN 'true' ELSE 'false' END),
+    'created_at', created_at, 'updated_at', updated_at
+)'''
+
+# Named statements, registered with backend.database.statements
+SQL = statements.register('users', {
+    'insert': '''INSERT INTO users (username, email, password_hash, is_admin) VALUES (?, ?, ?, ?)
+        RETURNING *''',
+    'find_by_id': 'SELECT * FROM users WHERE id = ?',
+    'find_by_email': 'SELECT * FROM users WHERE email = ?',
+    'find_by_username': 'SELECT * FROM users WHERE username = ?',
+    'find_all': 'SELECT * FROM users ORDER BY created_at DESC',
+    'find_all_json': f'SELECT {USER_JSON_SQL} FROM users ORDER BY created_at DESC',
+    'update_username': 'UPDATE users SET username = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+    'update_email': 'UPDATE users SET email = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+    'update_password': 'UPDATE users SET password_hash = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+    'replace_password_hash': 'UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?',
+    'update_admin_status': 'UPDATE users SET is_admin = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+    'delete': 'DELETE FROM users WHERE id = ?',
+})
 
 class UserRepository:
     """Repository for user data access."""
@@ -7,18 +38,10 @@ class UserRepository:
     @staticmethod
     def create(username, email, password_hash, is_admin=False):
         """Create a new user with parameterized query."""
-        with get_db() as conn:
+        with get_db(write=True) as conn:
             cursor = conn.cursor()
-            cursor.execute(
-                '''INSERT INTO users (username, email, password_hash, is_admin) 
-                   VALUES (?, ?, ?, ?)''',
-                (username, email, password_hash, 1 if is_admin else 0)
-            )
-            user_id = cursor.lastrowid
-            
-            # Fetch the created user
-            cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
-            row = cursor.fetchone()
+            row = execute_returning(cursor, SQL['insert'],
+                                    (username, email, password_hash, 1 if is_admin else 0), 'users')
             return User.from_row(row)
     
     @staticmethod
@@ -26,7 +49,7 @@ class UserRepository:
         """Find user by email using parameterized query."""
         with get_db() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM users WHERE email = ?', (email,))
+            cursor.execute(SQL['find_by_email'], (email,))
             row = cursor.fetchone()
             return User.from_row(row)
     
@@ -35,71 +58,100 @@ class UserRepository:
         """Find user by ID using parameterized query."""
         with get_db() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
+            cursor.execute(SQL['find_by_id'], (user_id,))
             row = cursor.fetchone()
             return User.from_row(row)
     
+    @staticmethod
+    def find_by_id_cached(user_id):
+        """Find user by ID, serving repeat lookups from the user cache."""
+        user = user_cache.get(user_id)
+        if user is None:
+            generation = user_cache.generation
+            user = UserRepository.find_by_id(user_id)
+            if user is not None:
+                user_cache.set(user_id, user, generation=generation)
+        return user
+    
     @staticmethod
     def find_by_username(username):
         """Find user by username using parameterized query."""
         with get_db() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
+            cursor.execute(SQL['find_by_username'], (username,))
             row = cursor.fetchone()
             return User.from_row(row)
     
     @staticmethod
     def update_username(user_id, username):
         """Update user's username."""
-        with get_db() as conn:
+        with get_db(write=True) as conn:
             cursor = conn.cursor()
-            cursor.execute(
-                'UPDATE users SET username = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
-                (username, user_id)
-            )
+            cursor.execute(SQL['update_username'], (username, user_id))
+        UserRepository._invalidate(user_id)
     
     @staticmethod
     def update_email(user_id, email):
         """Update user's email."""
-        with get_db() as conn:
+        with get_db(write=True) as conn:
             cursor = conn.cursor()
-            cursor.execute(
-                'UPDATE users SET email = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
-                (email, user_id)
-            )
+            cursor.execute(SQL['update_email'], (email, user_id))
+        UserRepository._invalidate(user_id)
     
     @staticmethod
     def update_password(user_id, password_hash):
         """Update user's password hash."""
-        with get_db() as conn:
+        with get_db(write=True) as conn:
             cursor = conn.cursor()
-            cursor.execute(
-                'UPDATE users SET password_hash = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
-                (password_hash, user_id)
-            )
+            cursor.execute(SQL['update_password'], (password_hash, user_id))
+        UserRepository._invalidate(user_id)
+    
+    @staticmethod
+    def replace_password_hash(user_id, old_hash, new_hash):
+        """Swap a password hash for an equivalent one, only if it has not changed since."""
+        with get_db(write=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute(SQL['replace_password_hash'], (new_hash, user_id, old_hash))
+            replaced = cursor.rowcount > 0
+        UserRepository._invalidate(user_id)
+        return replaced
     
     @staticmethod
     def delete(user_id):
         """Delete user account."""
-        with get_db() as conn:
+        with get_db(write=True) as conn:
             cursor = conn.cursor()
-            cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
-
+            cursor.execute(SQL['delete'], (user_id,))
+        UserRepository._invalidate(user_id)
+    
     @staticmethod
     def find_all():
         """Get all users."""
         with get_db() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM users ORDER BY created_at DESC')
+            cursor.execute(SQL['find_all'])
             rows = cursor.fetchall()
             return [User.from_row(row) for row in rows]
     
+    @staticmethod
+    def find_all_json():
+        """Get all users as JSON text, newest first, without building models."""
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(SQL['find_all_json'])
+            return [row[0] for row in cursor.fetchall()]
+    
     @staticmethod
     def update_admin_status(user_id, is_admin):
         """Update user's admin status."""
-        with get_db() as conn:
+        with get_db(write=True) as conn:
             cursor = conn.cursor()
-            cursor.execute(
-                'UPDATE users SET is_admin = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
-                (1 if is_admin else 0, user_id)
-            )
+            cursor.execute(SQL['update_admin_status'], (1 if is_admin else 0, user_id))
+        UserRepository._invalidate(user_id)
+    
+    @staticmethod
+    def _invalidate(user_id):
+        """Drop a cached user now and again once the write has committed."""
+        user_cache.invalidate(user_id)
+        call_after_commit(lambda: user_cache.invalidate(user_id))
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify, g
 from backend.services.account_service import AccountService
 from backend.middleware.auth_middleware import require_auth
+from backend.utils.password_hasher import HashingBusyError
 
 bp = Blueprint('account', __name__, url_prefix='/api/account')
 
@@ -75,6 +76,8 @@ def update_password():
         return jsonify({'message': 'Password updated successfully'}), 200
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
+    except HashingBusyError:
+        return jsonify({'error': 'Server busy, please try again'}), 503
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
 
@@ -91,5 +94,7 @@ def delete_account():
         return jsonify({'message': 'Account deleted successfully'}), 200
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
+    except HashingBusyError:
+        return jsonify({'error': 'Server busy, please try again'}), 503
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
@@ -1,6 +1,8 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from backend.services.admin_service import AdminService
 from backend.middleware.admin_middleware import require_admin
+from backend.utils.json_stream import stream_json_object
+from backend.utils.password_hasher import HashingBusyError
 
 bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
@@ -9,10 +11,8 @@ bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 def get_all_users():
     """Get all users (admin only)."""
     try:
-        users = AdminService.get_all_users()
-        return jsonify({
-            'users': [user.to_dict() for user in users]
-        }), 200
+        users = AdminService.get_all_users_json()
+        return Response(stream_json_object('users', [users]), mimetype='application/json'), 200
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
 
@@ -56,6 +56,8 @@ def create_user():
         }), 201
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
+    except HashingBusyError:
+        return jsonify({'error': 'Server busy, please try again'}), 503
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
 
@@ -99,3 +101,13 @@ def get_statistics():
         return jsonify(stats), 200
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
+
+@bp.route('/metrics', methods=['GET'])
+@require_admin
+def get_metrics():
+    """Get cache metrics (admin only)."""
+    try:
+        metrics = AdminService.get_metrics()
+        return jsonify(metrics), 200
+    except Exception as e:
+        return jsonify({'error': 'Internal server error'}), 500
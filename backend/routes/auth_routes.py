@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
 from backend.services.auth_service import AuthService
+from backend.utils.password_hasher import HashingBusyError
 
 bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
@@ -38,6 +39,8 @@ def register():
         
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
+    except HashingBusyError:
+        return jsonify({'error': 'Server busy, please try again'}), 503
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
 
@@ -70,6 +73,8 @@ def login():
         
     except ValueError as e:
         return jsonify({'error': str(e)}), 401
+    except HashingBusyError:
+        return jsonify({'error': 'Server busy, please try again'}), 503
     except Exception as e:
         print(f"Login error: {str(e)}")
         import traceback
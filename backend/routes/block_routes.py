@@ -1,25 +1,157 @@
-from flask import Blueprint, request, jsonify, g
-from backend.middleware.auth_middleware import require_auth
-from backend.services.block_service import BlockService
+import json
+import os
+import time
+from flask import Blueprint, Response, request, jsonify, g
+from backend.middleware.auth_middleware import require_auth, require_stream_auth
+from backend.services.auth_service import AuthService, STREAM_TICKET_SECONDS
+from backend.services.block_service import BlockService, BLOCK_PAGE_SIZE, MAX_BLOCK_PAGE_SIZE
+from backend.utils.conditional import not_modified, streamed_json_with_etag
+from backend.utils.event_broker import event_broker
+from backend.utils.json_stream import stream_json_object
+from backend.utils.write_buffer import FlushError
+
+# Idle event streams send a comment this often, which also detects closed connections
+SSE_HEARTBEAT_SECONDS = float(os.environ.get('SSE_HEARTBEAT_SECONDS', 15))
 
 bp = Blueprint('blocks', __name__, url_prefix='/api')
 
 @bp.route('/documents/<int:document_id>/blocks', methods=['GET'])
 @require_auth
 def get_blocks(document_id):
-    """Get all blocks for a document."""
+    """Get all blocks for a document, or one page of them with after_order/after_id/limit."""
+    try:
+        paged = any(name in request.args for name in ('after_order', 'after_id', 'limit'))
+        after_order = request.args.get('after_order', type=int)
+        after_id = request.args.get('after_id', type=int)
+        limit = request.args.get('limit', BLOCK_PAGE_SIZE, type=int)
+        if paged:
+            if limit < 1 or limit > MAX_BLOCK_PAGE_SIZE:
+                return jsonify({'error': f'limit must be between 1 and {MAX_BLOCK_PAGE_SIZE}'}), 400
+            if after_id is not None and after_order is None:
+                return jsonify({'error': 'after_id requires after_order'}), 400
+        
+        # A client holding the current version is answered before loading any block
+        version = BlockService.get_blocks_version(document_id, g.user_id)
+        etag = f'blocks-{document_id}-{version}'
+        if paged:
+            etag += f'-{after_order}-{after_id}-{limit}'
+        response = not_modified(etag)
+        if response is not None:
+            return response
+        
+        # Blocks come from the database as JSON text and are written out as is
+        if paged:
+            page = BlockService.get_blocks_page(document_id, after_order, after_id, limit)
+            chunks = stream_json_object(
+                'blocks', [page['blocks']],
+                total=page['total'], next_cursor=page['next_cursor'], version=version
+            )
+            return streamed_json_with_etag(list(chunks), etag), 200
+        
+        # Blocks are read and written out batch by batch as the response is
+        # sent. They may include writes made after version was read, which
+        # only makes a later revalidation or change sync redo some work.
+        batches = BlockService.iter_blocks_json(document_id)
+        chunks = stream_json_object('blocks', batches, version=version)
+        return streamed_json_with_etag(chunks, etag), 200
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    except PermissionError:
+        return jsonify({'error': 'Unauthorized'}), 403
+    except Exception as e:
+        return jsonify({'error': 'Internal server error'}), 500
+
+@bp.route('/documents/<int:document_id>/changes', methods=['GET'])
+@require_auth
+def get_changes(document_id):
+    """Get the blocks changed and deleted since a document version."""
     try:
-        blocks = BlockService.get_blocks_by_document(document_id, g.user_id)
+        since = request.args.get('since', type=int)
+        if since is None or since < 0:
+            return jsonify({'error': 'since must be a non-negative integer'}), 400
+        
+        changes = BlockService.get_changes(document_id, g.user_id, since)
         return jsonify({
-            'blocks': [block.to_dict() for block in blocks]
+            'since': changes['since'],
+            'version': changes['version'],
+            'blocks': [block.to_dict() for block in changes['blocks']],
+            'deleted': changes['deleted']
         }), 200
-        
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    except PermissionError:
+        return jsonify({'error': 'Unauthorized'}), 403
+    except Exception as e:
+        return jsonify({'error': 'Internal server error'}), 500
+
+@bp.route('/documents/<int:document_id>/events/ticket', methods=['POST'])
+@require_auth
+def create_stream_ticket(document_id):
+    """Issue a short-lived ticket for opening a document's event stream."""
+    try:
+        BlockService.get_blocks_version(document_id, g.user_id)
+        ticket = AuthService.generate_stream_ticket(g.user_id, document_id, g.token_exp)
+        return jsonify({'ticket': ticket, 'expires_in': STREAM_TICKET_SECONDS}), 201
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    except PermissionError:
+        return jsonify({'error': 'Unauthorized'}), 403
+    except Exception as e:
+        return jsonify({'error': 'Internal server error'}), 500
+
+@bp.route('/documents/<int:document_id>/events', methods=['GET'])
+@require_stream_auth
+def stream_events(document_id):
+    """Stream a document's block events as Server-Sent Events.
+    
+    Event types are created, updated, deleted, moved and reordered. A
+    resync event means events were dropped because the client fell behind;
+    the client should catch up through the changes endpoint.
+    """
+    try:
+        BlockService.get_blocks_version(document_id, g.user_id)
     except ValueError as e:
         return jsonify({'error': str(e)}), 404
     except PermissionError:
         return jsonify({'error': 'Unauthorized'}), 403
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
+    
+    # End the stream when the token expires; the client reconnects with a fresh ticket
+    expires_at = g.token_exp
+    user_id = g.user_id
+    
+    def generate():
+        subscription = event_broker.subscribe(document_id)
+        checked_at = time.monotonic()
+        try:
+            yield 'retry: 3000\n\n'
+            while expires_at is None or time.time() < expires_at:
+                events, dropped = subscription.get(timeout=SSE_HEARTBEAT_SECONDS)
+                if subscription.closed:
+                    break
+                # Check the user still exists once per heartbeat interval, so
+                # a deleted account stops receiving events
+                if time.monotonic() - checked_at >= SSE_HEARTBEAT_SECONDS:
+                    if AuthService.get_user(user_id) is None:
+                        break
+                    checked_at = time.monotonic()
+                if dropped:
+                    yield f'event: resync\ndata: {json.dumps({"dropped": dropped})}\n\n'
+                if not events and not dropped:
+                    yield ': keepalive\n\n'
+                for event in events:
+                    yield f'event: {event["type"]}\ndata: {json.dumps(event)}\n\n'
+        finally:
+            event_broker.unsubscribe(subscription)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
 @bp.route('/blocks', methods=['POST'])
 @require_auth
@@ -34,17 +166,20 @@ def create_block():
         document_id = data.get('document_id')
         content = data.get('content', '')
         block_type = data.get('block_type', 'paragraph')
+        after_block_id = data.get('after_block_id')
+        position = data.get('position')
         
         if not document_id:
             return jsonify({'error': 'document_id is required'}), 400
         
-        block = BlockService.create_block(document_id, g.user_id, content, block_type)
+        block = BlockService.create_block(document_id, g.user_id, content, block_type,
+                                          after_block_id, position)
         
         return jsonify({
             'message': 'Block created successfully',
             'block': block.to_dict()
         }), 201
-        
+    
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
     except PermissionError:
@@ -71,11 +206,13 @@ def update_block(block_id):
             'message': 'Block updated successfully',
             'block': block.to_dict()
         }), 200
-        
+    
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
     except PermissionError:
         return jsonify({'error': 'Unauthorized'}), 403
+    except FlushError:
+        return jsonify({'error': 'Block could not be saved yet, please try again'}), 503
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
 
@@ -87,7 +224,7 @@ def delete_block(block_id):
         BlockService.delete_block(block_id, g.user_id)
         
         return jsonify({'message': 'Block deleted successfully'}), 200
-        
+    
     except ValueError as e:
         return jsonify({'error': str(e)}), 404
     except PermissionError:
@@ -95,6 +232,30 @@ def delete_block(block_id):
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
 
+@bp.route('/blocks/<int:block_id>/move', methods=['PUT'])
+@require_auth
+def move_block(block_id):
+    """Move a block after another block (or to the top when after_block_id is null)."""
+    try:
+        data = request.get_json()
+        
+        if not data or 'after_block_id' not in data:
+            return jsonify({'error': 'after_block_id is required'}), 400
+        
+        block = BlockService.move_block(block_id, g.user_id, data['after_block_id'])
+        
+        return jsonify({
+            'message': 'Block moved successfully',
+            'block': block.to_dict()
+        }), 200
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except PermissionError:
+        return jsonify({'error': 'Unauthorized'}), 403
+    except Exception as e:
+        return jsonify({'error': 'Internal server error'}), 500
+
 @bp.route('/documents/<int:document_id>/blocks/reorder', methods=['PUT'])
 @require_auth
 def reorder_blocks(document_id):
@@ -110,11 +271,34 @@ def reorder_blocks(document_id):
         BlockService.reorder_blocks(document_id, g.user_id, block_order_list)
         
         return jsonify({'message': 'Blocks reordered successfully'}), 200
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except PermissionError:
+        return jsonify({'error': 'Unauthorized'}), 403
+    except Exception as e:
+        return jsonify({'error': 'Internal server error'}), 500
+
+@bp.route('/documents/<int:document_id>/blocks/batch', methods=['POST'])
+@require_auth
+def batch_blocks(document_id):
+    """Apply several block operations to a document in one request."""
+    try:
+        data = request.get_json()
+        
+        if not data or 'operations' not in data:
+            return jsonify({'error': 'operations array is required'}), 400
         
+        results = BlockService.apply_batch(document_id, g.user_id, data['operations'])
+        
+        return jsonify({'results': results}), 200
+    
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
     except PermissionError:
         return jsonify({'error': 'Unauthorized'}), 403
+    except FlushError:
+        return jsonify({'error': 'Blocks could not be saved yet, please try again'}), 503
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
 
@@ -170,7 +354,7 @@ def upload_image():
             'message': 'Image uploaded successfully',
             'url': image_url
         }), 200
-        
+    
     except Exception as e:
         print(f"Upload error: {str(e)}")
         import traceback
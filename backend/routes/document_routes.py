@@ -1,16 +1,32 @@
 from flask import Blueprint, request, jsonify, g
 from backend.middleware.auth_middleware import require_auth
-from backend.services.document_service import DocumentService
+from backend.services.document_service import DocumentService, CHILDREN_PAGE_SIZE, MAX_CHILDREN_PAGE_SIZE
+from backend.utils.conditional import content_etag, json_with_etag, not_modified
 
 bp = Blueprint('documents', __name__, url_prefix='/api')
 
 @bp.route('/documents', methods=['GET'])
 @require_auth
 def get_documents():
-    """Get all documents and folders for authenticated user."""
+    """Get documents and folders for authenticated user, optionally one subtree."""
     try:
-        result = DocumentService.get_user_documents(g.user_id)
-        return jsonify(result), 200
+        folder_id = request.args.get('folder_id', type=int)
+        depth = request.args.get('depth', type=int)
+        if depth is not None and depth < 1:
+            return jsonify({'error': 'Depth must be a positive integer'}), 400
+        
+        etag, result = DocumentService.get_cached_tree(
+            g.user_id, ('tree', folder_id, depth),
+            lambda: DocumentService.get_user_documents(g.user_id, folder_id, depth)
+        )
+        response = not_modified(etag)
+        if response is not None:
+            return response
+        return json_with_etag(result, etag), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    except PermissionError:
+        return jsonify({'error': 'Unauthorized'}), 403
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
 
@@ -20,7 +36,12 @@ def get_document(document_id):
     """Get a single document."""
     try:
         document = DocumentService.get_document(document_id, g.user_id)
-        return jsonify({'document': document.to_dict()}), 200
+        payload = {'document': document.to_dict()}
+        etag = content_etag(payload)
+        response = not_modified(etag)
+        if response is not None:
+            return response
+        return json_with_etag(payload, etag), 200
     except ValueError as e:
         return jsonify({'error': str(e)}), 404
     except PermissionError:
@@ -127,6 +148,38 @@ def create_folder():
     except Exception as e:
         return jsonify({'error': 'Internal server error'}), 500
 
+@bp.route('/folders/root/children', methods=['GET'])
+@bp.route('/folders/<int:folder_id>/children', methods=['GET'])
+@require_auth
+def get_folder_children(folder_id=None):
+    """Get one page of a folder's subfolders and documents."""
+    try:
+        limit = request.args.get('limit', CHILDREN_PAGE_SIZE, type=int)
+        if limit < 1 or limit > MAX_CHILDREN_PAGE_SIZE:
+            return jsonify({'error': f'limit must be between 1 and {MAX_CHILDREN_PAGE_SIZE}'}), 400
+        
+        cursor = request.args.get('cursor')
+        try:
+            after = DocumentService.decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        etag, result = DocumentService.get_cached_tree(
+            g.user_id, ('children', folder_id, after, limit),
+            lambda: DocumentService.get_folder_children(g.user_id, folder_id, after, limit)
+        )
+        response = not_modified(etag)
+        if response is not None:
+            return response
+        return json_with_etag(result, etag), 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    except PermissionError:
+        return jsonify({'error': 'Unauthorized'}), 403
+    except Exception as e:
+        return jsonify({'error': 'Internal server error'}), 500
+
 @bp.route('/folders/<int:folder_id>', methods=['DELETE'])
 @require_auth
 def delete_folder(folder_id):
@@ -0,0 +1,23 @@
+from flask import Blueprint, request, jsonify, g
+from backend.middleware.auth_middleware import require_auth
+from backend.services.search_service import SearchService, SEARCH_LIMIT, MAX_SEARCH_LIMIT
+
+bp = Blueprint('search', __name__, url_prefix='/api')
+
+@bp.route('/search', methods=['GET'])
+@require_auth
+def search():
+    """Search the authenticated user's document titles and blocks."""
+    try:
+        query = request.args.get('q', '')
+        limit = request.args.get('limit', SEARCH_LIMIT, type=int)
+        if limit < 1 or limit > MAX_SEARCH_LIMIT:
+            return jsonify({'error': f'limit must be between 1 and {MAX_SEARCH_LIMIT}'}), 400
+        
+        results = SearchService.search(g.user_id, query, limit)
+        return jsonify({'results': results}), 200
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': 'Internal server error'}), 500
@@ -78,4 +78,5 @@ class AccountService:
             raise ValueError('Password is incorrect')
         
         UserRepository.delete(user_id)
+        AuthService.revoke_cached_tokens(user_id)
         return True
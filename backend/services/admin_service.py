@@ -1,14 +1,19 @@
-from backend.repositories.user_repository import UserRepository
-from backend.services.auth_service import AuthService
+from backend.database import statements
+from backend.repositories.document_repository import tree_cache
+from backend.repositories.user_repository import UserRepository, user_cache
+from backend.services.auth_service import AuthService, token_cache
+from backend.services.block_service import block_write_buffer
+from backend.utils.event_broker import event_broker
+from backend.utils.password_hasher import hash_cost, password_hasher
 from backend.utils.security import sanitize_input, validate_email, validate_username
 
 class AdminService:
     """Service for admin operations."""
     
     @staticmethod
-    def get_all_users():
-        """Get all users (admin only)."""
-        return UserRepository.find_all()
+    def get_all_users_json():
+        """Get all users as JSON text (admin only)."""
+        return UserRepository.find_all_json()
     
     @staticmethod
     def get_user_by_id(user_id):
@@ -55,6 +60,8 @@ class AdminService:
             raise ValueError('User not found')
         
         UserRepository.update_admin_status(user_id, is_admin)
+        if user.is_admin and not is_admin:
+            AuthService.revoke_cached_tokens(user_id)
         return UserRepository.find_by_id(user_id)
     
     @staticmethod
@@ -65,14 +72,36 @@ class AdminService:
             raise ValueError('User not found')
         
         UserRepository.delete(user_id)
+        AuthService.revoke_cached_tokens(user_id)
         return True
     
     @staticmethod
     def get_user_statistics():
         """Get user statistics."""
         users = UserRepository.find_all()
+        
+        # Distribution of bcrypt cost factors across stored password hashes
+        cost_distribution = {}
+        for user in users:
+            cost = str(hash_cost(user.password_hash))
+            cost_distribution[cost] = cost_distribution.get(cost, 0) + 1
+        
         return {
             'total_users': len(users),
             'admin_users': len([u for u in users if u.is_admin]),
-            'regular_users': len([u for u in users if not u.is_admin])
+            'regular_users': len([u for u in users if not u.is_admin]),
+            'password_hash_costs': cost_distribution,
+            'current_password_hash_cost': password_hasher.cost
+        }
+    
+    @staticmethod
+    def get_metrics():
+        """Get in-process cache, statement cache, write buffer and event stream metrics."""
+        return {
+            'user_cache': user_cache.stats(),
+            'token_cache': token_cache.stats(),
+            'tree_cache': tree_cache.stats(),
+            'statement_cache': statements.stats(),
+            'block_write_buffer': block_write_buffer.stats(),
+            'event_streams': event_broker.stats()
         }
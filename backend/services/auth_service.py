@@ -1,29 +1,53 @@
-import bcrypt
+import hashlib
 import jwt
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from backend.database import commit_transaction
 from backend.repositories.user_repository import UserRepository
+from backend.utils.cache import LRUCache
+from backend.utils.password_hasher import password_hasher
 from backend.utils.security import sanitize_input, validate_email, validate_username
 
+logger = logging.getLogger(__name__)
+
 SECRET_KEY = 'dev-secret-key-change-in-production'
 TOKEN_EXPIRATION_HOURS = 24
 
+# Cache of verified token payloads keyed by token digest; entries expire at the token's exp
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', 4096))
+token_cache = LRUCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_EXPIRATION_HOURS * 3600)
+
+# Stream tickets open one document's event stream and are accepted nowhere
+# else, so unlike tokens they are safe to put in a URL
+STREAM_TICKET_SECONDS = int(os.environ.get('STREAM_TICKET_SECONDS', 30))
+
+# Background upgrades of password hashes made with an outdated cost factor
+_rehash_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='password-rehash')
+_rehash_pending = set()
+_rehash_lock = threading.Lock()
+
 class AuthService:
     """Service for authentication operations."""
     
     @staticmethod
     def hash_password(password):
-        """Hash password using bcrypt with cost factor 12."""
-        salt = bcrypt.gensalt(rounds=12)
-        password_hash = bcrypt.hashpw(password.encode('utf-8'), salt)
-        return password_hash.decode('utf-8')
+        """Hash password using bcrypt with the configured cost factor on the hashing pool.
+        
+        The request's transaction is committed first, so that it is not held
+        open for the whole bcrypt round.
+        """
+        commit_transaction()
+        return password_hasher.hash(password)
     
     @staticmethod
     def verify_password(password, password_hash):
-        """Verify password against hash."""
-        return bcrypt.checkpw(
-            password.encode('utf-8'), 
-            password_hash.encode('utf-8')
-        )
+        """Verify password against hash on the hashing pool (committing the request's transaction first)."""
+        commit_transaction()
+        return password_hasher.verify(password, password_hash)
     
     @staticmethod
     def generate_token(user_id, email):
@@ -39,14 +63,69 @@ class AuthService:
     
     @staticmethod
     def verify_token(token):
-        """Verify JWT token and return payload."""
+        """Verify JWT token and return payload.
+        
+        Verified payloads are cached by token digest until the token expires,
+        so repeat requests with the same token skip signature verification.
+        """
+        digest = hashlib.sha256(token.encode('utf-8')).digest()
+        payload = token_cache.get(digest)
+        if payload is not None:
+            return payload
+        
         try:
             payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            return payload
         except jwt.ExpiredSignatureError:
             raise ValueError('Token expired')
         except jwt.InvalidTokenError:
             raise ValueError('Invalid token')
+        if 'purpose' in payload:
+            raise ValueError('Invalid token')
+        
+        ttl = payload.get('exp', 0) - time.time()
+        if ttl > 0:
+            token_cache.set(digest, payload, ttl=ttl)
+        return payload
+    
+    @staticmethod
+    def generate_stream_ticket(user_id, document_id, session_exp):
+        """Generate a short-lived ticket for one document's event stream.
+        
+        session_exp is the expiry of the token the ticket is issued for; the
+        stream it opens ends then.
+        """
+        payload = {
+            'user_id': user_id,
+            'document_id': document_id,
+            'purpose': 'stream',
+            'session_exp': session_exp,
+            'exp': datetime.utcnow() + timedelta(seconds=STREAM_TICKET_SECONDS),
+            'iat': datetime.utcnow()
+        }
+        return jwt.encode(payload, SECRET_KEY, algorithm='HS256')
+    
+    @staticmethod
+    def verify_stream_ticket(ticket, document_id):
+        """Verify a stream ticket for a document and return its payload."""
+        try:
+            payload = jwt.decode(ticket, SECRET_KEY, algorithms=['HS256'])
+        except jwt.ExpiredSignatureError:
+            raise ValueError('Ticket expired')
+        except jwt.InvalidTokenError:
+            raise ValueError('Invalid ticket')
+        if payload.get('purpose') != 'stream' or payload.get('document_id') != document_id:
+            raise ValueError('Invalid ticket')
+        return payload
+    
+    @staticmethod
+    def get_user(user_id):
+        """Get the user a token was issued to, or None if the account is gone."""
+        return UserRepository.find_by_id_cached(user_id)
+    
+    @staticmethod
+    def revoke_cached_tokens(user_id):
+        """Purge cached token payloads for a user (e.g. on deletion or demotion)."""
+        token_cache.invalidate_where(lambda digest, payload: payload.get('user_id') == user_id)
     
     @staticmethod
     def register_user(username, email, password):
@@ -63,6 +142,9 @@ class AuthService:
         if not password or len(password) < 6:
             raise ValueError('Password must be at least 6 characters')
         
+        # Hash password before the first query, so no transaction is open meanwhile
+        password_hash = AuthService.hash_password(password)
+        
         # Check if user already exists
         existing_user = UserRepository.find_by_email(email)
         if existing_user:
@@ -72,8 +154,7 @@ class AuthService:
         if existing_username:
             raise ValueError('Username already taken')
         
-        # Hash password and create user
-        password_hash = AuthService.hash_password(password)
+        # Create user
         user = UserRepository.create(username, email, password_hash)
         
         return user
@@ -86,10 +167,14 @@ class AuthService:
         if not user:
             raise ValueError('Invalid credentials')
         
-        # Verify password
+        # Verify password, with the lookup's transaction already ended
         if not AuthService.verify_password(password, user.password_hash):
             raise ValueError('Invalid credentials')
         
+        # Upgrade hashes made with a lower cost factor without delaying login
+        if password_hasher.needs_rehash(user.password_hash):
+            AuthService._schedule_rehash(user.id, user.password_hash, password)
+        
         # Generate token
         token = AuthService.generate_token(user.id, user.email)
         
@@ -97,3 +182,26 @@ class AuthService:
             'token': token,
             'user': user.to_dict()
         }
+    
+    @staticmethod
+    def _schedule_rehash(user_id, old_hash, password):
+        """Rehash a password with the current cost in the background (at most once at a time per user)."""
+        with _rehash_lock:
+            if user_id in _rehash_pending:
+                return
+            _rehash_pending.add(user_id)
+        _rehash_executor.submit(AuthService._rehash, user_id, old_hash, password)
+    
+    @staticmethod
+    def _rehash(user_id, old_hash, password):
+        try:
+            new_hash = password_hasher.rehash(password)
+            # Only replace the hash the password was verified against, so a
+            # concurrent password change is never overwritten
+            UserRepository.replace_password_hash(user_id, old_hash, new_hash)
+        except Exception:
+            # Retried on the next successful login
+            logger.exception("Password rehash failed for user %s", user_id)
+        finally:
+            with _rehash_lock:
+                _rehash_pending.discard(user_id)
@@ -1,82 +1,311 @@
+import os
+import time
+from datetime import datetime, timezone
+from backend.database import call_after_commit, commit_transaction, write_transaction
 from backend.repositories.block_repository import BlockRepository
 from backend.repositories.document_repository import DocumentRepository
+from backend.utils.event_broker import event_broker
 from backend.utils.security import sanitize_input
+from backend.utils.write_buffer import FlushError, WriteBuffer
 
 VALID_BLOCK_TYPES = ['paragraph', 'heading1', 'heading2', 'heading3', 
                      'bullet_list', 'numbered_list', 'code', 'quote', 
                      'callout', 'toggle', 'divider', 'table', 'image']
 
+# Block types whose content is stored unsanitized (code, JSON tables and images)
+RAW_CONTENT_BLOCK_TYPES = ['code', 'table', 'image']
+
+# Operations accepted by the batch endpoint, and the most allowed per request
+BATCH_OPERATIONS = ['create', 'update', 'delete', 'move']
+MAX_BATCH_OPERATIONS = 500
+
+# Default and largest number of blocks per page of a document
+BLOCK_PAGE_SIZE = 200
+MAX_BLOCK_PAGE_SIZE = 1000
+
+# Optional write-behind buffer for block edits (BLOCK_WRITE_BUFFER=1). Edits
+# are answered once buffered, only each block's latest edit is kept, and
+# edits are written together every BLOCK_FLUSH_INTERVAL_MS milliseconds or
+# once BLOCK_FLUSH_MAX_OPS are waiting.
+BLOCK_WRITE_BUFFER = os.environ.get('BLOCK_WRITE_BUFFER', '0') == '1'
+BLOCK_FLUSH_INTERVAL_MS = float(os.environ.get('BLOCK_FLUSH_INTERVAL_MS', 200))
+BLOCK_FLUSH_MAX_OPS = int(os.environ.get('BLOCK_FLUSH_MAX_OPS', 1000))
+
+# When a buffered edit is answered: 'async' as soon as it is buffered (a
+# crash loses at most the last flush interval), 'commit' once the group
+# commit that wrote it is done. Seconds a 'commit' edit waits at most.
+WRITE_DURABILITY_MODES = ['async', 'commit']
+BLOCK_WRITE_DURABILITY = os.environ.get('BLOCK_WRITE_DURABILITY', 'async')
+BLOCK_FLUSH_TIMEOUT = 10
+
+if BLOCK_WRITE_DURABILITY not in WRITE_DURABILITY_MODES:
+    raise ValueError(f'BLOCK_WRITE_DURABILITY must be one of: {", ".join(WRITE_DURABILITY_MODES)}')
+
+class BufferedEdit:
+    """A block edit waiting in the write buffer; fields left None are not changed."""
+    
+    __slots__ = ('document_id', 'user_id', 'content', 'block_type')
+    
+    def __init__(self, document_id, user_id, content=None, block_type=None):
+        self.document_id = document_id
+        self.user_id = user_id
+        self.content = content
+        self.block_type = block_type
+
 class BlockService:
     """Service for block operations."""
     
     @staticmethod
-    def create_block(document_id, user_id, content='', block_type='paragraph'):
-        """Create a new block with automatic order_index assignment."""
+    def create_block(document_id, user_id, content='', block_type='paragraph',
+                     after_block_id=None, position=None):
+        """Create a new block, appended or at a requested place in the document.
+        
+        The order_index is allocated atomically by the insert: after
+        after_block_id if given, else at the zero-based position if given,
+        else after the last block.
+        """
         # Sanitize content (skip for code blocks, tables, and images which need raw content)
-        if block_type not in ['code', 'table', 'image']:
+        if block_type not in RAW_CONTENT_BLOCK_TYPES:
             content = sanitize_input(content)
         
-        # Verify document exists and user owns it
+        BlockService._validate_block_type(block_type)
+        BlockService._validate_placement(after_block_id, position)
+        
+        block, renumbered = BlockRepository.create_in_document(
+            document_id, user_id, content, block_type, after_block_id, position
+        )
+        if block:
+            BlockService._publish_renumbered(document_id, renumbered)
+            BlockService._publish(document_id, 'created', block=block.to_dict())
+            return block
+        
+        # Nothing was inserted: work out why
         document = DocumentRepository.find_by_id(document_id)
         if not document:
             raise ValueError('Document not found')
         if document.user_id != user_id:
             raise PermissionError('Unauthorized')
+        raise ValueError(f'Block {after_block_id} does not belong to this document')
+    
+    @staticmethod
+    def update_block(block_id, user_id, content=None, block_type=None):
+        """Update block content and/or type with a single ownership-checked write.
         
-        # Validate block type
-        if block_type not in VALID_BLOCK_TYPES:
-            raise ValueError(f'Invalid block type. Must be one of: {", ".join(VALID_BLOCK_TYPES)}')
+        With the write buffer enabled the edit is buffered instead (see
+        _buffer_update()).
+        """
+        # Validate block type if provided
+        if block_type:
+            BlockService._validate_block_type(block_type)
         
-        # Get next order_index
-        max_order = BlockRepository.get_max_order_index(document_id)
-        order_index = max_order + 1
+        if BLOCK_WRITE_BUFFER:
+            block, seq = BlockService._buffer_update(block_id, user_id, content, block_type or None)
+            if BLOCK_WRITE_DURABILITY == 'commit':
+                BlockService._wait_flushed([(block_id, seq)])
+            return block
         
-        return BlockRepository.create(document_id, content, block_type, order_index)
+        # The repository picks the sanitized or raw content based on the
+        # block's resulting type (code blocks, tables, and images stay raw)
+        block = BlockRepository.update_owned(
+            block_id, user_id,
+            content=sanitize_input(content) if content is not None else None,
+            block_type=block_type or None,
+            raw_content=content,
+            raw_block_types=RAW_CONTENT_BLOCK_TYPES
+        )
+        if not block:
+            raise BlockService._ownership_error(block_id)
+        BlockService._publish(block.document_id, 'updated', block=block.to_dict())
+        return block
     
     @staticmethod
-    def update_block(block_id, user_id, content=None, block_type=None):
-        """Update block content and/or type."""
-        # Verify block exists
-        block = BlockRepository.find_by_id(block_id)
-        if not block:
-            raise ValueError('Block not found')
+    def _buffer_update(block_id, user_id, content, block_type, document_id=None):
+        """Buffer an ownership-checked edit of a block, in document_id if given.
         
-        # Verify user owns the document
-        document = DocumentRepository.find_by_id(block.document_id)
-        if not document or document.user_id != user_id:
-            raise PermissionError('Unauthorized')
+        The edit is merged with the block's pending one, if any, and its
+        event is published once the request's transaction commits. Returns
+        the block as it will be written and the write's buffer sequence
+        number, for _wait_flushed().
+        """
+        block = BlockRepository.find_by_id_for_user(block_id, user_id)
+        if document_id is not None and (not block or block.document_id != document_id):
+            raise ValueError(f'Block {block_id} not found in this document')
+        if not block:
+            raise BlockService._ownership_error(block_id)
+        sanitized = sanitize_input(content) if content is not None else None
         
-        # Validate block type if provided
-        if block_type and block_type not in VALID_BLOCK_TYPES:
-            raise ValueError(f'Invalid block type. Must be one of: {", ".join(VALID_BLOCK_TYPES)}')
+        merged = None
+        def merge(pending):
+            nonlocal merged
+            pending = pending or BufferedEdit(block.document_id, user_id)
+            new_type = block_type or pending.block_type
+            if content is None:
+                new_content = pending.content
+            elif (new_type or block.block_type) in RAW_CONTENT_BLOCK_TYPES:
+                new_content = content
+            else:
+                new_content = sanitized
+            merged = BufferedEdit(block.document_id, user_id, new_content, new_type)
+            return merged
+        seq = block_write_buffer.put(block_id, merge)
         
-        # Determine which block type to check (new type if changing, or existing type)
-        check_type = block_type if block_type else block.block_type
+        if merged.content is not None:
+            block.content = merged.content
+        if merged.block_type is not None:
+            block.block_type = merged.block_type
+        block.updated_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        BlockService._publish(block.document_id, 'updated', block=block.to_dict())
         
-        # Sanitize content if provided (skip for code blocks, tables, and images)
-        if content is not None and check_type not in ['code', 'table', 'image']:
-            content = sanitize_input(content)
+        return block, seq
+    
+    @staticmethod
+    def _wait_flushed(writes):
+        """Commit the request's transaction, then wait for buffered writes, (block_id, seq) pairs, to be flushed."""
+        # The flush needs the write lock this request may be holding
+        commit_transaction()
+        deadline = time.monotonic() + BLOCK_FLUSH_TIMEOUT
+        for block_id, seq in writes:
+            if not block_write_buffer.wait_flushed(block_id, seq, max(0, deadline - time.monotonic())):
+                raise FlushError(f'Block {block_id} was not saved in time')
+    
+    @staticmethod
+    def flush_document_edits(document_id):
+        """Write a document's buffered edits in the current transaction.
         
-        return BlockRepository.update(block_id, content, block_type)
+        Called before the document's blocks are read, or written other than
+        through the buffer, so that they include every edit already answered.
+        """
+        if BLOCK_WRITE_BUFFER:
+            block_write_buffer.flush(lambda block_id, edit: edit.document_id == document_id)
+    
+    @staticmethod
+    def flush_user_edits(user_id):
+        """Write a user's buffered edits in the current transaction, e.g. before a search."""
+        if BLOCK_WRITE_BUFFER:
+            block_write_buffer.flush(lambda block_id, edit: edit.user_id == user_id)
+    
+    @staticmethod
+    def _write_buffered(edits):
+        """Write buffered edits, a dict of block ID to BufferedEdit, in one transaction."""
+        BlockRepository.update_many([
+            (block_id, edit.content, edit.block_type) for block_id, edit in edits.items()
+        ])
     
     @staticmethod
     def delete_block(block_id, user_id):
-        """Delete a block."""
-        # Verify block exists
-        block = BlockRepository.find_by_id(block_id)
+        """Delete a block with a single ownership-checked write."""
+        document_id = BlockRepository.delete_owned(block_id, user_id)
+        if document_id is None:
+            raise BlockService._ownership_error(block_id)
+        BlockService._publish(document_id, 'deleted', id=block_id)
+        return True
+    
+    @staticmethod
+    def move_block(block_id, user_id, after_block_id=None):
+        """Move a block after another block in its document (or to the top)."""
+        block = BlockRepository.find_by_id_for_user(block_id, user_id)
         if not block:
-            raise ValueError('Block not found')
+            raise BlockService._ownership_error(block_id)
+        
+        # The moved block is sent to subscribers with its content
+        BlockService.flush_document_edits(block.document_id)
+        moved, renumbered = BlockRepository.move_after(block.document_id, block_id, after_block_id)
+        if not moved:
+            raise ValueError(f'Block {after_block_id} does not belong to this document')
+        BlockService._publish_renumbered(moved.document_id, renumbered)
+        BlockService._publish(moved.document_id, 'moved', block=moved.to_dict())
+        return moved
+    
+    @staticmethod
+    def get_blocks_version(document_id, user_id):
+        """Get a document's block version (its change sequence) without loading the blocks."""
+        BlockService.flush_document_edits(document_id)
+        result = DocumentRepository.find_blocks_version(document_id)
+        if result is None:
+            raise ValueError('Document not found')
+        owner_id, version = result
+        if owner_id != user_id:
+            raise PermissionError('Unauthorized')
         
-        # Verify user owns the document
-        document = DocumentRepository.find_by_id(block.document_id)
-        if not document or document.user_id != user_id:
+        return version
+    
+    @staticmethod
+    def get_changes(document_id, user_id, since):
+        """Get the blocks written and deleted after change sequence since.
+        
+        Returns a dict with the document's current version, the changed
+        blocks and the IDs of deleted blocks.
+        """
+        BlockService.flush_document_edits(document_id)
+        result = BlockRepository.find_changes(document_id, user_id, since)
+        if result is None:
+            raise ValueError('Document not found')
+        owner_id, version, blocks, deleted = result
+        if owner_id != user_id:
             raise PermissionError('Unauthorized')
         
-        return BlockRepository.delete(block_id)
+        return {
+            'since': since,
+            'version': version,
+            'blocks': blocks,
+            'deleted': deleted
+        }
+    
+    @staticmethod
+    def iter_blocks_json(document_id):
+        """Iterate over a document's blocks as JSON text in batches, loading them lazily.
+        
+        Does not check access; callers check it first, e.g. with
+        get_blocks_version.
+        """
+        return BlockRepository.iter_json_by_document(document_id)
     
     @staticmethod
-    def get_blocks_by_document(document_id, user_id):
-        """Get all blocks for a document."""
+    def get_blocks_page(document_id, after_order=None, after_id=None, limit=BLOCK_PAGE_SIZE):
+        """Get one page of a document's blocks in order, as JSON text.
+        
+        Does not check access; callers check it first, e.g. with
+        get_blocks_version. Returns the blocks, the document's total block
+        count and a next_cursor holding the after_order and after_id of the
+        next page, which is None on the last page.
+        """
+        # Fetch one extra block to learn whether another page exists
+        total, rows = BlockRepository.find_page(document_id, after_order, after_id, limit + 1)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            order_index, block_id, _ = rows[-1]
+            next_cursor = {'after_order': order_index, 'after_id': block_id}
+        
+        return {
+            'blocks': [block_json for _, _, block_json in rows],
+            'total': total,
+            'next_cursor': next_cursor
+        }
+    
+    @staticmethod
+    def apply_batch(document_id, user_id, operations):
+        """Apply a list of block operations to one document.
+        
+        Document ownership is checked once for the whole batch and, inside a
+        request, every operation runs in the request's single transaction.
+        Operations are applied in order and each reports its own result, so
+        an invalid operation does not stop the ones after it.
+        
+        Args:
+            document_id: ID of the document
+            user_id: ID of the user
+            operations: List of dicts with an 'op' of create, update, delete
+                or move and that operation's fields
+        
+        Returns:
+            List of result dicts in the same order as operations
+        """
+        if not isinstance(operations, list):
+            raise ValueError('operations must be a list')
+        if len(operations) > MAX_BATCH_OPERATIONS:
+            raise ValueError(f'A batch may contain at most {MAX_BATCH_OPERATIONS} operations')
+        
         # Verify document exists and user owns it
         document = DocumentRepository.find_by_id(document_id)
         if not document:
@@ -84,7 +313,130 @@ class BlockService:
         if document.user_id != user_id:
             raise PermissionError('Unauthorized')
         
-        return BlockRepository.find_by_document(document_id)
+        # With the write buffer, updates are buffered like single edits, so
+        # pending edits cannot overwrite them later
+        results = []
+        buffered = []
+        for operation in operations:
+            try:
+                results.append(BlockService._apply_operation(document_id, user_id, operation, buffered))
+            except ValueError as e:
+                result = {'op': None, 'status': 'error', 'error': str(e)}
+                if isinstance(operation, dict):
+                    result['op'] = operation.get('op')
+                    if 'id' in operation:
+                        result['id'] = operation['id']
+                results.append(result)
+        
+        if BLOCK_WRITE_DURABILITY == 'commit' and buffered:
+            if len(buffered) == len([result for result in results if result['status'] == 'ok']):
+                # Only updates: they are grouped with concurrent edits like single ones
+                BlockService._wait_flushed(buffered)
+            else:
+                # Written in the batch's own transaction, with its other operations
+                BlockService.flush_document_edits(document_id)
+        return results
+    
+    @staticmethod
+    def _apply_operation(document_id, user_id, operation, buffered):
+        """Apply one batch operation to an already authorized document.
+        
+        Buffered updates add their (block_id, seq) to buffered.
+        """
+        if not isinstance(operation, dict):
+            raise ValueError('Each operation must be an object')
+        
+        op = operation.get('op')
+        if op not in BATCH_OPERATIONS:
+            raise ValueError(f'Invalid op. Must be one of: {", ".join(BATCH_OPERATIONS)}')
+        
+        if op == 'create':
+            content = operation.get('content', '')
+            block_type = operation.get('block_type', 'paragraph')
+            after_block_id = operation.get('after_block_id')
+            position = operation.get('position')
+            BlockService._validate_block_type(block_type)
+            BlockService._validate_placement(after_block_id, position)
+            if block_type not in RAW_CONTENT_BLOCK_TYPES:
+                content = sanitize_input(content)
+            
+            block, renumbered = BlockRepository.create_in_document(
+                document_id, user_id, content, block_type, after_block_id, position
+            )
+            if not block:
+                raise ValueError(f'Block {after_block_id} does not belong to this document')
+            BlockService._publish_renumbered(document_id, renumbered)
+            BlockService._publish(document_id, 'created', block=block.to_dict())
+            return {'op': op, 'status': 'ok', 'block': block.to_dict()}
+        
+        block_id = operation.get('id')
+        if not isinstance(block_id, int) or isinstance(block_id, bool):
+            raise ValueError('id is required')
+        
+        if op == 'update':
+            content = operation.get('content')
+            block_type = operation.get('block_type')
+            if block_type:
+                BlockService._validate_block_type(block_type)
+            if BLOCK_WRITE_BUFFER:
+                block, seq = BlockService._buffer_update(block_id, user_id, content, block_type or None, document_id)
+                buffered.append((block_id, seq))
+                return {'op': op, 'id': block_id, 'status': 'ok', 'block': block.to_dict()}
+            block = BlockRepository.update_in_document(
+                document_id, block_id,
+                content=sanitize_input(content) if content is not None else None,
+                block_type=block_type or None,
+                raw_content=content,
+                raw_block_types=RAW_CONTENT_BLOCK_TYPES
+            )
+        elif op == 'move':
+            # The moved block is sent to subscribers with its content
+            BlockService.flush_document_edits(document_id)
+            block, renumbered = BlockRepository.move_after(document_id, block_id, operation.get('after_block_id'))
+            BlockService._publish_renumbered(document_id, renumbered)
+        else:
+            if not BlockRepository.delete_in_document(document_id, block_id):
+                raise ValueError(f'Block {block_id} not found in this document')
+            BlockService._publish(document_id, 'deleted', id=block_id)
+            return {'op': op, 'id': block_id, 'status': 'ok'}
+        
+        if not block:
+            raise ValueError(f'Block {block_id} not found in this document')
+        BlockService._publish(document_id, 'updated' if op == 'update' else 'moved', block=block.to_dict())
+        return {'op': op, 'id': block_id, 'status': 'ok', 'block': block.to_dict()}
+    
+    @staticmethod
+    def _publish(document_id, event_type, **data):
+        """Send a block event to the document's live subscribers once the write commits."""
+        event = {'type': event_type, 'document_id': document_id, **data}
+        call_after_commit(lambda: event_broker.publish(document_id, event))
+    
+    @staticmethod
+    def _publish_renumbered(document_id, renumbered):
+        """Send the new order keys of a renumbered document as a 'reordered' event."""
+        if renumbered:
+            BlockService._publish(document_id, 'reordered', blocks=[
+                {'id': block_id, 'order_index': order_index} for block_id, order_index in renumbered
+            ])
+    
+    @staticmethod
+    def _validate_block_type(block_type):
+        if block_type not in VALID_BLOCK_TYPES:
+            raise ValueError(f'Invalid block type. Must be one of: {", ".join(VALID_BLOCK_TYPES)}')
+    
+    @staticmethod
+    def _validate_placement(after_block_id, position):
+        if after_block_id is not None and position is not None:
+            raise ValueError('Specify either after_block_id or position, not both')
+        if position is not None and (not isinstance(position, int) or isinstance(position, bool) or position < 0):
+            raise ValueError('position must be a non-negative integer')
+    
+    @staticmethod
+    def _ownership_error(block_id):
+        """Explain why an ownership-checked write matched no block."""
+        if BlockRepository.exists(block_id):
+            return PermissionError('Unauthorized')
+        return ValueError('Block not found')
     
     @staticmethod
     def reorder_blocks(document_id, user_id, block_order_list):
@@ -102,12 +454,29 @@ class BlockService:
         if document.user_id != user_id:
             raise PermissionError('Unauthorized')
         
-        # Verify all blocks belong to this document
+        # Validate payload shape before touching the database
+        if not isinstance(block_order_list, list):
+            raise ValueError('blocks must be a list')
+        block_orders = []
         for item in block_order_list:
-            block = BlockRepository.find_by_id(item['id'])
-            if not block or block.document_id != document_id:
-                raise ValueError(f'Block {item["id"]} does not belong to this document')
+            if (not isinstance(item, dict)
+                    or not isinstance(item.get('id'), int)
+                    or not isinstance(item.get('order_index'), int)):
+                raise ValueError('Each block must have an integer id and order_index')
+            block_orders.append((item['id'], item['order_index']))
         
-        # Update order
-        block_orders = [(item['id'], item['order_index']) for item in block_order_list]
-        BlockRepository.reorder_blocks(block_orders)
+        # Verify membership and update order in one set-based transaction
+        missing = BlockRepository.reorder_in_document(document_id, block_orders)
+        if missing:
+            raise ValueError(f'Block {missing[0]} does not belong to this document')
+        BlockService._publish(document_id, 'reordered', blocks=[
+            {'id': block_id, 'order_index': order_index} for block_id, order_index in block_orders
+        ])
+
+block_write_buffer = WriteBuffer(
+    BlockService._write_buffered,
+    interval_ms=BLOCK_FLUSH_INTERVAL_MS,
+    max_ops=BLOCK_FLUSH_MAX_OPS,
+    defer=call_after_commit,
+    transaction=write_transaction
+)
@@ -1,7 +1,16 @@
-from backend.repositories.document_repository import DocumentRepository
+import base64
+import json
+
+from backend.database import transaction_open
+from backend.repositories.document_repository import DocumentRepository, tree_cache
 from backend.repositories.folder_repository import FolderRepository
+from backend.utils.conditional import content_etag
 from backend.utils.security import sanitize_input
 
+# Default and largest page sizes for the folder children endpoint
+CHILDREN_PAGE_SIZE = 50
+MAX_CHILDREN_PAGE_SIZE = 200
+
 class DocumentService:
     """Service for document and folder operations."""
     
@@ -31,35 +40,150 @@ class DocumentService:
         return DocumentRepository.create(user_id, title, folder_id)
     
     @staticmethod
-    def get_user_documents(user_id):
-        """Get all documents and folders for a user in hierarchical structure."""
-        documents = DocumentRepository.find_by_user(user_id)
-        folders = FolderRepository.find_by_user(user_id)
+    def get_user_documents(user_id, folder_id=None, depth=None):
+        """Get a user's folders and documents in hierarchical structure.
+        
+        With folder_id, returns the contents of that folder instead of the
+        root; with depth, only that many folder levels are included.
+        """
+        folder = None
+        if folder_id is not None:
+            folder = FolderRepository.find_by_id(folder_id)
+            if not folder:
+                raise ValueError('Folder not found')
+            if folder.user_id != user_id:
+                raise PermissionError('Unauthorized access to folder')
         
-        # Build hierarchical structure
-        folder_dict = {f.id: {**f.to_dict(), 'children': [], 'documents': []} for f in folders}
+        folder_dict = {}
         root_folders = []
         root_documents = []
         
-        # Organize folders into hierarchy
-        for folder in folders:
-            if folder.parent_folder_id is None:
-                root_folders.append(folder_dict[folder.id])
-            elif folder.parent_folder_id in folder_dict:
-                folder_dict[folder.parent_folder_id]['children'].append(folder_dict[folder.id])
-        
-        # Organize documents into folders or root
-        for doc in documents:
-            doc_dict = doc.to_dict()
-            if doc.folder_id is None:
-                root_documents.append(doc_dict)
-            elif doc.folder_id in folder_dict:
-                folder_dict[doc.folder_id]['documents'].append(doc_dict)
+        # Rows arrive folders first (parents before children), then documents
+        for row in DocumentRepository.find_tree(user_id, folder_id, depth):
+            if row['kind'] == 0:
+                node = {
+                    'id': row['id'],
+                    'name': row['name'],
+                    'parent_folder_id': row['parent_id'],
+                    'children': [],
+                    'documents': []
+                }
+                if depth is not None:
+                    node['truncated'] = bool(row['truncated'])
+                folder_dict[row['id']] = node
+                if row['level'] == 1:
+                    root_folders.append(node)
+                else:
+                    folder_dict[row['parent_id']]['children'].append(node)
+            else:
+                doc = {
+                    'id': row['id'],
+                    'title': row['name'],
+                    'folder_id': row['parent_id'],
+                    'updated_at': row['updated_at']
+                }
+                if row['level'] == 0:
+                    root_documents.append(doc)
+                else:
+                    folder_dict[row['parent_id']]['documents'].append(doc)
         
-        return {
+        result = {
             'folders': root_folders,
             'documents': root_documents
         }
+        if folder is not None:
+            result['folder'] = {
+                'id': folder.id,
+                'name': folder.name,
+                'parent_folder_id': folder.parent_folder_id
+            }
+        return result
+    
+    @staticmethod
+    def get_folder_children(user_id, folder_id=None, cursor=None, limit=CHILDREN_PAGE_SIZE):
+        """Get one page of a folder's subfolders and documents (the root when folder_id is None).
+        
+        Returns the items and an opaque next_cursor, which is None on the last page.
+        """
+        folder = None
+        if folder_id is not None:
+            folder = FolderRepository.find_by_id(folder_id)
+            if not folder:
+                raise ValueError('Folder not found')
+            if folder.user_id != user_id:
+                raise PermissionError('Unauthorized access to folder')
+        
+        # Fetch one extra row to learn whether another page exists
+        rows = FolderRepository.find_children(user_id, folder_id, cursor, limit + 1)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = DocumentService.encode_cursor((last['kind'], last['name'], last['id']))
+        
+        items = []
+        for row in rows:
+            if row['kind'] == 0:
+                items.append({
+                    'type': 'folder',
+                    'id': row['id'],
+                    'name': row['name'],
+                    'parent_folder_id': row['parent_id'],
+                    'child_count': row['child_count']
+                })
+            else:
+                items.append({
+                    'type': 'document',
+                    'id': row['id'],
+                    'title': row['name'],
+                    'folder_id': row['parent_id'],
+                    'updated_at': row['updated_at']
+                })
+        
+        return {
+            'folder': folder.to_dict() if folder else None,
+            'items': items,
+            'next_cursor': next_cursor
+        }
+    
+    @staticmethod
+    def get_cached_tree(user_id, view, loader):
+        """Return (etag, result) for one sidebar view, serving repeats from the tree cache.
+        
+        view identifies the request (e.g. ('tree', folder_id, depth)) and loader
+        builds the result on a miss. Document and folder writes evict every
+        view cached for their owner.
+        """
+        key = (user_id,) + tuple(view)
+        entry = tree_cache.get(key)
+        if entry is None:
+            # The generation only guards results read after it; when the
+            # request has already read, its snapshot may predate an eviction
+            cacheable = not transaction_open()
+            generation = tree_cache.generation
+            result = loader()
+            entry = (content_etag(result), result)
+            if cacheable:
+                tree_cache.set(key, entry, generation=generation)
+        return entry
+    
+    @staticmethod
+    def encode_cursor(position):
+        """Encode a (kind, name, id) position as an opaque URL-safe cursor."""
+        raw = json.dumps(list(position), separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+    
+    @staticmethod
+    def decode_cursor(cursor):
+        """Decode a cursor from encode_cursor, raising ValueError if it is malformed."""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            kind, name, item_id = json.loads(raw)
+        except (ValueError, TypeError):
+            raise ValueError('Invalid cursor')
+        if kind not in (0, 1) or not isinstance(name, str) or not isinstance(item_id, int):
+            raise ValueError('Invalid cursor')
+        return kind, name, item_id
     
     @staticmethod
     def update_document(document_id, user_id, title=None, folder_id=None):
@@ -0,0 +1,67 @@
+import re
+from backend.repositories.search_repository import SearchRepository, MATCH_START, MATCH_END
+from backend.services.block_service import BlockService
+
+# Default and largest number of results per search, and most terms used from a query
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 50
+MAX_SEARCH_TERMS = 10
+
+# Characters of context kept on each side of the first match by the LIKE fallback
+SNIPPET_CONTEXT = 60
+
+class SearchService:
+    """Service for searching a user's documents and blocks."""
+    
+    @staticmethod
+    def search(user_id, query, limit=SEARCH_LIMIT):
+        """Search titles and block text for documents containing every word of query.
+        
+        The last word also matches as a prefix, so results update while
+        typing. Returns a list of result dicts, best matches first, each with
+        a snippet split into segments whose `match` flag marks highlighted text.
+        """
+        terms = re.findall(r'\w+', query or '')[:MAX_SEARCH_TERMS]
+        if not terms:
+            raise ValueError('Search query is required')
+        
+        # Edits still in the block write buffer are searchable too
+        BlockService.flush_user_edits(user_id)
+        if SearchRepository.has_index():
+            rows = SearchRepository.search(user_id, terms, limit)
+            snippets = [row['snippet'] for row in rows]
+        else:
+            rows = SearchRepository.search_like(user_id, terms, limit)
+            snippets = [SearchService._highlight(row['text'], terms) for row in rows]
+        
+        return [
+            {
+                'document_id': row['document_id'],
+                'document_title': row['title'],
+                'block_id': row['block_id'],
+                'block_type': row['block_type'],
+                'snippet': SearchService._segments(snippet)
+            }
+            for row, snippet in zip(rows, snippets)
+        ]
+    
+    @staticmethod
+    def _highlight(text, terms):
+        """Mark terms in text around the first match, like FTS5 snippet() does."""
+        pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+        first = pattern.search(text)
+        start = max(first.start() - SNIPPET_CONTEXT, 0) if first else 0
+        end = min((first.end() if first else 0) + SNIPPET_CONTEXT, len(text))
+        excerpt = pattern.sub(lambda m: f'{MATCH_START}{m.group(0)}{MATCH_END}', text[start:end])
+        return ('…' if start > 0 else '') + excerpt + ('…' if end < len(text) else '')
+    
+    @staticmethod
+    def _segments(snippet):
+        """Split a marked snippet into [{'text', 'match'}] segments."""
+        segments = []
+        for part in re.split(f'({MATCH_START}.*?{MATCH_END})', snippet or '', flags=re.DOTALL):
+            if part.startswith(MATCH_START):
+                segments.append({'text': part[1:-1], 'match': True})
+            elif part:
+                segments.append({'text': part, 'match': False})
+        return segments
@@ -0,0 +1,82 @@
+import threading
+import time
+from collections import OrderedDict
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with per-entry expiry and hit/miss counters.
+    
+    `generation` increases on every invalidation. A caller that loads a value
+    after a miss can pass the generation it saw before loading to set(), so
+    that a value read before a concurrent invalidation is not cached.
+    """
+    
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+    
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+    
+    def set(self, key, value, ttl=None, generation=None):
+        """Cache value under key for ttl seconds (the cache default if None).
+        
+        If generation is given and the cache has been invalidated since, the
+        value may be stale and is not stored.
+        """
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, key):
+        """Remove key from the cache if present."""
+        with self._lock:
+            self.generation += 1
+            self._entries.pop(key, None)
+    
+    def invalidate_where(self, predicate):
+        """Remove every entry for which predicate(key, value) is true."""
+        with self._lock:
+            self.generation += 1
+            for key in [key for key, (value, _) in self._entries.items() if predicate(key, value)]:
+                del self._entries[key]
+    
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+    
+    def stats(self):
+        """Return size and hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
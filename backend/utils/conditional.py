@@ -0,0 +1,32 @@
+import hashlib
+import json
+from flask import Response, jsonify, make_response, request
+
+def content_etag(payload):
+    """Return a strong ETag value derived from a JSON-serializable payload."""
+    raw = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+def not_modified(etag):
+    """Return a 304 response if the request's If-None-Match matches etag, else None."""
+    if request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return None
+
+def json_with_etag(payload, etag):
+    """Build a JSON response that carries etag and asks clients to revalidate."""
+    response = jsonify(payload)
+    response.set_etag(etag)
+    # Browsers keep the body and send If-None-Match on the next request
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def streamed_json_with_etag(chunks, etag):
+    """Like json_with_etag, but send JSON text from an iterable of chunks as it is produced."""
+    response = Response(chunks, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,92 @@
+import atexit
+import os
+import threading
+from collections import deque
+
+# Events kept per subscriber; when a slow client falls this far behind the
+# oldest events are dropped and the client is told to resync
+SSE_QUEUE_SIZE = int(os.environ.get('SSE_QUEUE_SIZE', 256))
+
+class Subscription:
+    """A subscriber's bounded event queue for one topic."""
+    
+    def __init__(self, topic, lock, maxsize):
+        self.topic = topic
+        self.events = deque(maxlen=maxsize)
+        self.dropped = 0
+        self.closed = False
+        self._ready = threading.Condition(lock)
+    
+    def get(self, timeout=None):
+        """Wait up to timeout seconds for events.
+        
+        Returns a tuple of the queued events (possibly empty) and how many
+        events were dropped since the last call.
+        """
+        with self._ready:
+            if not self.events and not self.closed:
+                self._ready.wait(timeout)
+            events = list(self.events)
+            self.events.clear()
+            dropped, self.dropped = self.dropped, 0
+            return events, dropped
+
+class EventBroker:
+    """In-process fan-out of events to per-topic subscribers.
+    
+    Publishing never blocks on a subscriber: each one has a bounded queue
+    and, when it is full, the oldest event is discarded and counted.
+    """
+    
+    def __init__(self, queue_size=SSE_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._topics = {}
+        # Wake open event streams so that their generators end at shutdown
+        atexit.register(self.close_all)
+    
+    def subscribe(self, topic):
+        """Start receiving events published to topic."""
+        subscription = Subscription(topic, self._lock, self.queue_size)
+        with self._lock:
+            self._topics.setdefault(topic, set()).add(subscription)
+        return subscription
+    
+    def unsubscribe(self, subscription):
+        """Stop delivering events to a subscription and wake its reader."""
+        with self._lock:
+            subscribers = self._topics.get(subscription.topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._topics[subscription.topic]
+            subscription.closed = True
+            subscription._ready.notify_all()
+    
+    def publish(self, topic, event):
+        """Queue event for every subscriber of topic."""
+        with self._lock:
+            for subscription in self._topics.get(topic, ()):
+                if len(subscription.events) == subscription.events.maxlen:
+                    subscription.dropped += 1
+                subscription.events.append(event)
+                subscription._ready.notify()
+    
+    def close_all(self):
+        """Disconnect every subscriber, e.g. at shutdown."""
+        with self._lock:
+            subscriptions = [s for subscribers in self._topics.values() for s in subscribers]
+            self._topics.clear()
+            for subscription in subscriptions:
+                subscription.closed = True
+                subscription._ready.notify_all()
+    
+    def stats(self):
+        """Return topic and subscriber counts."""
+        with self._lock:
+            return {
+                'topics': len(self._topics),
+                'subscribers': sum(len(subscribers) for subscribers in self._topics.values())
+            }
+
+event_broker = EventBroker()
@@ -0,0 +1,17 @@
+import json
+
+def stream_json_object(array_key, batches, **fields):
+    """Yield the JSON text of {array_key: [...], **fields} in chunks.
+    
+    The array items arrive already encoded as JSON text, in an iterable of
+    batches, and each batch becomes one chunk, so only one batch is held in
+    memory at a time.
+    """
+    yield '{' + json.dumps(array_key) + ':['
+    separator = ''
+    for batch in batches:
+        if not batch:
+            continue
+        yield separator + ','.join(batch)
+        separator = ','
+    yield ']' + ''.join(f',{json.dumps(key)}:{json.dumps(value)}' for key, value in fields.items()) + '}'
@@ -0,0 +1,182 @@
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+# bcrypt runs in worker processes so a login burst cannot tie up every
+# request thread. BCRYPT_POOL_SIZE=0 hashes inline on the calling thread.
+BCRYPT_POOL_SIZE = int(os.environ.get('BCRYPT_POOL_SIZE', os.cpu_count() or 1))
+BCRYPT_MAX_PENDING = int(os.environ.get('BCRYPT_MAX_PENDING', max(BCRYPT_POOL_SIZE, 1) * 4))
+
+# Cost factor for new hashes. When BCRYPT_COST is unset, the first start picks
+# the highest cost whose hash time fits BCRYPT_TARGET_MS (see calibrate()) and
+# saves it to BCRYPT_COST_FILE; later starts reuse the saved cost, so timing
+# noise cannot change it between restarts. Delete the file to recalibrate.
+DEFAULT_BCRYPT_COST = 12
+BCRYPT_COST = os.environ.get('BCRYPT_COST')
+BCRYPT_TARGET_MS = float(os.environ.get('BCRYPT_TARGET_MS', 250))
+BCRYPT_COST_FILE = os.environ.get('BCRYPT_COST_FILE', 'bcrypt_cost')
+MIN_BCRYPT_COST = 10
+MAX_BCRYPT_COST = 16
+
+class HashingBusyError(Exception):
+    """Raised when the password hashing queue is full."""
+
+def _hashpw(password, rounds):
+    salt = bcrypt.gensalt(rounds=rounds)
+    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+
+def _checkpw(password, password_hash):
+    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+def hash_cost(password_hash):
+    """Return the cost factor encoded in a bcrypt hash ($2b$<cost>$...), or None."""
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+def measure_hash_ms(cost):
+    """Time one bcrypt hash at the given cost on this host, in milliseconds."""
+    start = time.perf_counter()
+    _hashpw('calibration-password', cost)
+    return (time.perf_counter() - start) * 1000
+
+class PasswordHasherPool:
+    """Bounded process pool for bcrypt work.
+    
+    At most `max_pending` hashes may be queued or running at once; further
+    requests fail fast with HashingBusyError instead of waiting. Background
+    rehashes (see rehash()) do not count towards the limit.
+    """
+    
+    def __init__(self, size=BCRYPT_POOL_SIZE, max_pending=BCRYPT_MAX_PENDING,
+                 cost=int(BCRYPT_COST or DEFAULT_BCRYPT_COST)):
+        self.size = size
+        self.max_pending = max_pending
+        self.cost = cost
+        self._slots = threading.BoundedSemaphore(max(max_pending, 1))
+        self._lock = threading.Lock()
+        self._executor = None
+        atexit.register(self.shutdown)
+    
+    def hash(self, password, rounds=None):
+        """Hash a password with the given bcrypt cost factor (the pool's cost if None)."""
+        return self._run(_hashpw, password, rounds or self.cost)
+    
+    def rehash(self, password):
+        """Hash a password with the current cost to upgrade a stored hash.
+        
+        Runs outside the max_pending limit, so upgrades never make logins
+        fail with HashingBusyError; callers run one upgrade at a time.
+        """
+        return self._run(_hashpw, password, self.cost, limited=False)
+    
+    def verify(self, password, password_hash):
+        """Check a password against a bcrypt hash."""
+        return self._run(_checkpw, password, password_hash)
+    
+    def needs_rehash(self, password_hash):
+        """Check whether a hash was made with a lower cost than the current one.
+        
+        Hashes with a higher cost are kept, so lowering the cost never
+        weakens existing hashes.
+        """
+        cost = hash_cost(password_hash)
+        return cost is not None and cost < self.cost
+    
+    def calibrate(self, target_ms=BCRYPT_TARGET_MS, min_cost=MIN_BCRYPT_COST, max_cost=MAX_BCRYPT_COST):
+        """Pick the highest cost whose hash time on this host fits target_ms.
+        
+        Each cost step doubles the work, so the time at min_cost is measured
+        and doubled until the next step would exceed the budget; the chosen
+        cost is then measured once more to confirm it. Never goes below
+        min_cost. Returns the chosen cost, which is also used for new hashes.
+        """
+        base_ms = measure_hash_ms(min_cost)
+        cost = min_cost
+        while cost < max_cost and base_ms * 2 ** (cost + 1 - min_cost) <= target_ms:
+            cost += 1
+        while cost > min_cost and measure_hash_ms(cost) > target_ms:
+            cost -= 1
+        self.cost = cost
+        return cost
+    
+    def shutdown(self):
+        """Stop the worker processes."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+    
+    def _run(self, fn, *args, limited=True):
+        if self.size <= 0:
+            return fn(*args)
+        
+        if limited and not self._slots.acquire(blocking=False):
+            raise HashingBusyError('Too many password operations in progress')
+        try:
+            executor = self._get_executor()
+            return executor.submit(fn, *args).result()
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool for the next caller
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            raise
+        finally:
+            if limited:
+                self._slots.release()
+    
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # Spawned workers do not inherit locks held by request threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.size,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+password_hasher = PasswordHasherPool()
+
+def configure_password_cost(cost_file=BCRYPT_COST_FILE):
+    """Apply BCRYPT_COST, the cost saved in cost_file, or a newly calibrated one, and report it.
+    
+    A newly calibrated cost is saved to cost_file for later starts.
+    """
+    if BCRYPT_COST:
+        print(f"bcrypt cost factor: {password_hasher.cost} (from BCRYPT_COST)")
+        return password_hasher.cost
+    
+    cost = _read_saved_cost(cost_file)
+    if cost is not None:
+        password_hasher.cost = cost
+        print(f"bcrypt cost factor: {cost} (from {cost_file})")
+        return cost
+    
+    cost = password_hasher.calibrate()
+    _save_cost(cost_file, cost)
+    print(f"bcrypt cost factor: {cost} (calibrated for {BCRYPT_TARGET_MS:.0f} ms per hash, saved to {cost_file})")
+    return cost
+
+def _read_saved_cost(cost_file):
+    """Return the cost saved in cost_file, or None if it is missing or invalid."""
+    try:
+        with open(cost_file) as f:
+            cost = int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+    return cost if MIN_BCRYPT_COST <= cost <= MAX_BCRYPT_COST else None
+
+def _save_cost(cost_file, cost):
+    # Written to a temporary file first so a crash cannot leave a partial value
+    temp_file = f'{cost_file}.tmp'
+    with open(temp_file, 'w') as f:
+        f.write(f'{cost}\n')
+    os.replace(temp_file, cost_file)
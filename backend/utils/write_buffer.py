@@ -0,0 +1,204 @@
+import atexit
+import logging
+import threading
+import time
+from contextlib import nullcontext
+
+logger = logging.getLogger(__name__)
+
+class FlushError(Exception):
+    """Raised to a writer waiting on a flush that failed; its value stays pending."""
+
+class _Entry:
+    """A pending value and the sequence numbers of its last write and last flush."""
+    
+    __slots__ = ('seq', 'value', 'flushed')
+    
+    def __init__(self, seq, value):
+        self.seq = seq
+        self.value = value
+        self.flushed = 0
+
+class WriteBuffer:
+    """Coalescing write-behind buffer flushed in group commits.
+    
+    Only the latest value of each key is kept, so a key written many times
+    between flushes is written once. A background thread passes every
+    pending value to `write` in one call each `interval_ms` milliseconds,
+    or as soon as `max_ops` writes are waiting. `defer` schedules the
+    callback that marks values as flushed, e.g. once the transaction that
+    `write` used has committed; values stay pending, and visible to get(),
+    until then, so a failed flush is retried by the next one. Each flush
+    runs inside `transaction()`, which should take whatever lock `write`
+    needs, so that flushes from several threads queue on it in one order.
+    """
+    
+    def __init__(self, write, interval_ms=200, max_ops=1000, defer=None, transaction=None):
+        self.write = write
+        self.interval = interval_ms / 1000
+        self.max_ops = max_ops
+        self.defer = defer or (lambda callback: callback())
+        self.transaction = transaction or nullcontext
+        self.puts = 0
+        self.flushes = 0
+        self.written = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+        self._work = threading.Condition(self._lock)
+        self._flushed = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._entries = {}
+        self._seq = 0
+        self._ops = 0
+        self._thread = None
+        self._closed = False
+    
+    def put(self, key, merge):
+        """Store merge(pending value or None) as the pending value of key.
+        
+        Returns the write's sequence number, for wait_flushed().
+        """
+        with self._lock:
+            self._seq += 1
+            self.puts += 1
+            self._ops += 1
+            entry = self._entries.get(key)
+            if entry is None:
+                self._entries[key] = _Entry(self._seq, merge(None))
+            else:
+                entry.value = merge(entry.value)
+                entry.seq = self._seq
+            if self._thread is None and not self._closed:
+                self._start()
+            self._work.notify()
+            return self._seq
+    
+    def get(self, key, default=None):
+        """Return the pending value of key, or default if it has none."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return default if entry is None else entry.value
+    
+    def wait_flushed(self, key, seq, timeout=None):
+        """Wait until the write numbered seq to key has been flushed; returns False on timeout.
+        
+        Raises FlushError if a background flush fails meanwhile.
+        """
+        def flushed():
+            entry = self._entries.get(key)
+            return entry is None or entry.flushed >= seq or self.failures != failures
+        with self._lock:
+            failures = self.failures
+            if not self._flushed.wait_for(flushed, timeout):
+                return False
+            entry = self._entries.get(key)
+            if entry is not None and entry.flushed < seq:
+                raise FlushError(f'Flush of {key} failed')
+            return True
+    
+    def flush(self, select=None):
+        """Write pending values now, only those for which select(key, value) is true if given.
+        
+        Returns the number of values written. Raises whatever `write` raises,
+        leaving the values pending.
+        """
+        with self._lock:
+            if not any(select is None or select(key, entry.value) for key, entry in self._entries.items()):
+                return 0
+        
+        with self.transaction(), self._flush_lock:
+            with self._lock:
+                taken = {
+                    key: (entry.seq, entry.value) for key, entry in self._entries.items()
+                    if select is None or select(key, entry.value)
+                }
+                if select is None:
+                    self._ops = 0
+            if not taken:
+                return 0
+            self.write({key: value for key, (_, value) in taken.items()})
+            self.defer(lambda: self._mark_flushed(taken))
+            return len(taken)
+    
+    def close(self, attempts=3):
+        """Stop the background thread and flush what is left, e.g. at shutdown.
+        
+        A failed final flush is tried up to attempts times before the values
+        still pending are given up and logged as lost.
+        """
+        with self._lock:
+            self._closed = True
+            thread, self._thread = self._thread, None
+            self._work.notify_all()
+        if thread is not None:
+            thread.join()
+        for attempt in range(1, attempts + 1):
+            try:
+                written = self.flush()
+            except Exception:
+                self._record_failure()
+                logger.exception('Final write buffer flush failed (attempt %d of %d)', attempt, attempts)
+                time.sleep(0.1 * attempt)
+                continue
+            if written:
+                logger.info('Flushed %d buffered writes at shutdown', written)
+            return
+        logger.error('Lost %d buffered writes at shutdown', len(self._entries))
+    
+    def stats(self):
+        """Return pending, write and flush counters."""
+        with self._lock:
+            return {
+                'pending': len(self._entries),
+                'puts': self.puts,
+                'flushes': self.flushes,
+                'written': self.written,
+                'failures': self.failures
+            }
+    
+    def _mark_flushed(self, taken):
+        """Drop flushed values that were not overwritten while the flush ran."""
+        with self._lock:
+            for key, (seq, _) in taken.items():
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry.seq == seq:
+                    del self._entries[key]
+                else:
+                    entry.flushed = max(entry.flushed, seq)
+            self.flushes += 1
+            self.written += len(taken)
+            self._flushed.notify_all()
+    
+    def _record_failure(self):
+        """Count a failed flush and wake the writers waiting on it."""
+        with self._lock:
+            self.failures += 1
+            self._flushed.notify_all()
+    
+    def _start(self):
+        # Lock held; the thread is a daemon so that close() at exit decides the final flush
+        self._thread = threading.Thread(target=self._run, name='write-buffer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+    
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._entries and not self._closed:
+                    self._work.wait()
+                deadline = time.monotonic() + self.interval
+                while not self._closed and self._ops < self.max_ops:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._work.wait(remaining)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                # The values stay pending and are retried on the next flush
+                self._record_failure()
+                logger.exception('Write buffer flush failed; %d values stay pending', len(self._entries))
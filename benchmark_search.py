@@ -0,0 +1,119 @@
+"""Benchmark full-text search latency on a large generated workspace.
+
+Usage: python benchmark_search.py [block_count]
+
+Builds a throwaway database with block_count blocks (default 1,000,000)
+of Zipf-distributed pseudo-words spread over several users, then times
+searches for words of different frequencies, a two-word query and a
+prefix as one user would type them.
+"""
+import os
+import itertools
+import random
+import sys
+import tempfile
+import time
+
+import backend.database as database
+
+USERS = 10
+BLOCKS_PER_DOCUMENT = 200
+QUERY_RUNS = 20
+TARGET_MS = 50
+
+VOCABULARY_SIZE = 5000
+WORDS_PER_BLOCK = 12
+
+def make_vocabulary(rng):
+    """Invent VOCABULARY_SIZE distinct pseudo-words, most frequent first."""
+    syllables = ['ka', 'lo', 'mi', 'ren', 'tu', 'sa', 'vel', 'dor', 'pi', 'no', 'zu', 'tha', 'gri', 'bel']
+    words = []
+    seen = set()
+    while len(words) < VOCABULARY_SIZE:
+        word = ''.join(rng.choices(syllables, k=rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+def generate(block_count):
+    """Fill a fresh database with users, documents and blocks of random text."""
+    rng = random.Random(42)
+    vocabulary = make_vocabulary(rng)
+    # Word frequencies follow Zipf's law, as in natural text
+    weights = list(itertools.accumulate(1 / rank for rank in range(1, VOCABULARY_SIZE + 1)))
+    conn = database.get_db_connection()
+    cursor = conn.cursor()
+    
+    for user_id in range(1, USERS + 1):
+        cursor.execute(
+            'INSERT INTO users (id, username, email, password_hash) VALUES (?, ?, ?, ?)',
+            (user_id, f'user{user_id}', f'user{user_id}@example.com', 'x')
+        )
+    
+    documents = (block_count + BLOCKS_PER_DOCUMENT - 1) // BLOCKS_PER_DOCUMENT
+    cursor.executemany(
+        'INSERT INTO documents (id, user_id, title) VALUES (?, ?, ?)',
+        ((doc_id, doc_id % USERS + 1, ' '.join(rng.choices(vocabulary, cum_weights=weights, k=3)))
+         for doc_id in range(1, documents + 1))
+    )
+    
+    def blocks():
+        for block_id in range(1, block_count + 1):
+            words = rng.choices(vocabulary, cum_weights=weights, k=WORDS_PER_BLOCK)
+            doc_id = (block_id - 1) // BLOCKS_PER_DOCUMENT + 1
+            yield block_id, doc_id, ' '.join(words), block_id * 1024
+    
+    cursor.executemany(
+        'INSERT INTO blocks (id, document_id, content, block_type, order_index) VALUES (?, ?, ?, \'paragraph\', ?)',
+        blocks()
+    )
+    cursor.execute("INSERT INTO search_index (search_index) VALUES ('optimize')")
+    conn.commit()
+    conn.close()
+    return vocabulary
+
+def time_query(user_id, query):
+    """Return the median and worst search time for query in milliseconds."""
+    from backend.services.search_service import SearchService
+    
+    timings = []
+    for _ in range(QUERY_RUNS):
+        start = time.perf_counter()
+        results = SearchService.search(user_id, query)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2], timings[-1], len(results)
+
+def main():
+    block_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    database.DATABASE_PATH = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    database.init_db()
+    
+    start = time.perf_counter()
+    vocabulary = generate(block_count)
+    print(f"Generated {block_count:,} blocks in {time.perf_counter() - start:.1f}s")
+    
+    # Words of decreasing frequency (the first is in most blocks), two words
+    # together, and prefixes as typed
+    queries = [
+        vocabulary[0],
+        vocabulary[50],
+        vocabulary[-1],
+        f'{vocabulary[10]} {vocabulary[20]}',
+        vocabulary[30][:3],
+        vocabulary[0][:2],
+        vocabulary[0][:5]
+    ]
+    all_fast = True
+    for query in queries:
+        median_ms, worst_ms, count = time_query(1, query)
+        ok = median_ms <= TARGET_MS
+        all_fast = all_fast and ok
+        print(f"{'✓' if ok else '✗'} {query!r}: median {median_ms:.1f} ms, worst {worst_ms:.1f} ms, {count} results")
+    
+    print(f"All queries within {TARGET_MS} ms" if all_fast else f"Some queries exceeded {TARGET_MS} ms")
+    return all_fast
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
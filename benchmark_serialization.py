@@ -0,0 +1,113 @@
+"""Benchmark the block-list and admin user-list serialization paths.
+
+Usage: python benchmark_serialization.py [block_count] [user_count]
+
+Compares building models from rows and serializing their to_dict() output
+with having SQLite build each row's JSON, and compares the memory of
+slotted models with the same classes without __slots__. Reports time,
+peak traced memory and garbage collections for each.
+"""
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import backend.database as database
+from backend.models.block import Block
+from backend.models.user import User
+from backend.repositories.block_repository import BLOCK_JSON_SQL
+from backend.repositories.user_repository import USER_JSON_SQL
+
+def generate(block_count, user_count):
+    """Fill a fresh database with one large document and many users."""
+    conn = database.get_db_connection()
+    conn.executemany(
+        'INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
+        ((f'user{i}', f'user{i}@example.com', '$2b$12$' + 'x' * 53) for i in range(user_count))
+    )
+    conn.execute("INSERT INTO documents (id, user_id, title) VALUES (1, 1, 'Meeting notes')")
+    conn.executemany(
+        "INSERT INTO blocks (document_id, content, block_type, order_index) VALUES (1, ?, 'paragraph', ?)",
+        ((f'Item {i}: follow up with the team about the release plan', i * 1024) for i in range(block_count))
+    )
+    conn.commit()
+    conn.close()
+
+def measure(fn):
+    """Run fn twice and return (result, milliseconds, peak traced MB, gen-0 collections).
+    
+    Time and collections come from an untraced run, since tracing slows
+    allocation down; peak memory from a traced one.
+    """
+    gc.collect()
+    collections = gc.get_stats()[0]['collections']
+    start = time.perf_counter()
+    result = fn()
+    elapsed = (time.perf_counter() - start) * 1000
+    collections = gc.get_stats()[0]['collections'] - collections
+    
+    del result
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1e6, collections
+
+def model_path(conn, sql, model):
+    rows = conn.execute(sql).fetchall()
+    return json.dumps([model.from_row(row).to_dict() for row in rows])
+
+def row_path(conn, sql):
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    return '[' + ','.join(row[0] for row in cursor.execute(sql)) + ']'
+
+def unslotted(cls):
+    """Return a copy of a slotted model class that keeps attributes in a __dict__."""
+    namespace = {key: value for key, value in vars(cls).items()
+                 if key not in cls.__slots__ and key not in ('__slots__', '__dict__', '__weakref__')}
+    return type(cls.__name__, (), namespace)
+
+def compare(label, conn, model, table, json_sql, order_by):
+    sql = f'SELECT * FROM {table} ORDER BY {order_by}'
+    json_sql = f'SELECT {json_sql} FROM {table} ORDER BY {order_by}'
+    
+    old, old_ms, old_mb, old_gc = measure(lambda: model_path(conn, sql, model))
+    new, new_ms, new_mb, new_gc = measure(lambda: row_path(conn, json_sql))
+    same = json.loads(old) == json.loads(new)
+    print(f"{label}:")
+    print(f"  models + to_dict: {old_ms:7.1f} ms, peak {old_mb:6.1f} MB, {old_gc} collections")
+    print(f"  rows as JSON:     {new_ms:7.1f} ms, peak {new_mb:6.1f} MB, {new_gc} collections")
+    print(f"  {'✓' if same else '✗'} identical output")
+    
+    rows = conn.execute(sql).fetchall()
+    sizes = {}
+    for name, cls in (('__dict__', unslotted(model)), ('__slots__', model)):
+        _, ms, mb, _ = measure(lambda: [cls(*(row[name] for name in model.__slots__)) for row in rows])
+        sizes[name] = mb
+        print(f"  {len(rows)} models with {name}: {ms:6.1f} ms, peak {mb:6.1f} MB")
+    return same and new_mb < old_mb and sizes['__slots__'] < sizes['__dict__']
+
+def main():
+    block_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    user_count = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    database.DATABASE_PATH = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    database.init_db()
+    generate(block_count, user_count)
+    
+    conn = database.get_db_connection()
+    try:
+        blocks_ok = compare(f'Block list ({block_count:,} blocks)', conn, Block, 'blocks',
+                            BLOCK_JSON_SQL, 'order_index, id')
+        users_ok = compare(f'Admin user list ({user_count:,} users)', conn, User, 'users',
+                           USER_JSON_SQL, 'created_at DESC')
+    finally:
+        conn.close()
+    return blocks_ok and users_ok
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,123 @@
+"""Benchmark block autosaves with and without the write-behind buffer.
+
+Usage: python benchmark_write_buffer.py [writers] [edits_per_writer] [flush_interval_ms] [put|batch]
+
+Each writer keeps editing its own block through PUT /api/blocks/<id>, or
+through POST /api/documents/<id>/blocks/batch as the editor's autosave
+does, like a client autosaving while typing would. Runs once writing every edit directly
+and once with the buffer in each durability mode, each in a fresh process
+and database, and reports request latency, how many block rows were written
+how many write transactions were committed and how many edits failed.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+MODES = [
+    ('direct', {'BLOCK_WRITE_BUFFER': '0'}),
+    ('buffer, async', {'BLOCK_WRITE_BUFFER': '1', 'BLOCK_WRITE_DURABILITY': 'async'}),
+    ('buffer, commit', {'BLOCK_WRITE_BUFFER': '1', 'BLOCK_WRITE_DURABILITY': 'commit'}),
+]
+
+def run(writers, edits, endpoint):
+    """Run the edits against a fresh database and print one result line."""
+    import backend.database as database
+    database.DATABASE_PATH = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    database.init_db()
+    from backend.app import app
+    from backend.services.block_service import BLOCK_WRITE_BUFFER, block_write_buffer
+    
+    client = app.test_client()
+    client.post('/api/auth/register', json={
+        'username': 'writer', 'email': 'writer@example.com', 'password': 'benchmark'
+    })
+    token = client.post('/api/auth/login', json={
+        'username': 'writer', 'password': 'benchmark'
+    }).get_json()['token']
+    headers = {'Authorization': f'Bearer {token}'}
+    document_id = client.post('/api/documents', json={'title': 'Benchmark'}, headers=headers).get_json()['document']['id']
+    block_ids = [
+        client.post('/api/blocks', json={'document_id': document_id}, headers=headers).get_json()['block']['id']
+        for _ in range(writers)
+    ]
+    
+    conn = database.get_db_connection()
+    count_writes = lambda: conn.execute(
+        'SELECT blocks_version FROM documents WHERE id = ?', (document_id,)
+    ).fetchone()[0]
+    writes_before = count_writes()
+    latencies = []
+    errors = []
+    
+    def write(block_id):
+        writer = app.test_client()
+        text = ''
+        for i in range(edits):
+            text += 'word '
+            start = time.perf_counter()
+            if endpoint == 'batch':
+                response = writer.post(f'/api/documents/{document_id}/blocks/batch', json={
+                    'operations': [{'op': 'update', 'id': block_id, 'content': text}]
+                }, headers=headers)
+            else:
+                response = writer.put(f'/api/blocks/{block_id}', json={'content': text}, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+    
+    start = time.perf_counter()
+    threads = [threading.Thread(target=write, args=(block_id,)) for block_id in block_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if BLOCK_WRITE_BUFFER:
+        block_write_buffer.close()
+        transactions = block_write_buffer.stats()['flushes']
+    else:
+        transactions = writers * edits - len(errors)
+    
+    latencies.sort()
+    print(f"{writers * edits / elapsed:9.0f} edits/s"
+          f"  p50 {latencies[len(latencies) // 2] * 1000:6.1f} ms"
+          f"  p99 {latencies[int(len(latencies) * 0.99)] * 1000:6.1f} ms"
+          f"  {count_writes() - writes_before:6d} row writes"
+          f"  {transactions:6d} transactions"
+          f"  {len(errors):4d} errors")
+
+def main():
+    writers = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    edits = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    interval = sys.argv[3] if len(sys.argv) > 3 else '200'
+    endpoint = sys.argv[4] if len(sys.argv) > 4 else 'put'
+    
+    if os.environ.get('BENCHMARK_CHILD'):
+        run(writers, edits, endpoint)
+        return True
+    
+    print(f"{writers} writers x {edits} edits through {endpoint}, flush every {interval} ms")
+    for name, settings in MODES:
+        env = {
+            **os.environ, **settings,
+            'BENCHMARK_CHILD': '1',
+            'BLOCK_FLUSH_INTERVAL_MS': interval,
+            'BCRYPT_POOL_SIZE': '0',
+            'BCRYPT_COST': '4',
+        }
+        print(f"{name:15}", end=' ', flush=True)
+        result = subprocess.run(
+            [sys.executable, __file__, str(writers), str(edits), interval, endpoint],
+            env=env, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            print(result.stderr)
+            return False
+        print(result.stdout.strip().splitlines()[-1])
+    return True
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
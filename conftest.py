@@ -0,0 +1,74 @@
+"""Shared fixtures for the verification scripts run under pytest."""
+import os
+import shutil
+import tempfile
+
+os.environ.setdefault('BCRYPT_POOL_SIZE', '0')
+os.environ.setdefault('BCRYPT_COST', '4')
+
+import pytest
+
+import backend.database as db
+from backend.app import app
+from backend.repositories.document_repository import tree_cache
+from backend.repositories.search_repository import SearchRepository
+from backend.repositories.user_repository import user_cache
+from backend.services.auth_service import token_cache
+
+def _clear_caches():
+    user_cache.clear()
+    token_cache.clear()
+    tree_cache.clear()
+    SearchRepository._has_index = None
+
+@pytest.fixture
+def client():
+    """Point the app at a fresh database with empty caches and yield a test client.
+    
+    The database's directory is removed and the previous database restored afterwards.
+    """
+    original_path = db.DATABASE_PATH
+    directory = tempfile.mkdtemp()
+    db.DATABASE_PATH = os.path.join(directory, 'test.db')
+    db.init_db()
+    _clear_caches()
+    try:
+        yield app.test_client()
+    finally:
+        db.DATABASE_PATH = original_path
+        db.pool.close_all()
+        _clear_caches()
+        shutil.rmtree(directory, ignore_errors=True)
+
+@pytest.fixture
+def register(client):
+    """Return a function that registers and logs in a user, returning the user's ID and auth headers."""
+    def register(username):
+        client.post('/api/auth/register', json={
+            'username': username, 'email': f'{username}@example.com', 'password': 'secret1'
+        })
+        data = client.post('/api/auth/login', json={'username': username, 'password': 'secret1'}).get_json()
+        return data['user']['id'], {'Authorization': f"Bearer {data['token']}"}
+    return register
+
+@pytest.fixture
+def headers(register):
+    """Auth headers of a registered user named writer."""
+    return register('writer')[1]
+
+@pytest.fixture
+def create_document(client, headers):
+    """Return a function that creates one of writer's documents with some appended blocks.
+    
+    The function returns the document's ID and the block IDs.
+    """
+    def create_document(blocks=0):
+        document_id = client.post('/api/documents', json={'title': 'Doc'},
+                                  headers=headers).get_json()['document']['id']
+        block_ids = [
+            client.post('/api/blocks', json={'document_id': document_id, 'content': f'b{i}'},
+                        headers=headers).get_json()['block']['id']
+            for i in range(blocks)
+        ]
+        return document_id, block_ids
+    return create_document
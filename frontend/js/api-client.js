@@ -78,8 +78,12 @@ class ApiClient {
     }
     
     // Document endpoints
-    async getDocuments() {
-        return this.request('GET', '/documents');
+    async getDocuments(folderId = null, depth = null) {
+        const params = new URLSearchParams();
+        if (folderId !== null) params.set('folder_id', folderId);
+        if (depth !== null) params.set('depth', depth);
+        const query = params.toString();
+        return this.request('GET', query ? `/documents?${query}` : '/documents');
     }
     
     async getDocument(documentId) {
@@ -103,6 +107,15 @@ class ApiClient {
     }
     
     // Folder endpoints
+    async getFolderChildren(folderId = null, cursor = null, limit = null) {
+        const params = new URLSearchParams();
+        if (cursor) params.set('cursor', cursor);
+        if (limit) params.set('limit', limit);
+        const query = params.toString();
+        const path = folderId === null ? '/folders/root/children' : `/folders/${folderId}/children`;
+        return this.request('GET', query ? `${path}?${query}` : path);
+    }
+    
     async createFolder(name, parentFolderId = null) {
         return this.request('POST', '/folders', { name, parent_folder_id: parentFolderId });
     }
@@ -112,12 +125,30 @@ class ApiClient {
     }
     
     // Block endpoints
-    async getBlocks(documentId) {
-        return this.request('GET', `/documents/${documentId}/blocks`);
+    // page is { limit } for the first page, then the next_cursor of the previous
+    // page plus limit; without it every block is returned
+    async getBlocks(documentId, page = null) {
+        const query = page ? `?${new URLSearchParams(page)}` : '';
+        return this.request('GET', `/documents/${documentId}/blocks${query}`);
+    }
+    
+    async getChanges(documentId, since) {
+        return this.request('GET', `/documents/${documentId}/changes?since=${since}`);
+    }
+    
+    async getStreamTicket(documentId) {
+        return this.request('POST', `/documents/${documentId}/events/ticket`);
     }
     
-    async createBlock(documentId, content = '', blockType = 'paragraph') {
-        return this.request('POST', '/blocks', { document_id: documentId, content, block_type: blockType });
+    async search(query, limit = 20) {
+        const params = new URLSearchParams({ q: query, limit });
+        return this.request('GET', `/search?${params}`);
+    }
+    
+    async createBlock(documentId, content = '', blockType = 'paragraph', afterBlockId = null) {
+        const data = { document_id: documentId, content, block_type: blockType };
+        if (afterBlockId !== null) data.after_block_id = afterBlockId;
+        return this.request('POST', '/blocks', data);
     }
     
     async updateBlock(blockId, content = null, blockType = null) {
@@ -131,6 +162,14 @@ class ApiClient {
         return this.request('DELETE', `/blocks/${blockId}`);
     }
     
+    async moveBlock(blockId, afterBlockId = null) {
+        return this.request('PUT', `/blocks/${blockId}/move`, { after_block_id: afterBlockId });
+    }
+    
+    async batchBlocks(documentId, operations) {
+        return this.request('POST', `/documents/${documentId}/blocks/batch`, { operations });
+    }
+    
     async reorderBlocks(documentId, blocks) {
         return this.request('PUT', `/documents/${documentId}/blocks/reorder`, { blocks });
     }
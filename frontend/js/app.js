@@ -64,6 +64,12 @@ function setupEventListeners() {
         newFolderBtn.addEventListener('click', createNewFolder);
     }
     
+    // Sidebar search
+    const searchInput = document.getElementById('searchInput');
+    if (searchInput) {
+        searchInput.addEventListener('input', () => scheduleSearch(searchInput.value));
+    }
+    
     // Account settings button
     const accountBtn = document.getElementById('accountBtn');
     if (accountBtn) {
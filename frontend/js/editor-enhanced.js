@@ -2,6 +2,14 @@
 
 let currentBlocks = [];
 let saveTimeouts = {};
+let pendingBlockUpdates = new Map(); // Block ID -> { documentId, content } not saved yet
+const BLOCK_SAVE_RETRY_MS = 3000; // Delay before edits from a failed save are sent again
+let currentVersion = 0; // Document version the loaded blocks reflect
+let eventSource = null; // Live block events for the open document
+const BLOCK_PAGE_SIZE = 200; // Blocks fetched per page while scrolling
+let blocksCursor = null; // Position of the last loaded block, null once all are loaded
+let blockLoader = null; // Loads the next page when the end of the blocks nears the viewport
+let blocksLoading = false;
 let slashMenuVisible = false;
 let slashMenuBlockId = null;
 let selectedSlashIndex = 0;
@@ -9,17 +17,24 @@ let selectedSlashIndex = 0;
 async function loadDocument(documentId) {
     try {
         showLoading();
+        
+        // Save edits to the previous document before switching
+        await flushBlockUpdates();
         currentDocumentId = documentId;
         
         // Fetch document details
         const docResponse = await apiClient.getDocument(documentId);
         
-        // Fetch blocks
-        const response = await apiClient.getBlocks(documentId);
+        // Fetch the first page of blocks; the rest load while scrolling
+        const response = await apiClient.getBlocks(documentId, { limit: BLOCK_PAGE_SIZE });
         currentBlocks = response.blocks || [];
+        currentVersion = response.version || 0;
+        blocksCursor = response.next_cursor;
         
         // Render editor
         renderEditor(docResponse.document);
+        observeBlockLoader(documentId);
+        subscribeToDocument(documentId);
         
         // Update navigation active state
         document.querySelectorAll('.nav-item').forEach(item => {
@@ -90,6 +105,92 @@ function renderEditor(doc) {
     }
 }
 
+// Incremental loading of long documents
+
+function observeBlockLoader(documentId) {
+    stopBlockLoader();
+    if (!blocksCursor) return;
+    
+    const sentinel = document.createElement('div');
+    sentinel.id = 'blocksSentinel';
+    document.getElementById('editorContainer').appendChild(sentinel);
+    
+    blockLoader = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) {
+            loadMoreBlocks(documentId);
+        }
+    }, { rootMargin: '1000px 0px' });
+    blockLoader.observe(sentinel);
+}
+
+function stopBlockLoader() {
+    if (blockLoader) {
+        blockLoader.disconnect();
+        blockLoader = null;
+    }
+    const sentinel = document.getElementById('blocksSentinel');
+    if (sentinel) {
+        sentinel.remove();
+    }
+}
+
+async function loadMoreBlocks(documentId) {
+    if (blocksLoading || !blocksCursor) return;
+    blocksLoading = true;
+    
+    try {
+        const page = await apiClient.getBlocks(documentId, { ...blocksCursor, limit: BLOCK_PAGE_SIZE });
+        if (documentId !== currentDocumentId) return;
+        
+        insertLoadedBlocks(page.blocks);
+        blocksCursor = page.next_cursor;
+        
+        if (!blocksCursor) {
+            stopBlockLoader();
+            // Pages were read at different times; apply whatever changed
+            // since the first one
+            await resyncDocument(documentId);
+        } else if (blockLoader) {
+            // Observing again reports the sentinel if it is still in range
+            const sentinel = document.getElementById('blocksSentinel');
+            blockLoader.unobserve(sentinel);
+            blockLoader.observe(sentinel);
+        }
+    } catch (error) {
+        console.error('Error loading blocks:', error);
+    } finally {
+        blocksLoading = false;
+    }
+}
+
+function insertLoadedBlocks(blocks) {
+    const container = document.getElementById('blocksContainer');
+    if (!container) return;
+    
+    // Some blocks may already be here from live events
+    const known = new Set(currentBlocks.map(b => b.id));
+    const fresh = blocks.filter(b => !known.has(b.id));
+    if (fresh.length === 0) return;
+    
+    // Blocks added at the end of the document while loading stay after the page
+    const last = fresh[fresh.length - 1];
+    const next = currentBlocks.find(b => compareBlocks(b, last) > 0);
+    const nextElement = next && container.querySelector(`[data-block-id="${next.id}"]`);
+    
+    const fragment = document.createDocumentFragment();
+    fresh.forEach(block => fragment.appendChild(createBlockElement(block)));
+    container.insertBefore(fragment, nextElement || null);
+    
+    currentBlocks.push(...fresh);
+    currentBlocks.sort(compareBlocks);
+}
+
+// Blocks past the last loaded one arrive with a later page instead
+function isBeyondLoadedBlocks(block) {
+    return blocksCursor !== null &&
+        compareBlocks(block, { order_index: blocksCursor.after_order, id: blocksCursor.after_id }) > 0;
+}
+
 function getPlaceholderText(blockType) {
     const placeholders = {
         'paragraph': "Type '/' for commands",
@@ -343,30 +444,80 @@ function selectSlashMenuItem() {
 }
 
 function handleBlockInput(blockId, content) {
-    // Clear existing timeout
-    if (saveTimeouts[blockId]) {
-        clearTimeout(saveTimeouts[blockId]);
-    }
+    // Remember the latest content; all dirty blocks are saved together
+    pendingBlockUpdates.set(blockId, { documentId: currentDocumentId, content });
     
     // Show saving indicator
     showSaveIndicator('saving');
     
     // Set new timeout for auto-save (1 second debounce)
-    saveTimeouts[blockId] = setTimeout(async () => {
+    scheduleBlockFlush(1000);
+}
+
+function scheduleBlockFlush(delay) {
+    if (saveTimeouts['blocks']) {
+        clearTimeout(saveTimeouts['blocks']);
+    }
+    saveTimeouts['blocks'] = setTimeout(flushBlockUpdates, delay);
+}
+
+async function flushBlockUpdates() {
+    if (saveTimeouts['blocks']) {
+        clearTimeout(saveTimeouts['blocks']);
+        delete saveTimeouts['blocks'];
+    }
+    if (pendingBlockUpdates.size === 0) return;
+    
+    const updates = pendingBlockUpdates;
+    pendingBlockUpdates = new Map();
+    
+    // One batch per document, in case edits to the previous document are
+    // still waiting for a retry after a switch
+    const batches = new Map();
+    updates.forEach(({ documentId, content }, id) => {
+        if (!batches.has(documentId)) {
+            batches.set(documentId, []);
+        }
+        batches.get(documentId).push({ op: 'update', id, content });
+    });
+    
+    let failed = false;
+    let requeued = false;
+    await Promise.all(Array.from(batches, async ([documentId, operations]) => {
         try {
-            await apiClient.updateBlock(blockId, content);
-            showSaveIndicator('saved');
+            const response = await apiClient.batchBlocks(documentId, operations);
             
             // Update local block data
-            const block = currentBlocks.find(b => b.id === blockId);
-            if (block) {
-                block.content = content;
-            }
+            response.results.forEach((result, index) => {
+                if (result.status !== 'ok') {
+                    console.error('Error saving block:', operations[index].id, result.error);
+                    failed = true;
+                    return;
+                }
+                const block = currentBlocks.find(b => b.id === result.id);
+                if (block) {
+                    block.content = operations[index].content;
+                }
+            });
         } catch (error) {
-            console.error('Error saving block:', error);
-            showSaveIndicator('error');
+            console.error('Error saving blocks:', error);
+            failed = true;
+            
+            // Nothing was saved: keep the edits for a retry, except for
+            // blocks that were edited again while the request was in flight
+            operations.forEach(({ id }) => {
+                if (!pendingBlockUpdates.has(id)) {
+                    pendingBlockUpdates.set(id, updates.get(id));
+                    requeued = true;
+                }
+            });
         }
-    }, 1000);
+    }));
+    
+    if (requeued && !saveTimeouts['blocks']) {
+        scheduleBlockFlush(BLOCK_SAVE_RETRY_MS);
+    }
+    showSaveIndicator(failed ? 'error' : 'saved');
 }
 
 function handleTitleChange(documentId, title) {
@@ -396,6 +547,7 @@ async function createNewBlock(autoFocus = true) {
     try {
         const response = await apiClient.createBlock(currentDocumentId);
         const block = response.block;
+        forgetBlock(block.id); // The live event may have added it already
         currentBlocks.push(block);
         
         // Add block to DOM
@@ -426,8 +578,9 @@ async function createNewBlockAfter(blockId) {
     if (!currentDocumentId) return;
     
     try {
-        const response = await apiClient.createBlock(currentDocumentId);
+        const response = await apiClient.createBlock(currentDocumentId, '', 'paragraph', blockId);
         const newBlock = response.block;
+        forgetBlock(newBlock.id); // The live event may have added it already
         
         // Find index of current block
         const currentIndex = currentBlocks.findIndex(b => b.id === blockId);
@@ -456,6 +609,7 @@ async function deleteBlockAndFocusPrevious(blockId) {
     }
     
     try {
+        pendingBlockUpdates.delete(blockId);
         await apiClient.deleteBlock(blockId);
         
         // Remove from DOM
@@ -941,6 +1095,11 @@ function showSaveIndicator(status) {
 }
 
 function showEditorPlaceholder() {
+    stopBlockLoader();
+    if (eventSource) {
+        eventSource.close();
+        eventSource = null;
+    }
     const container = document.getElementById('editorContainer');
     container.innerHTML = `
         <div class="editor-placeholder">
@@ -1035,13 +1194,9 @@ function handleDrop(e) {
         
         currentBlocks.splice(newIndex, 0, draggedBlockData);
         
-        // Update order_index for all blocks
-        currentBlocks.forEach((block, index) => {
-            block.order_index = index;
-        });
-        
-        // Save new order to backend
-        saveBlockOrder();
+        // Save the move to backend (only the dragged block is rewritten)
+        const previousBlock = newIndex > 0 ? currentBlocks[newIndex - 1] : null;
+        saveBlockMove(draggedBlockData, previousBlock ? previousBlock.id : null);
     }
     
     this.classList.remove('drag-over');
@@ -1057,19 +1212,153 @@ function handleDragEnd(e) {
     });
 }
 
-async function saveBlockOrder() {
-    if (!currentDocumentId) return;
-    
+async function saveBlockMove(block, afterBlockId) {
     try {
-        const blockOrder = currentBlocks.map((block, index) => ({
-            id: block.id,
-            order_index: index
-        }));
-        
-        await apiClient.reorderBlocks(currentDocumentId, blockOrder);
+        const response = await apiClient.moveBlock(block.id, afterBlockId);
+        block.order_index = response.block.order_index;
         showSaveIndicator('saved');
     } catch (error) {
         console.error('Error saving block order:', error);
         showSaveIndicator('error');
     }
 }
+
+// Live updates from other tabs and devices
+
+async function subscribeToDocument(documentId) {
+    if (eventSource) {
+        eventSource.close();
+        eventSource = null;
+    }
+    if (!window.EventSource || !apiClient.token) return;
+    
+    // EventSource cannot send headers, so the stream is opened with a
+    // short-lived ticket in the query string instead of the token
+    let ticket;
+    try {
+        ({ ticket } = await apiClient.getStreamTicket(documentId));
+    } catch (error) {
+        console.error('Error subscribing to live updates:', error);
+        return;
+    }
+    if (documentId !== currentDocumentId || eventSource) return;
+    
+    const url = `${API_BASE_URL}/documents/${documentId}/events?ticket=${encodeURIComponent(ticket)}`;
+    const source = new EventSource(url);
+    eventSource = source;
+    
+    const handle = (type, apply) => {
+        source.addEventListener(type, (e) => {
+            const event = JSON.parse(e.data);
+            if (event.document_id === currentDocumentId) {
+                apply(event);
+            }
+        });
+    };
+    handle('created', event => applyRemoteBlock(event.block, true));
+    handle('updated', event => applyRemoteBlock(event.block, false));
+    handle('moved', event => applyRemoteBlock(event.block, true));
+    handle('deleted', event => removeRemoteBlock(event.id));
+    handle('reordered', event => applyRemoteOrder(event.blocks));
+    
+    // Events were dropped while this tab was behind: fetch what changed instead
+    source.addEventListener('resync', () => resyncDocument(documentId));
+    
+    // Reconnects reuse the expired ticket, so once the browser gives up,
+    // catch up on what was missed and subscribe again with a new one
+    source.addEventListener('error', () => {
+        if (source.readyState !== EventSource.CLOSED || eventSource !== source) return;
+        eventSource = null;
+        setTimeout(() => {
+            if (documentId === currentDocumentId && !eventSource) {
+                resyncDocument(documentId);
+                subscribeToDocument(documentId);
+            }
+        }, 3000);
+    });
+}
+
+function compareBlocks(a, b) {
+    return a.order_index - b.order_index || a.id - b.id;
+}
+
+function applyRemoteBlock(block, reposition) {
+    const container = document.getElementById('blocksContainer');
+    if (!container) return;
+    
+    let local = currentBlocks.find(b => b.id === block.id);
+    if (!local && isBeyondLoadedBlocks(block)) return;
+    let element = container.querySelector(`[data-block-id="${block.id}"]`);
+    
+    // Leave a block that is being edited here alone; its own save follows
+    const editing = pendingBlockUpdates.has(block.id) ||
+        (element && element.contains(document.activeElement));
+    
+    if (!local) {
+        local = { ...block };
+        currentBlocks.push(local);
+    } else if (!editing && (local.content !== block.content || local.block_type !== block.block_type)) {
+        Object.assign(local, block);
+        if (element) {
+            const fresh = createBlockElement(local);
+            element.replaceWith(fresh);
+            element = fresh;
+        }
+    }
+    local.order_index = block.order_index;
+    
+    if (!element) {
+        element = createBlockElement(local);
+        reposition = true;
+    }
+    if (reposition) {
+        currentBlocks.sort(compareBlocks);
+        const next = currentBlocks[currentBlocks.indexOf(local) + 1];
+        const nextElement = next && container.querySelector(`[data-block-id="${next.id}"]`);
+        container.insertBefore(element, nextElement || null);
+    }
+}
+
+function removeRemoteBlock(blockId) {
+    pendingBlockUpdates.delete(blockId);
+    forgetBlock(blockId);
+}
+
+function applyRemoteOrder(blockOrders) {
+    const container = document.getElementById('blocksContainer');
+    if (!container) return;
+    
+    blockOrders.forEach(({ id, order_index }) => {
+        const block = currentBlocks.find(b => b.id === id);
+        if (block) {
+            block.order_index = order_index;
+        }
+    });
+    currentBlocks.sort(compareBlocks);
+    currentBlocks.forEach(block => {
+        const element = container.querySelector(`[data-block-id="${block.id}"]`);
+        if (element) {
+            container.appendChild(element);
+        }
+    });
+}
+
+async function resyncDocument(documentId) {
+    try {
+        const changes = await apiClient.getChanges(documentId, currentVersion);
+        if (documentId !== currentDocumentId) return;
+        changes.blocks.forEach(block => applyRemoteBlock(block, true));
+        changes.deleted.forEach(removeRemoteBlock);
+        currentVersion = changes.version;
+    } catch (error) {
+        console.error('Error syncing document:', error);
+    }
+}
+
+function forgetBlock(blockId) {
+    currentBlocks = currentBlocks.filter(b => b.id !== blockId);
+    const element = document.querySelector(`[data-block-id="${blockId}"]`);
+    if (element) {
+        element.remove();
+    }
+}
@@ -1,15 +1,20 @@
 // Navigation panel functionality
 
 let currentDocumentId = null;
-let navigationData = null;
 let openFolders = new Set(); // Track which folders are open
+const NAV_PAGE_SIZE = 50; // Items fetched per folder page
+const SEARCH_DELAY_MS = 250; // Wait for typing to pause before searching
+let searchTimer = null;
+let searchSeq = 0; // Ignores responses to searches that were superseded
 
 async function loadNavigationTree() {
     try {
         showLoading();
-        const data = await apiClient.getDocuments();
-        navigationData = data;
-        renderNavigationTree(data);
+        const container = document.getElementById('navigationTree');
+        const fragment = document.createDocumentFragment();
+        await loadFolderChildren(null, fragment, 0);
+        container.innerHTML = '';
+        container.appendChild(fragment);
         hideLoading();
     } catch (error) {
         console.error('Error loading navigation:', error);
@@ -17,19 +22,109 @@ async function loadNavigationTree() {
     }
 }
 
-function renderNavigationTree(data) {
-    const container = document.getElementById('navigationTree');
-    container.innerHTML = '';
-    
-    // Render folders
-    data.folders.forEach(folder => {
-        container.appendChild(createFolderElement(folder));
+// Fetch one page of a folder's contents (root when folderId is null) and append it
+async function loadFolderChildren(folderId, container, level, cursor = null) {
+    const page = await apiClient.getFolderChildren(folderId, cursor, NAV_PAGE_SIZE);
+    
+    page.items.forEach(item => {
+        container.appendChild(item.type === 'folder'
+            ? createFolderElement(item, level)
+            : createDocumentElement(item, level));
     });
     
-    // Render root documents
-    data.documents.forEach(doc => {
-        container.appendChild(createDocumentElement(doc));
-    });
+    if (page.next_cursor) {
+        container.appendChild(createLoadMoreElement(folderId, container, level, page.next_cursor));
+    }
+}
+
+function createLoadMoreElement(folderId, container, level, cursor) {
+    const moreDiv = document.createElement('div');
+    moreDiv.className = 'nav-item nav-load-more';
+    moreDiv.style.marginLeft = `${level * 10}px`;
+    moreDiv.textContent = 'Load more…';
+    
+    const loadMore = async () => {
+        moreDiv.onclick = null;
+        try {
+            await loadFolderChildren(folderId, container, level, cursor);
+            moreDiv.remove();
+        } catch (error) {
+            console.error('Error loading folder contents:', error);
+            moreDiv.onclick = loadMore;
+        }
+    };
+    moreDiv.onclick = loadMore;
+    
+    return moreDiv;
+}
+
+function scheduleSearch(query) {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => runSearch(query.trim()), SEARCH_DELAY_MS);
+}
+
+async function runSearch(query) {
+    const seq = ++searchSeq;
+    
+    if (!query) {
+        await loadNavigationTree();
+        return;
+    }
+    
+    try {
+        const response = await apiClient.search(query);
+        if (seq !== searchSeq) return;
+        
+        const container = document.getElementById('navigationTree');
+        container.innerHTML = '';
+        if (response.results.length === 0) {
+            const empty = document.createElement('div');
+            empty.className = 'nav-item nav-search-empty';
+            empty.textContent = 'No results';
+            container.appendChild(empty);
+            return;
+        }
+        response.results.forEach(result => container.appendChild(createSearchResultElement(result)));
+    } catch (error) {
+        console.error('Error searching:', error);
+    }
+}
+
+function createSearchResultElement(result) {
+    const resultDiv = document.createElement('div');
+    resultDiv.className = 'nav-item nav-search-result';
+    resultDiv.dataset.docId = result.document_id;
+    
+    if (currentDocumentId === result.document_id) {
+        resultDiv.classList.add('active');
+    }
+    
+    const title = document.createElement('div');
+    title.className = 'nav-item-name';
+    title.textContent = `📄 ${result.document_title}`;
+    resultDiv.appendChild(title);
+    
+    // Title matches carry their highlights in the title itself
+    if (result.block_id !== null) {
+        const snippet = document.createElement('div');
+        snippet.className = 'nav-search-snippet';
+        result.snippet.forEach(segment => {
+            if (segment.match) {
+                const mark = document.createElement('mark');
+                mark.textContent = segment.text;
+                snippet.appendChild(mark);
+            } else {
+                snippet.appendChild(document.createTextNode(segment.text));
+            }
+        });
+        resultDiv.appendChild(snippet);
+    }
+    
+    resultDiv.onclick = () => {
+        loadDocument(result.document_id);
+    };
+    
+    return resultDiv;
 }
 
 function createFolderElement(folder, level = 0) {
@@ -99,26 +194,30 @@ function createFolderElement(folder, level = 0) {
     const childrenDiv = document.createElement('div');
     childrenDiv.className = 'folder-children';
     
-    // Check if this folder was previously open
-    const isOpen = openFolders.has(folder.id);
-    childrenDiv.style.display = isOpen ? 'block' : 'none';
-    toggle.textContent = isOpen ? '▼' : '▶';
+    folderDiv.appendChild(childrenDiv);
     
-    // Add child folders
-    if (folder.children) {
-        folder.children.forEach(child => {
-            childrenDiv.appendChild(createFolderElement(child, level + 1));
+    // Contents are fetched the first time the folder is opened
+    let childrenLoaded = false;
+    const loadChildren = () => {
+        childrenLoaded = true;
+        loadFolderChildren(folder.id, childrenDiv, level + 1).catch(error => {
+            console.error('Error loading folder contents:', error);
+            childrenLoaded = false;
         });
-    }
+    };
     
-    // Add documents in folder
-    if (folder.documents) {
-        folder.documents.forEach(doc => {
-            childrenDiv.appendChild(createDocumentElement(doc, level + 1));
-        });
+    // Empty folders have nothing to expand
+    if (!folder.child_count) {
+        toggle.style.visibility = 'hidden';
     }
     
-    folderDiv.appendChild(childrenDiv);
+    // Check if this folder was previously open
+    const isOpen = openFolders.has(folder.id) && folder.child_count > 0;
+    childrenDiv.style.display = isOpen ? 'block' : 'none';
+    toggle.textContent = isOpen ? '▼' : '▶';
+    if (isOpen) {
+        loadChildren();
+    }
     
     // Toggle folder
     toggle.onclick = (e) => {
@@ -132,6 +231,9 @@ function createFolderElement(folder, level = 0) {
             openFolders.delete(folder.id);
         } else {
             openFolders.add(folder.id);
+            if (!childrenLoaded) {
+                loadChildren();
+            }
         }
     };
     
@@ -231,7 +333,8 @@ async function deleteDocument(documentId) {
             currentDocumentId = null;
             showEditorPlaceholder();
         }
-        await loadNavigationTree();
+        document.querySelectorAll(`#navigationTree .nav-item[data-doc-id="${documentId}"]`)
+            .forEach(item => item.remove());
         hideLoading();
     } catch (error) {
         alert('Error deleting document: ' + error.message);
@@ -245,6 +348,8 @@ async function deleteFolder(folderId) {
     try {
         showLoading();
         await apiClient.deleteFolder(folderId);
+        openFolders.delete(folderId);
+        // Documents in the folder move to the root, so reload from the top
         await loadNavigationTree();
         hideLoading();
     } catch (error) {
@@ -27,6 +27,11 @@ def main():
     else:
         print("\n✓ Database found")
     
+    from backend.database import check_pragma_settings
+    from backend.utils.password_hasher import configure_password_cost
+    check_pragma_settings()
+    configure_password_cost()
+    
     print("\n🚀 Starting Flask server...")
     print("-" * 60)
     print("\nServer will be available at: http://localhost:5000")
@@ -0,0 +1,289 @@
+"""Verification script for block ordering, batches, delta sync and paging."""
+import os
+import sqlite3
+import sys
+
+os.environ.setdefault('BCRYPT_POOL_SIZE', '0')
+os.environ.setdefault('BCRYPT_COST', '4')
+
+import pytest
+
+import backend.database as db
+import backend.routes.block_routes as block_routes
+from backend.repositories.block_repository import ORDER_INDEX_GAP
+from backend.utils.event_broker import event_broker
+
+def _blocks(client, headers, document_id):
+    return client.get(f'/api/documents/{document_id}/blocks', headers=headers).get_json()['blocks']
+
+def _apply_events(subscription, order_keys):
+    """Update a block ID to order_index mapping from queued events, as a live client would."""
+    events, _ = subscription.get(timeout=0)
+    for event in events:
+        if event['type'] in ('created', 'moved'):
+            order_keys[event['block']['id']] = event['block']['order_index']
+        elif event['type'] == 'reordered':
+            order_keys.update((block['id'], block['order_index']) for block in event['blocks'])
+    return [event['type'] for event in events]
+
+def test_sparse_order_keys(client, headers, create_document):
+    """Test that inserts and moves take a key between their neighbours without renumbering."""
+    print("\nTesting sparse block order keys...")
+    document_id, (first, second, third) = create_document(3)
+    
+    indexes = [block['order_index'] for block in _blocks(client, headers, document_id)]
+    assert indexes == [ORDER_INDEX_GAP, 2 * ORDER_INDEX_GAP, 3 * ORDER_INDEX_GAP], f"✗ Appended keys were {indexes}"
+    print("✓ Appended blocks are spaced by the gap")
+    
+    inserted = client.post('/api/blocks', json={'document_id': document_id, 'after_block_id': first},
+                           headers=headers).get_json()['block']
+    assert inserted['order_index'] == ORDER_INDEX_GAP * 3 // 2, "✗ Insert did not take the midpoint"
+    at_top = client.post('/api/blocks', json={'document_id': document_id, 'position': 0},
+                         headers=headers).get_json()['block']
+    assert at_top['order_index'] == 0, "✗ Insert at position 0 did not go before the first block"
+    print("✓ Inserts take a key between their neighbours")
+    
+    moved = client.put(f'/api/blocks/{third}/move', json={'after_block_id': None},
+                       headers=headers).get_json()['block']
+    assert moved['order_index'] == -ORDER_INDEX_GAP, "✗ Move to the top did not go before the first block"
+    blocks = _blocks(client, headers, document_id)
+    assert [block['id'] for block in blocks] == [third, at_top['id'], first, inserted['id'], second], \
+        "✗ Blocks are out of order after the move"
+    unchanged = {block['id']: block['order_index'] for block in blocks}
+    assert unchanged[first] == ORDER_INDEX_GAP and unchanged[second] == 2 * ORDER_INDEX_GAP, \
+        "✗ Neighbouring blocks were renumbered"
+    print("✓ Moves only write the moved block")
+
+def test_order_key_rebalancing(client, headers, create_document):
+    """Test that a document is renumbered once two neighbours have no key left between them."""
+    print("\nTesting block order rebalancing...")
+    subscription = None
+    try:
+        document_id, (first, last) = create_document(2)
+        subscription = event_broker.subscribe(document_id)
+        order_keys = {block['id']: block['order_index'] for block in _blocks(client, headers, document_id)}
+        
+        # Each insert directly after the first block halves the remaining
+        # gap: ten fit, and the eleventh renumbers the document first
+        expected = [first, last]
+        for _ in range(11):
+            block = client.post('/api/blocks', json={'document_id': document_id, 'after_block_id': first},
+                                headers=headers).get_json()['block']
+            expected.insert(1, block['id'])
+        
+        blocks = _blocks(client, headers, document_id)
+        assert [block['id'] for block in blocks] == expected, "✗ Blocks are out of order after rebalancing"
+        indexes = [block['order_index'] for block in blocks]
+        assert len(set(indexes)) == len(indexes), "✗ Rebalancing left duplicate keys"
+        assert indexes[-1] == (len(indexes) - 1) * ORDER_INDEX_GAP, f"✗ Document was not renumbered: {indexes}"
+        print("✓ Exhausted gaps renumber the document and keep its order")
+        
+        event_types = _apply_events(subscription, order_keys)
+        assert event_types.count('reordered') == 1, f"✗ Events were {event_types}"
+        assert order_keys == {block['id']: block['order_index'] for block in blocks}, \
+            "✗ Live subscribers were left with stale order keys"
+        print("✓ Renumbering sends every new key to live subscribers")
+        
+        # Moving between adjacent keys renumbers too
+        client.post('/api/blocks', json={'document_id': document_id, 'after_block_id': first}, headers=headers)
+        for _ in range(11):
+            client.put(f'/api/blocks/{last}/move', json={'after_block_id': first}, headers=headers)
+            client.put(f'/api/blocks/{expected[1]}/move', json={'after_block_id': first}, headers=headers)
+        blocks = _blocks(client, headers, document_id)
+        ids = [block['id'] for block in blocks]
+        assert ids[:3] == [first, expected[1], last], "✗ Repeated moves left blocks out of order"
+        assert 'reordered' in _apply_events(subscription, order_keys), "✗ Renumbering move sent no new keys"
+        assert order_keys == {block['id']: block['order_index'] for block in blocks}, \
+            "✗ Live subscribers were left with stale order keys after moves"
+        print("✓ Moves into an exhausted gap renumber the document")
+    finally:
+        if subscription is not None:
+            event_broker.unsubscribe(subscription)
+
+def test_batch_operations(client, headers, register, create_document):
+    """Test that a batch applies its operations in order, each with its own result."""
+    print("\nTesting batched block operations...")
+    document_id, (first, second) = create_document(2)
+    foreign_document_id, (foreign,) = create_document(1)
+    
+    response = client.post(f'/api/documents/{document_id}/blocks/batch', json={'operations': [
+        {'op': 'update', 'id': first, 'content': '<b>x</b>'},
+        {'op': 'create', 'after_block_id': first, 'content': 'new'},
+        {'op': 'update', 'id': foreign, 'content': 'stolen'},
+        {'op': 'rename', 'id': first},
+        {'op': 'delete'},
+        'not an object',
+        {'op': 'move', 'id': second, 'after_block_id': None},
+        {'op': 'delete', 'id': first},
+        {'op': 'delete', 'id': first},
+    ]}, headers=headers)
+    assert response.status_code == 200, f"✗ Batch returned {response.status_code}"
+    results = response.get_json()['results']
+    assert [result['status'] for result in results] == [
+        'ok', 'ok', 'error', 'error', 'error', 'error', 'ok', 'ok', 'error'
+    ], f"✗ Unexpected per-operation results: {results}"
+    assert results[0]['block']['content'] == '&lt;b&gt;x&lt;/b&gt;', "✗ Batch update was not sanitized"
+    assert results[2] == {'op': 'update', 'id': foreign, 'status': 'error',
+                          'error': f'Block {foreign} not found in this document'}, \
+        "✗ Block of another document was not rejected"
+    assert results[5]['op'] is None, "✗ Invalid operation result has an op"
+    print("✓ Each operation reports its own result and errors do not stop the batch")
+    
+    blocks = _blocks(client, headers, document_id)
+    assert [block['id'] for block in blocks] == [second, results[1]['block']['id']], \
+        "✗ Batch left the document in the wrong state"
+    assert _blocks(client, headers, foreign_document_id)[0]['content'] == 'b0', \
+        "✗ Block of another document was changed"
+    print("✓ Operations are applied in order to the batch's document only")
+    
+    too_many = [{'op': 'delete', 'id': first}] * 501
+    response = client.post(f'/api/documents/{document_id}/blocks/batch',
+                           json={'operations': too_many}, headers=headers)
+    assert response.status_code == 400, "✗ Oversized batch was accepted"
+    response = client.post(f'/api/documents/{document_id}/blocks/batch',
+                           json={'operations': {'op': 'delete'}}, headers=headers)
+    assert response.status_code == 400, "✗ Batch that is not a list was accepted"
+    print("✓ Malformed batches are rejected as a whole")
+    
+    _, other_headers = register('other')
+    response = client.post(f'/api/documents/{document_id}/blocks/batch',
+                           json={'operations': [{'op': 'delete', 'id': second}]}, headers=other_headers)
+    assert response.status_code == 403, "✗ Batch on another user's document was not refused"
+    assert len(_blocks(client, headers, document_id)) == 2, "✗ Refused batch changed the document"
+    print("✓ Batches on another user's document are refused")
+
+def test_delta_sync(client, headers, register, create_document):
+    """Test that the changes endpoint returns only the blocks written and deleted since a version."""
+    print("\nTesting block delta sync...")
+    document_id, (kept, edited, deleted) = create_document(3)
+    
+    response = client.get(f'/api/documents/{document_id}/blocks', headers=headers)
+    version = response.get_json()['version']
+    etag = response.headers['ETag']
+    response = client.get(f'/api/documents/{document_id}/blocks', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 304, "✗ Unchanged block list was not answered with 304"
+    changes = client.get(f'/api/documents/{document_id}/changes?since={version}', headers=headers).get_json()
+    assert changes['version'] == version and changes['blocks'] == [] and changes['deleted'] == [], \
+        "✗ Changes were reported for an unchanged document"
+    print("✓ An unchanged document reports no changes")
+    
+    client.put(f'/api/blocks/{edited}', json={'content': 'edited'}, headers=headers)
+    client.delete(f'/api/blocks/{deleted}', headers=headers)
+    created = client.post('/api/blocks', json={'document_id': document_id, 'content': 'new'},
+                          headers=headers).get_json()['block']['id']
+    short_lived = client.post('/api/blocks', json={'document_id': document_id},
+                              headers=headers).get_json()['block']['id']
+    client.delete(f'/api/blocks/{short_lived}', headers=headers)
+    
+    changes = client.get(f'/api/documents/{document_id}/changes?since={version}', headers=headers).get_json()
+    assert changes['version'] > version, "✗ Version did not advance"
+    assert sorted(block['id'] for block in changes['blocks']) == sorted([edited, created]), \
+        f"✗ Changed blocks were {changes['blocks']}"
+    assert next(block for block in changes['blocks'] if block['id'] == edited)['content'] == 'edited', \
+        "✗ Changed block has stale content"
+    assert kept not in [block['id'] for block in changes['blocks']], "✗ Unchanged block was reported"
+    assert sorted(changes['deleted']) == sorted([deleted, short_lived]), f"✗ Deleted IDs were {changes['deleted']}"
+    print("✓ Changes list written blocks and tombstones of deleted ones")
+    
+    response = client.get(f'/api/documents/{document_id}/blocks', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 200 and response.get_json()['version'] == changes['version'], \
+        "✗ Block list was not revalidated after writes"
+    later = client.get(f'/api/documents/{document_id}/changes?since={changes["version"]}',
+                       headers=headers).get_json()
+    assert later['blocks'] == [] and later['deleted'] == [], "✗ Changes repeated after catching up"
+    print("✓ Catching up to the returned version leaves nothing to sync")
+    
+    response = client.get(f'/api/documents/{document_id}/changes', headers=headers)
+    assert response.status_code == 400, "✗ Missing since was accepted"
+    _, other_headers = register('other')
+    response = client.get(f'/api/documents/{document_id}/changes?since=0', headers=other_headers)
+    assert response.status_code == 403, "✗ Another user's changes were served"
+    print("✓ Invalid and foreign change requests are refused")
+
+def test_stream_tickets(client, headers, register, create_document):
+    """Test that event streams open with a document's ticket only and end when the user is deleted."""
+    print("\nTesting event stream tickets...")
+    original_heartbeat = block_routes.SSE_HEARTBEAT_SECONDS
+    try:
+        document_id, _ = create_document()
+        other_document_id, _ = create_document()
+        token = headers['Authorization'].split()[1]
+        
+        response = client.get(f'/api/documents/{document_id}/events?token={token}')
+        assert response.status_code == 401, "✗ Token was accepted in the query string"
+        
+        response = client.post(f'/api/documents/{document_id}/events/ticket', headers=headers)
+        assert response.status_code == 201, f"✗ Ticket request returned {response.status_code}"
+        ticket = response.get_json()['ticket']
+        response = client.get(f'/api/documents/{other_document_id}/events?ticket={ticket}')
+        assert response.status_code == 401, "✗ Ticket opened another document's stream"
+        response = client.get('/api/account/profile', headers={'Authorization': f'Bearer {ticket}'})
+        assert response.status_code == 401, "✗ Ticket was accepted as a token"
+        print("✓ Tickets only open the stream of their document")
+        
+        _, other_headers = register('other')
+        response = client.post(f'/api/documents/{document_id}/events/ticket', headers=other_headers)
+        assert response.status_code == 403, "✗ Ticket was issued for another user's document"
+        print("✓ Tickets are only issued to the document's owner")
+        
+        block_routes.SSE_HEARTBEAT_SECONDS = 0.05
+        response = client.get(f'/api/documents/{document_id}/events?ticket={ticket}', buffered=False)
+        assert response.status_code == 200, f"✗ Stream returned {response.status_code}"
+        chunks = response.response
+        assert next(chunks).startswith(b'retry:'), "✗ Stream did not start"
+        client.delete('/api/account/delete', json={'password': 'secret1'}, headers=headers)
+        remaining = [chunk for chunk, _ in zip(chunks, range(100))]
+        response.close()
+        assert len(remaining) < 100, "✗ Stream kept running after the user was deleted"
+        print("✓ Open streams end once their user is deleted")
+    finally:
+        block_routes.SSE_HEARTBEAT_SECONDS = original_heartbeat
+
+def test_block_pages(client, headers, create_document):
+    """Test that keyset pages cover a document's blocks in order, once each, with ties on order_index."""
+    print("\nTesting block pages...")
+    document_id, block_ids = create_document(7)
+    # Blocks sharing an order_index are paged by ID
+    with sqlite3.connect(db.DATABASE_PATH) as conn:
+        conn.execute('UPDATE blocks SET order_index = ? WHERE id IN (?, ?, ?, ?)',
+                     (2 * ORDER_INDEX_GAP, *block_ids[1:5]))
+    expected = [block['id'] for block in _blocks(client, headers, document_id)]
+    assert sorted(expected) == sorted(block_ids), "✗ Full block list is incomplete"
+    
+    url = f'/api/documents/{document_id}/blocks'
+    seen, sizes, cursor = [], [], {}
+    while True:
+        page = client.get(url, query_string={'limit': 3, **cursor}, headers=headers).get_json()
+        assert page['total'] == 7, f"✗ Page reported a total of {page['total']}"
+        seen += [block['id'] for block in page['blocks']]
+        sizes.append(len(page['blocks']))
+        if page['next_cursor'] is None:
+            break
+        cursor = page['next_cursor']
+        assert set(cursor) == {'after_order', 'after_id'}, f"✗ Unexpected cursor {cursor}"
+    assert sizes == [3, 3, 1], f"✗ Page sizes were {sizes}"
+    assert seen == expected, "✗ Pages skipped, repeated or reordered blocks"
+    print("✓ Pages cover every block once and in order")
+    
+    response = client.get(url, query_string={'limit': 3, **cursor}, headers=headers)
+    etag = response.headers['ETag']
+    response = client.get(url, query_string={'limit': 3, **cursor},
+                          headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 304, "✗ Unchanged page was not answered with 304"
+    response = client.get(url, query_string={'limit': 3}, headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 200, "✗ Another page was answered with this page's ETag"
+    client.put(f'/api/blocks/{expected[-1]}', json={'content': 'edited'}, headers=headers)
+    response = client.get(url, query_string={'limit': 3, **cursor},
+                          headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 200, "✗ Page was not revalidated after a write"
+    assert response.get_json()['blocks'][0]['content'] == 'edited', "✗ Page served stale content"
+    print("✓ Page ETags depend on the position and the document version")
+    
+    for query in ({'limit': 0}, {'limit': 1001}, {'after_id': expected[0]}):
+        response = client.get(url, query_string=query, headers=headers)
+        assert response.status_code == 400, f"✗ Invalid page request {query} was accepted"
+    print("✓ Invalid page requests are rejected")
+
+if __name__ == '__main__':
+    # The tests take their database and users from the fixtures in conftest.py
+    sys.exit(pytest.main(['-q', '-s', __file__]))
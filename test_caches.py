@@ -0,0 +1,107 @@
+"""Verification script for the user, token and sidebar tree caches."""
+import os
+import sys
+import threading
+
+os.environ.setdefault('BCRYPT_POOL_SIZE', '0')
+os.environ.setdefault('BCRYPT_COST', '4')
+
+import pytest
+
+import backend.database as db
+from flask import g
+from backend.app import app
+from backend.repositories.document_repository import tree_cache
+from backend.repositories.user_repository import UserRepository, user_cache
+from backend.services.auth_service import token_cache
+from backend.services.document_service import DocumentService
+
+def test_user_and_token_caches(client, register):
+    """Test that cached users and tokens are served on repeat and dropped when the user changes."""
+    print("\nTesting user and token caches...")
+    admin_id, admin_headers = register('admin')
+    UserRepository.update_admin_status(admin_id, True)
+    user_id, headers = register('member')
+    
+    client.get('/api/account/profile', headers=headers)
+    user_hits, token_hits = user_cache.hits, token_cache.hits
+    client.get('/api/account/profile', headers=headers)
+    assert user_cache.hits == user_hits + 1, "✗ Repeat request did not hit the user cache"
+    assert token_cache.hits == token_hits + 1, "✗ Repeat request did not hit the token cache"
+    print("✓ Repeat requests are served from the user and token caches")
+    
+    client.put('/api/account/username', json={'username': 'renamed'}, headers=headers)
+    profile = client.get('/api/account/profile', headers=headers).get_json()
+    assert profile['username'] == 'renamed', "✗ Cached user was served after a rename"
+    print("✓ Updating a user drops the cached record")
+    
+    client.put(f'/api/admin/users/{user_id}/admin', json={'is_admin': True}, headers=admin_headers)
+    assert client.get('/api/admin/users', headers=headers).status_code == 200, "✗ Promotion was not seen"
+    client.put(f'/api/admin/users/{user_id}/admin', json={'is_admin': False}, headers=admin_headers)
+    assert client.get('/api/admin/users', headers=headers).status_code == 403, "✗ Demoted user kept admin access"
+    print("✓ Admin status changes take effect on the next request")
+    
+    # A rejected update rolls back and leaves the cached user correct
+    client.put('/api/account/username', json={'username': 'x'}, headers=headers)
+    assert client.get('/api/account/profile', headers=headers).get_json()['username'] == 'renamed', \
+        "✗ Rejected update changed the cached user"
+    
+    client.delete(f'/api/admin/users/{user_id}', headers=admin_headers)
+    assert not any(payload['user_id'] == user_id for payload, _ in token_cache._entries.values()), \
+        "✗ Deleted user's tokens stayed cached"
+    response = client.get('/api/account/profile', headers=headers)
+    assert response.status_code == 401, "✗ Deleted user's token was still accepted"
+    print("✓ Deleting a user revokes its cached tokens")
+
+def test_tree_cache(client, register):
+    """Test that sidebar trees are cached with an ETag and evicted by the owner's writes."""
+    print("\nTesting sidebar tree cache...")
+    user_id, headers = register('owner')
+    _, other_headers = register('other')
+    folder = client.post('/api/folders', json={'name': 'Folder'}, headers=headers).get_json()['folder']
+    client.post('/api/documents', json={'title': 'First'}, headers=headers)
+    
+    response = client.get('/api/documents', headers=headers)
+    etag = response.headers['ETag']
+    hits = tree_cache.hits
+    response = client.get('/api/documents', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 304, "✗ Unchanged tree was not answered with 304"
+    assert tree_cache.hits == hits + 1, "✗ Repeat tree request did not hit the cache"
+    print("✓ Unchanged trees are served from the cache as 304")
+    
+    client.post('/api/documents', json={'title': 'Other user'}, headers=other_headers)
+    response = client.get('/api/documents', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 304, "✗ Another user's write evicted the tree"
+    
+    client.post('/api/documents', json={'title': 'Second', 'folder_id': folder['id']}, headers=headers)
+    response = client.get('/api/documents', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag, "✗ Stale tree served after a write"
+    titles = [document['title'] for document in response.get_json()['folders'][0]['documents']]
+    assert titles == ['Second'], "✗ New document missing from the tree"
+    print("✓ Only the owner's writes evict cached trees")
+    
+    # A request whose snapshot predates a concurrent write must not
+    # cache the tree it reads from that snapshot
+    tree_cache.clear()
+    with app.test_request_context('/api/documents'):
+        g.unit_of_work = db.UnitOfWork()
+        try:
+            UserRepository.find_by_id(user_id)
+            writer = threading.Thread(target=lambda: app.test_client().post(
+                '/api/documents', json={'title': 'Concurrent'}, headers=headers
+            ))
+            writer.start()
+            writer.join()
+            DocumentService.get_cached_tree(
+                user_id, ('tree', None, None), lambda: DocumentService.get_user_documents(user_id)
+            )
+        finally:
+            g.unit_of_work.close()
+    titles = [document['title'] for document in
+              client.get('/api/documents', headers=headers).get_json()['documents']]
+    assert 'Concurrent' in titles, "✗ Tree read from an old snapshot was cached"
+    print("✓ Trees read from a snapshot older than an eviction are not cached")
+
+if __name__ == '__main__':
+    # The tests take their database and users from the fixtures in conftest.py
+    sys.exit(pytest.main(['-q', '-s', __file__]))
@@ -82,6 +82,53 @@ def test_connection_utilities():
     
     return True
 
+def test_connection_pool():
+    """Test pooled connection reuse and per-thread isolation."""
+    print("\nTesting connection pool...")
+    import threading
+    from backend.database import ConnectionPool
+    
+    pool = ConnectionPool(size=2, health_check_interval=0)
+    try:
+        # Same thread gets its idle connection back
+        conn = pool.acquire()
+        pool.release(conn)
+        if pool.acquire() is not conn:
+            print("✗ Pool did not reuse the idle connection")
+            return False
+        pool.release(conn)
+        print("✓ Idle connection is reused by the same thread")
+        
+        # Another thread never receives this thread's connection
+        other = []
+        def borrow():
+            c = pool.acquire()
+            other.append(c)
+            pool.release(c)
+        worker = threading.Thread(target=borrow)
+        worker.start()
+        worker.join()
+        if other[0] is conn:
+            print("✗ Connection was shared across threads")
+            return False
+        print("✓ Connections are isolated per thread")
+        
+        # Broken connections fail the health check and are replaced
+        broken = pool.acquire()
+        pool.release(broken)
+        broken.close()
+        replacement = pool.acquire()
+        replacement.execute('SELECT 1')
+        pool.release(replacement)
+        if replacement is broken:
+            print("✗ Broken connection was handed out again")
+            return False
+        print("✓ Health check replaces broken connections")
+    finally:
+        pool.close_all()
+    
+    return True
+
 def test_schema():
     """Test database schema."""
     print("\nTesting database schema...")
@@ -238,6 +285,7 @@ if __name__ == '__main__':
     all_passed = True
     
     all_passed &= test_connection_utilities()
+    all_passed &= test_connection_pool()
     all_passed &= test_schema()
     all_passed &= test_foreign_key_constraints()
     
@@ -0,0 +1,123 @@
+"""Verification script for request-scoped transactions under concurrent writers."""
+import os
+import sqlite3
+import sys
+import threading
+
+os.environ.setdefault('BCRYPT_POOL_SIZE', '0')
+os.environ.setdefault('BCRYPT_COST', '4')
+
+import pytest
+
+import backend.database as db
+from flask import g
+from backend.app import app
+from backend.repositories.user_repository import UserRepository
+from backend.utils.password_hasher import password_hasher
+
+def test_concurrent_block_writes(client, headers, create_document):
+    """Test that concurrent autosaves wait for the write lock instead of failing."""
+    print("\nTesting concurrent block writes...")
+    document_id, block_ids = create_document(16)
+    
+    statuses = []
+    def autosave(block_id):
+        writer = app.test_client()
+        text = ''
+        for _ in range(50):
+            text += 'word '
+            response = writer.put(f'/api/blocks/{block_id}', json={'content': text}, headers=headers)
+            statuses.append(response.status_code)
+    
+    threads = [threading.Thread(target=autosave, args=(block_id,)) for block_id in block_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    failed = len([status for status in statuses if status != 200])
+    assert failed == 0, f"✗ {failed} of {len(statuses)} concurrent writes failed"
+    print(f"✓ {len(statuses)} concurrent writes succeeded")
+    
+    blocks = client.get(f'/api/documents/{document_id}/blocks', headers=headers).get_json()['blocks']
+    assert all(block['content'] == 'word ' * 50 for block in blocks), "✗ Final block content was lost"
+    print("✓ Every block holds its last write")
+
+def test_write_lock_taken_on_first_write(client, headers, create_document):
+    """Test that requests hold the write lock only from their first write on."""
+    print("\nTesting when requests take the write lock...")
+    other = None
+    try:
+        other = db.get_db_connection()
+        other.execute('PRAGMA busy_timeout = 0')
+        with app.test_request_context('/api/auth/login', method='POST'):
+            g.unit_of_work = db.UnitOfWork()
+            try:
+                user = UserRepository.find_by_username('writer')
+                other.execute('BEGIN IMMEDIATE')
+                other.rollback()
+                print("✓ A writing request that has only read leaves the write lock free")
+                
+                UserRepository.update_email(user.id, 'renamed@example.com')
+                try:
+                    other.execute('BEGIN IMMEDIATE')
+                    assert False, "✗ Write lock was not held after the first write"
+                except sqlite3.OperationalError:
+                    pass
+                print("✓ The write lock is held from the first write to the end of the request")
+            finally:
+                g.unit_of_work.close()
+        
+        # Renames read the document before writing it, so each request's
+        # transaction begins deferred and must wait for the lock to write
+        document_ids = [create_document()[0] for _ in range(8)]
+        statuses = []
+        def rename(document_id):
+            writer = app.test_client()
+            for i in range(25):
+                response = writer.put(f'/api/documents/{document_id}', json={'title': f'Doc {i}'}, headers=headers)
+                statuses.append(response.status_code)
+        
+        threads = [threading.Thread(target=rename, args=(document_id,)) for document_id in document_ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        failed = len([status for status in statuses if status != 200])
+        assert failed == 0, f"✗ {failed} of {len(statuses)} concurrent renames failed"
+        print(f"✓ {len(statuses)} concurrent read-then-write requests succeeded")
+    finally:
+        if other is not None:
+            other.close()
+
+def test_password_hashing_outside_transactions(client, headers):
+    """Test that no request transaction is held open while a password is hashed or verified."""
+    print("\nTesting transactions around password hashing...")
+    original_hash, original_verify = password_hasher.hash, password_hasher.verify
+    open_during_hashing = []
+    def watch(fn):
+        def wrapper(*args, **kwargs):
+            open_during_hashing.append(db.transaction_open())
+            return fn(*args, **kwargs)
+        return wrapper
+    try:
+        password_hasher.hash, password_hasher.verify = watch(original_hash), watch(original_verify)
+        client.post('/api/auth/register', json={
+            'username': 'second', 'email': 'second@example.com', 'password': 'secret1'
+        })
+        response = client.post('/api/auth/login', json={'username': 'second', 'password': 'secret1'})
+        assert response.status_code == 200, f"✗ Login returned {response.status_code}"
+        response = client.put('/api/account/password', json={
+            'current_password': 'secret1', 'new_password': 'secret2'
+        }, headers=headers)
+        assert response.status_code == 200, f"✗ Password change returned {response.status_code}"
+        assert len(open_during_hashing) == 4, f"✗ Expected 4 hashes, saw {len(open_during_hashing)}"
+        assert not any(open_during_hashing), "✗ A transaction was open while hashing"
+        print("✓ Register, login and password changes hash outside the request's transaction")
+    finally:
+        password_hasher.hash, password_hasher.verify = original_hash, original_verify
+
+if __name__ == '__main__':
+    # The tests take their database and users from the fixtures in conftest.py
+    sys.exit(pytest.main(['-q', '-s', __file__]))
@@ -0,0 +1,54 @@
+"""Verification script for full-text search scoping."""
+import os
+import sys
+
+os.environ.setdefault('BCRYPT_POOL_SIZE', '0')
+os.environ.setdefault('BCRYPT_COST', '4')
+
+import pytest
+
+from backend.repositories.search_repository import SearchRepository
+
+def _search(client, headers, query):
+    response = client.get('/api/search', query_string={'q': query}, headers=headers)
+    assert response.status_code == 200, f"✗ Search for {query!r} returned {response.status_code}"
+    return response.get_json()['results']
+
+def test_search_owner_scoping(client, register):
+    """Test that searches only match the user's own titles and block text."""
+    print("\nTesting search scoping...")
+    assert SearchRepository.has_index(), "✗ Search index was not created"
+    user_id, headers = register('owner')
+    _, other_headers = register('other')
+    
+    document_id = client.post('/api/documents', json={'title': 'Plans'}, headers=headers).get_json()['document']['id']
+    for content in ('apples and pears', 'quarterly plans'):
+        client.post('/api/blocks', json={'document_id': document_id, 'content': content}, headers=headers)
+    other_id = client.post('/api/documents', json={'title': 'Secret apples'},
+                           headers=other_headers).get_json()['document']['id']
+    client.post('/api/blocks', json={'document_id': other_id, 'content': 'apples'}, headers=other_headers)
+    
+    # The index stores the owner as u<id>; searching for it must not
+    # match every row of the user
+    assert _search(client, headers, f'u{user_id}') == [], "✗ Owner ID matched the user's rows"
+    assert _search(client, headers, f'u{user_id} plans') == [], "✗ Owner ID counted as a matched term"
+    print("✓ Terms do not match the owner column")
+    
+    results = _search(client, headers, 'apples')
+    assert [(result['document_id'], result['block_id'] is not None) for result in results] == \
+        [(document_id, True)], f"✗ Search returned {results}"
+    results = _search(client, headers, 'plan')
+    assert len(results) == 2 and {result['document_id'] for result in results} == {document_id}, \
+        "✗ Prefix search did not match the title and block"
+    print("✓ Titles and blocks of the user's own documents are found")
+    
+    # A document titled like an owner ID is still found by its title
+    titled_id = client.post('/api/documents', json={'title': f'u{user_id} notes'},
+                            headers=headers).get_json()['document']['id']
+    results = _search(client, headers, f'u{user_id}')
+    assert [result['document_id'] for result in results] == [titled_id], f"✗ Search returned {results}"
+    print("✓ Words that look like an owner ID match titles that contain them")
+
+if __name__ == '__main__':
+    # The tests take their database and users from the fixtures in conftest.py
+    sys.exit(pytest.main(['-q', '-s', __file__]))
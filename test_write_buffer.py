@@ -0,0 +1,187 @@
+"""Verification script for the block write buffer."""
+import os
+import sys
+import threading
+
+os.environ.setdefault('BCRYPT_POOL_SIZE', '0')
+os.environ.setdefault('BCRYPT_COST', '4')
+
+import pytest
+
+import backend.database as db
+import backend.services.block_service as block_service
+from backend.app import app
+from backend.utils.write_buffer import FlushError, WriteBuffer
+
+def _stored_content(block_id):
+    conn = db.get_db_connection()
+    try:
+        return conn.execute('SELECT content FROM blocks WHERE id = ?', (block_id,)).fetchone()[0]
+    finally:
+        conn.close()
+
+def _set_buffer_mode(durability, interval_ms=20):
+    """Enable the block write buffer; returns a function restoring the old settings."""
+    original = (block_service.BLOCK_WRITE_BUFFER, block_service.BLOCK_WRITE_DURABILITY,
+                block_service.block_write_buffer)
+    block_service.BLOCK_WRITE_BUFFER = True
+    block_service.BLOCK_WRITE_DURABILITY = durability
+    block_service.block_write_buffer = WriteBuffer(
+        block_service.BlockService._write_buffered, interval_ms=interval_ms,
+        defer=db.call_after_commit, transaction=db.write_transaction
+    )
+    def restore():
+        block_service.block_write_buffer.close()
+        (block_service.BLOCK_WRITE_BUFFER, block_service.BLOCK_WRITE_DURABILITY,
+         block_service.block_write_buffer) = original
+    return restore
+
+def test_coalescing():
+    """Test that repeated writes to a key are merged and written once per flush."""
+    print("\nTesting write coalescing...")
+    writes = []
+    buffer = WriteBuffer(writes.append, interval_ms=60000)
+    try:
+        for i in range(5):
+            buffer.put('a', lambda pending: (pending or 0) + 1)
+        seq = buffer.put('b', lambda pending: 'x')
+        assert buffer.get('a') == 5 and buffer.get('b') == 'x', "✗ Pending values are not visible"
+        print("✓ Pending values are merged and visible before a flush")
+        
+        assert buffer.flush(lambda key, value: key == 'b') == 1, "✗ Selective flush wrote other keys"
+        assert writes == [{'b': 'x'}], f"✗ Writes were {writes}"
+        assert buffer.wait_flushed('b', seq, timeout=0), "✗ Flushed write was still waited on"
+        assert buffer.flush() == 1 and writes[-1] == {'a': 5}, "✗ Merged value was not written once"
+        assert buffer.stats() == {'pending': 0, 'puts': 6, 'flushes': 2, 'written': 2, 'failures': 0}, \
+            f"✗ Unexpected stats {buffer.stats()}"
+        print("✓ Each flush writes the latest value of each selected key once")
+    finally:
+        buffer.close()
+
+def test_flush_failures():
+    """Test that failed flushes keep their values pending, are counted and wake waiting writers."""
+    print("\nTesting failed flushes...")
+    writes = []
+    failing = threading.Event()
+    failing.set()
+    def write(values):
+        if failing.is_set():
+            raise RuntimeError('disk full')
+        writes.append(values)
+    
+    buffer = WriteBuffer(write, interval_ms=20)
+    try:
+        seq = buffer.put('a', lambda pending: 'value')
+        try:
+            buffer.wait_flushed('a', seq, timeout=5)
+            assert False, "✗ Waiting writer was not told about the failed flush"
+        except FlushError:
+            pass
+        assert buffer.get('a') == 'value', "✗ Failed flush dropped the pending value"
+        assert buffer.stats()['failures'] >= 1, "✗ Failed flush was not counted"
+        print("✓ Failed flushes keep values pending and raise FlushError to waiting writers")
+        
+        failing.clear()
+        seq = buffer.put('a', lambda pending: pending + '!')
+        assert buffer.wait_flushed('a', seq, timeout=5), "✗ Pending value was not retried"
+        assert writes == [{'a': 'value!'}], f"✗ Writes were {writes}"
+        print("✓ Pending values are written by the next successful flush")
+    finally:
+        failing.clear()
+        buffer.close()
+    
+    # The final flush at shutdown is retried
+    failures = []
+    def flaky(values):
+        if len(failures) < 2:
+            failures.append(values)
+            raise RuntimeError('database is locked')
+        writes.append(values)
+    buffer = WriteBuffer(flaky, interval_ms=60000)
+    buffer.put('b', lambda pending: 1)
+    buffer.close()
+    assert writes[-1] == {'b': 1} and buffer.stats()['pending'] == 0, "✗ Final flush was not retried"
+    print("✓ A failed final flush is retried")
+
+def test_buffered_batch_updates(client, headers, create_document):
+    """Test that batch updates go through the buffer and are flushed before reads."""
+    print("\nTesting buffered batch updates...")
+    document_id, (first, second) = create_document(2)
+    # Nothing is flushed in the background during the test
+    restore = _set_buffer_mode('async', interval_ms=60000)
+    try:
+        response = client.post(f'/api/documents/{document_id}/blocks/batch', json={'operations': [
+            {'op': 'update', 'id': first, 'content': 'one'},
+            {'op': 'update', 'id': first, 'content': '<i>two</i>'},
+            {'op': 'update', 'id': 999, 'content': 'missing'},
+        ]}, headers=headers)
+        results = response.get_json()['results']
+        assert [result['status'] for result in results] == ['ok', 'ok', 'error'], f"✗ Results were {results}"
+        assert results[1]['block']['content'] == '&lt;i&gt;two&lt;/i&gt;', "✗ Buffered batch update was not sanitized"
+        assert _stored_content(first) == 'b0', "✗ Batch update was written instead of buffered"
+        assert block_service.block_write_buffer.stats()['puts'] == 2, "✗ Batch updates were not buffered"
+        print("✓ Batch updates are buffered and merged")
+        
+        client.put(f'/api/blocks/{second}', json={'content': 'single'}, headers=headers)
+        blocks = client.get(f'/api/documents/{document_id}/blocks', headers=headers).get_json()['blocks']
+        assert [block['content'] for block in blocks] == ['&lt;i&gt;two&lt;/i&gt;', 'single'], \
+            "✗ Read did not include buffered edits"
+        assert _stored_content(first) == '&lt;i&gt;two&lt;/i&gt;', "✗ Read did not flush buffered edits"
+        assert block_service.block_write_buffer.stats()['written'] == 2, "✗ Merged edits were written more than once"
+        print("✓ Reads flush the document's buffered edits first")
+        
+        # In commit mode a batch that also creates, moves or deletes blocks
+        # writes its updates in its own transaction
+        block_service.BLOCK_WRITE_DURABILITY = 'commit'
+        response = client.post(f'/api/documents/{document_id}/blocks/batch', json={'operations': [
+            {'op': 'update', 'id': second, 'content': 'committed'},
+            {'op': 'create', 'content': 'new'},
+        ]}, headers=headers)
+        assert response.status_code == 200, f"✗ Mixed batch returned {response.status_code}"
+        assert _stored_content(second) == 'committed', "✗ Mixed batch answered before its update was written"
+        print("✓ Mixed batches write their updates before answering in commit mode")
+    finally:
+        restore()
+
+@pytest.mark.parametrize('durability', block_service.WRITE_DURABILITY_MODES)
+def test_concurrent_buffered_edits(client, headers, create_document, durability):
+    """Test that concurrent edits and reads succeed with the buffer in each durability mode."""
+    print(f"\nTesting concurrent buffered edits in {durability} mode...")
+    document_id, block_ids = create_document(8)
+    restore = _set_buffer_mode(durability)
+    try:
+        statuses = []
+        def edit(block_id):
+            writer = app.test_client()
+            for i in range(20):
+                if i % 2:
+                    response = writer.put(f'/api/blocks/{block_id}', json={'content': f'v{i}'},
+                                          headers=headers)
+                else:
+                    response = writer.post(f'/api/documents/{document_id}/blocks/batch', json={
+                        'operations': [{'op': 'update', 'id': block_id, 'content': f'v{i}'}]
+                    }, headers=headers)
+                statuses.append(response.status_code)
+                response = writer.get(f'/api/documents/{document_id}/blocks', headers=headers)
+                statuses.append(response.status_code)
+        
+        threads = [threading.Thread(target=edit, args=(block_id,)) for block_id in block_ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        failed = len([status for status in statuses if status != 200])
+        assert failed == 0, f"✗ {failed} of {len(statuses)} requests failed in {durability} mode"
+        blocks = client.get(f'/api/documents/{document_id}/blocks', headers=headers).get_json()['blocks']
+        assert all(block['content'] == 'v19' for block in blocks), \
+            f"✗ Final edits were lost in {durability} mode"
+        assert all(_stored_content(block_id) == 'v19' for block_id in block_ids), \
+            f"✗ Final edits were not written in {durability} mode"
+        print(f"✓ {len(statuses)} concurrent requests succeeded in {durability} mode")
+    finally:
+        restore()
+
+if __name__ == '__main__':
+    # The tests take their database and users from the fixtures in conftest.py
+    sys.exit(pytest.main(['-q', '-s', __file__]))